@@ -1,13 +1,230 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
 import json
-import psutil
-from services.task_engine import process_query
+import hmac
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from services.task_engine import (process_query, detect_intent, stream_general_query, response_cache,
+                                  process_monitor, completion_service, SUPPORTED_LANGUAGES)
+from services.response_cache import normalize_query
+from services.completion import CompletionBusy
+from services.resource_sampler import ResourceSampler
+from services.resource_stream import stream_resource_events, format_event, DEFAULT_STREAM_LIFETIME
+from services.resource_history import ResourceHistory, parse_window
+from werkzeug.exceptions import RequestEntityTooLarge
+from services.upload_store import UploadStore, UploadError, UploadTooLarge, UnknownUpload, OffsetMismatch
+from services.job_queue import JobScheduler, QueueFull
+from services.shared_segment import SharedSegment, SharedCache, default_segment_path
+from services.metrics import metrics, observe_request
+from services.profiler import profiler
+from services.query_history import query_history
+from services.suggestion_index import SuggestionIndex, MAX_RESULTS as MAX_SUGGESTIONS
+from services.file_commands import register_file_commands
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
+# Worker pool shared by all batch requests, so concurrent batches can't
+# spawn an unbounded number of threads
+BATCH_MAX_WORKERS = int(os.environ.get('ASSISTANT_BATCH_WORKERS', '4'))
+BATCH_MAX_ITEMS = int(os.environ.get('ASSISTANT_BATCH_MAX_ITEMS', '100'))
+# Items queued or running across all batches; beyond this new batches get 429
+BATCH_MAX_PENDING = int(os.environ.get('ASSISTANT_BATCH_MAX_PENDING', str(4 * BATCH_MAX_ITEMS)))
+_batch_pending = 0
+_batch_pending_lock = threading.Lock()
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS,
+                                    thread_name_prefix='assistant-batch')
+
+# Content-addressed store for uploaded files
+upload_store = UploadStore(
+    os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), 'uploads')),
+    max_bytes=int(os.environ.get('UPLOAD_MAX_BYTES', str(1024 * 1024 * 1024))),
+    chunk_size=int(os.environ.get('UPLOAD_CHUNK_SIZE', str(1024 * 1024))),
+    session_ttl=float(os.environ.get('UPLOAD_SESSION_TTL', str(24 * 3600))),
+    object_ttl=float(os.environ.get('UPLOAD_OBJECT_TTL', str(30 * 24 * 3600)))
+)
+
+# Memory-mapped segment shared by every worker process of this deployment:
+# one elected worker samples resources for all, and cacheable responses are
+# shared. Set SHARED_SEGMENT_PATH to an empty string to keep everything per
+# process.
+SHARED_SEGMENT_PATH = os.environ.get('SHARED_SEGMENT_PATH', default_segment_path(upload_store.root))
+shared_segment = None
+if SHARED_SEGMENT_PATH:
+    shared_segment = SharedSegment(
+        SHARED_SEGMENT_PATH,
+        cache_slots=int(os.environ.get('SHARED_CACHE_SLOTS', '1024')),
+        slot_size=int(os.environ.get('SHARED_CACHE_SLOT_SIZE', '4096'))
+    )
+    response_cache.shared = SharedCache(shared_segment)
+
+# Autocomplete index, ranked by how often and how recently each suggestion
+# was asked. Past queries come from every user, so they are only suggested
+# with SUGGESTIONS_FROM_QUERIES=1: each worker then adds the queries it
+# answers and is seeded from the query history (below) when it starts
+# serving. Otherwise only the built-in suggestions are offered.
+SUGGESTIONS_FROM_QUERIES = os.environ.get('SUGGESTIONS_FROM_QUERIES', '').lower() in ('1', 'true', 'yes')
+suggestion_index = SuggestionIndex(
+    half_life=float(os.environ.get('SUGGESTION_HALF_LIFE', str(7 * 24 * 3600))),
+    max_entries=int(os.environ.get('SUGGESTION_MAX_ENTRIES', '100000'))
+)
+
+# Background psutil sampler, started on first use so that each worker
+# process gets its own thread
+resource_sampler = ResourceSampler(
+    interval=float(os.environ.get('RESOURCE_SAMPLE_INTERVAL', '1.0')),
+    segment=shared_segment
+)
+
+# Fixed-size history of every sample, fed by the sampler thread. Workers
+# record the same shared samples, but each keeps only those since it started.
+resource_history = ResourceHistory()
+resource_sampler.add_listener(resource_history.record_snapshot)
+
+# Every open resource stream holds one of the worker's threads, so past this
+# many new streams get 429 and the other threads stay free for requests.
+# Streams end after RESOURCE_STREAM_LIFETIME seconds and the client reconnects.
+RESOURCE_STREAM_MAX = int(os.environ.get('RESOURCE_STREAM_MAX', '4'))
+RESOURCE_STREAM_LIFETIME = float(os.environ.get('RESOURCE_STREAM_LIFETIME', str(DEFAULT_STREAM_LIFETIME)))
+_resource_stream_slots = threading.BoundedSemaphore(RESOURCE_STREAM_MAX)
+
+# Let Werkzeug enforce the upload limit while parsing request bodies,
+# allowing some room for the multipart envelope around the file
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+app.config['MAX_CONTENT_LENGTH'] = upload_store.max_bytes + MULTIPART_OVERHEAD_BYTES
+
+# Append-only history of assistant queries, written by a background thread
+# in each worker. The queries are users' raw input, so recording is opt-in:
+# set QUERY_HISTORY_DIR to turn it on (e.g. uploads/history). The history
+# endpoints additionally need QUERY_HISTORY_TOKEN in X-History-Token.
+QUERY_HISTORY_DIR = os.environ.get('QUERY_HISTORY_DIR', '')
+QUERY_HISTORY_TOKEN = os.environ.get('QUERY_HISTORY_TOKEN', '')
+if QUERY_HISTORY_DIR:
+    query_history.configure(
+        QUERY_HISTORY_DIR,
+        max_queue=int(os.environ.get('QUERY_HISTORY_QUEUE_SIZE', '10000')),
+        segment_bytes=int(os.environ.get('QUERY_HISTORY_SEGMENT_BYTES', str(64 * 1024 * 1024))),
+        max_bytes=int(os.environ.get('QUERY_HISTORY_MAX_BYTES', str(1024 * 1024 * 1024))),
+        retention_seconds=float(os.environ.get('QUERY_HISTORY_RETENTION', str(30 * 24 * 3600)))
+    )
+
+SUGGESTION_HISTORY_RECORDS = int(os.environ.get('SUGGESTION_HISTORY_RECORDS', '100000'))
+_suggestions_seeded_pid = None
+
+def _seed_suggestions(until):
+    """
+    Add the newest recorded queries to the suggestion index
+    """
+    try:
+        records = query_history.records(since=until - 4 * suggestion_index.half_life, until=until,
+                                        newest_first=True)
+        for count, record in enumerate(records):
+            if count >= SUGGESTION_HISTORY_RECORDS:
+                break
+            if record['language'] in SUPPORTED_LANGUAGES:
+                suggestion_index.record(record['query'], record['language'], timestamp=record['timestamp'])
+    except Exception:
+        app.logger.exception('Error seeding suggestions from history')
+
+def _learn_suggestion(query, language):
+    """
+    Offer an answered query as a suggestion, if that is enabled
+    """
+    if SUGGESTIONS_FROM_QUERIES and language in SUPPORTED_LANGUAGES:
+        suggestion_index.record(query, language)
+
+# Background workers for commands run on uploaded files
+job_scheduler = JobScheduler(
+    max_workers=int(os.environ.get('JOB_WORKERS', '2')),
+    max_queue=int(os.environ.get('JOB_QUEUE_SIZE', '64')),
+    max_retained=int(os.environ.get('JOB_RETAINED', '1000')),
+    retention_seconds=float(os.environ.get('JOB_RETENTION_SECONDS', '3600')),
+    # Shared by all server processes, so any worker can answer a status poll
+    state_dir=os.path.join(upload_store.root, 'jobs')
+)
+register_file_commands(job_scheduler)
+
+@app.before_request
+def ensure_resource_sampler():
+    """
+    Start the sampler with the first request so history covers the
+    whole life of the worker, not just the time since the monitor was opened
+    """
+    resource_sampler.start()
+
+@app.before_request
+def ensure_suggestions_seeded():
+    """
+    Seed this worker's suggestion index from the history in the background
+    """
+    global _suggestions_seeded_pid
+    if SUGGESTIONS_FROM_QUERIES and query_history.enabled and _suggestions_seeded_pid != os.getpid():
+        _suggestions_seeded_pid = os.getpid()
+        threading.Thread(target=_seed_suggestions, args=(time.time(),),
+                         name='suggestion-seeder', daemon=True).start()
+
+# Route timing, registered only when metrics are enabled so that disabled
+# metrics add nothing to a request. Streaming routes are timed until their
+# response starts, not until the stream ends.
+if metrics.enabled:
+    metrics.share(os.environ.get('METRICS_DIR', os.path.join(upload_store.root, 'metrics')))
+
+    @app.before_request
+    def start_request_timer():
+        metrics.start_flusher()
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is not None:
+            # The route template keeps label cardinality bounded
+            route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+            observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+# Sampling profiler for /api/assistant, only available when a token is set
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN', '')
+if PROFILER_TOKEN:
+    profiler.configure(os.path.join(upload_store.root, 'profiles'),
+                       interval=float(os.environ.get('PROFILER_INTERVAL_MS', '1')) / 1000)
+
+def _token_denied(header, token, name):
+    """
+    Error response unless the request's `header` carries `token`
+    """
+    if not hmac.compare_digest(request.headers.get(header, ''), token):
+        return jsonify({'error': f'Invalid {name} token'}), 403
+    return None
+
+def _profiler_denied():
+    """
+    Error response unless the request carries the profiler token
+    """
+    if not profiler.enabled:
+        return jsonify({'error': 'Profiler is disabled'}), 404
+    return _token_denied('X-Profiler-Token', PROFILER_TOKEN, 'profiler')
+
+def _history_denied():
+    """
+    Error response unless history is on and the request carries its token
+    """
+    if not query_history.enabled or not QUERY_HISTORY_TOKEN:
+        return jsonify({'error': 'Query history is disabled'}), 404
+    return _token_denied('X-History-Token', QUERY_HISTORY_TOKEN, 'history')
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Request, error and latency metrics in Prometheus text format
+    """
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/assistant', methods=['POST'])
 def process_assistant_query():
     """
@@ -22,125 +239,564 @@ def process_assistant_query():
     voice_mode = data.get('voice_mode', False)
     language = data.get('language', 'en')
     
+    # `X-Profile: N` (with the profiler token) profiles this and the next requests
+    if profiler.enabled and 'X-Profile' in request.headers:
+        denied = _profiler_denied()
+        if denied:
+            return denied
+        try:
+            profiler.arm(int(request.headers['X-Profile']), request.headers.get('X-Profile-Intent'))
+        except ValueError:
+            return jsonify({'error': 'X-Profile must be a number of requests'}), 400
+    
+    session = profiler.begin() if profiler.armed else None
+    intent = None
     try:
         # Process the query through our task engine
         result = process_query(query, language, voice_mode)
+        intent = result['intent']
+        _learn_suggestion(result['query'], language)
         return jsonify(result)
     except Exception as e:
-        print(f"Error processing query: {str(e)}")
+        app.logger.exception('Error processing query')
         return jsonify({'error': f'Error processing query: {str(e)}'}), 500
+    finally:
+        if session is not None:
+            profiler.end(session, intent)
+
+@app.route('/api/assistant/stream', methods=['POST'])
+def stream_assistant_query():
+    """
+    Process a query from the AI assistant, streaming the answer as
+    Server-Sent Events
+
+    Takes the same body as /api/assistant, plus an optional `timeout` in
+    seconds. General queries stream one `token` event per token as the
+    completion backend produces them; other intents send their whole
+    response as a single token. A final `done` event carries the full
+    result, with `truncated` set if the deadline cut the answer short.
+    """
+    data = request.json
+    
+    if not data or 'query' not in data:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    query = normalize_query(data['query'])
+    voice_mode = data.get('voice_mode', False)
+    language = data.get('language', 'en')
+    try:
+        timeout = float(data['timeout']) if data.get('timeout') is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'timeout must be a number of seconds'}), 400
+    if timeout is not None and not (math.isfinite(timeout) and timeout > 0):
+        return jsonify({'error': 'timeout must be a positive number of seconds'}), 400
+    
+    completion = None
+    if detect_intent(query, language) == 'general_query':
+        try:
+            completion = completion_service.open(query, timeout)
+        except CompletionBusy as e:
+            return jsonify({'error': str(e)}), 429, {'Retry-After': '1'}
+    
+    def generate():
+        if completion is None:
+            try:
+                result = process_query(query, language, voice_mode)
+            except Exception as e:
+                app.logger.exception('Error processing query')
+                yield format_event('error', {'error': f'Error processing query: {str(e)}'})
+                return
+            events = [('token', result['response']), ('done', result)]
+        else:
+            events = stream_general_query(completion, query, language, voice_mode)
+        for event, payload in events:
+            if event == 'done':
+                _learn_suggestion(query, language)
+                yield format_event('done', payload)
+            elif event == 'token':
+                yield format_event('token', {'text': payload})
+            else:
+                yield format_event('error', {'error': payload})
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    if completion is not None:
+        # Frees the completion slot even if the stream never started, and
+        # stops generating as soon as the client disconnects
+        response.call_on_close(completion.close)
+    return response
+
+def _process_batch_item(index, item):
+    """
+    Process one entry of a batch request, reporting errors in-line
+    """
+    if not isinstance(item, dict) or not item.get('query'):
+        return {'index': index, 'error': 'No query provided'}
+    
+    try:
+        result = process_query(item['query'],
+                               item.get('language', 'en'),
+                               item.get('voice_mode', False))
+        return {'index': index, 'result': result}
+    except Exception as e:
+        app.logger.exception("Error processing batch query %d", index)
+        return {'index': index, 'error': f'Error processing query: {str(e)}'}
+
+def _reserve_batch_slots(count):
+    """
+    Reserve room for `count` batch items; False if that would exceed the limit
+    """
+    global _batch_pending
+    with _batch_pending_lock:
+        if _batch_pending + count > BATCH_MAX_PENDING:
+            return False
+        _batch_pending += count
+        return True
+
+def _release_batch_slot(future):
+    # Runs when an item finishes or is cancelled
+    global _batch_pending
+    with _batch_pending_lock:
+        _batch_pending -= 1
+
+@app.route('/api/assistant/batch', methods=['POST'])
+def process_assistant_batch():
+    """
+    Process a batch of assistant queries, streaming results as NDJSON
+
+    Each output line is a JSON object carrying the index of the input item
+    and either its `result` or an `error`. Lines are written in completion
+    order, not input order.
+    """
+    data = request.json
+    items = data.get('queries') if isinstance(data, dict) else data
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'No queries provided'}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Batch too large (max {BATCH_MAX_ITEMS} queries)'}), 413
+    
+    if not _reserve_batch_slots(len(items)):
+        return jsonify({'error': 'Too many batch queries in progress'}), 429, {'Retry-After': '1'}
+    
+    futures = []
+    for index, item in enumerate(items):
+        future = batch_executor.submit(_process_batch_item, index, item)
+        future.add_done_callback(_release_batch_slot)
+        futures.append(future)
+    
+    def generate():
+        try:
+            for future in as_completed(futures):
+                yield json.dumps(future.result()) + '\n'
+        finally:
+            # Drop work that hasn't started if the client went away
+            for future in futures:
+                future.cancel()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/assistant/cache', methods=['GET'])
+def get_response_cache_stats():
+    """
+    Get hit/miss/eviction counters for the assistant response cache
+    """
+    return jsonify(response_cache.stats())
+
+@app.route('/api/assistant/cache', methods=['DELETE'])
+def invalidate_response_cache():
+    """
+    Invalidate cached assistant responses, optionally filtered by
+    query, language and/or intent
+    """
+    data = request.get_json(silent=True) or {}
+    removed = response_cache.invalidate(
+        query=data.get('query', request.args.get('query')),
+        language=data.get('language', request.args.get('language')),
+        intent=data.get('intent', request.args.get('intent'))
+    )
+    return jsonify({'removed': removed})
+
+@app.route('/api/assistant/history', methods=['GET'])
+def get_query_history():
+    """
+    Get the newest recorded assistant queries
+
+    Query parameters:
+        intent, language: only records with this intent / language
+        window: how far back to look, e.g. 300, 5m, 2h or 7d (default 1d)
+        limit: maximum number of records (default 100, max 1000)
+
+    Needs the X-History-Token header.
+    """
+    denied = _history_denied()
+    if denied:
+        return denied
+    try:
+        window = parse_window(request.args.get('window', '1d'))
+        limit = int(request.args.get('limit', '100'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not 1 <= limit <= 1000:
+        return jsonify({'error': 'limit must be between 1 and 1000'}), 400
+    
+    records = query_history.query(intent=request.args.get('intent'),
+                                  language=request.args.get('language'),
+                                  since=time.time() - window, limit=limit)
+    return jsonify({'records': records})
+
+@app.route('/api/assistant/history/summary', methods=['GET'])
+def get_query_history_summary():
+    """
+    Get per-intent counts and latencies over a window (default 1d), plus
+    this worker's recorder counters. Needs the X-History-Token header.
+    """
+    denied = _history_denied()
+    if denied:
+        return denied
+    try:
+        window = parse_window(request.args.get('window', '1d'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'window': window,
+        'intents': query_history.summary(since=time.time() - window),
+        'recorder': query_history.stats()
+    })
+
+@app.route('/api/profiler', methods=['POST'])
+def arm_profiler():
+    """
+    Profile the next N assistant requests.
+    Body: {"requests": N, "intent": optional intent to restrict to}
+    """
+    denied = _profiler_denied()
+    if denied:
+        return denied
+    data = request.get_json(silent=True) or {}
+    try:
+        control = profiler.arm(int(data.get('requests', 10)), data.get('intent') or None)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'requests must be a number'}), 400
+    return jsonify(control), 202
+
+@app.route('/api/profiler', methods=['GET'])
+def get_profile():
+    """
+    Get the current profile
+
+    Query parameters:
+        format: 'status' (default), 'collapsed' or 'speedscope'
+    """
+    denied = _profiler_denied()
+    if denied:
+        return denied
+    output = request.args.get('format', 'status')
+    if output == 'collapsed':
+        return Response(profiler.collapsed(), mimetype='text/plain')
+    if output == 'speedscope':
+        return jsonify(profiler.speedscope())
+    if output == 'status':
+        return jsonify(profiler.status())
+    return jsonify({'error': f'Unknown format: {output}'}), 400
+
+@app.route('/api/profiler', methods=['DELETE'])
+def reset_profiler():
+    """
+    Stop profiling and discard the current profile
+    """
+    denied = _profiler_denied()
+    if denied:
+        return denied
+    profiler.disarm()
+    return jsonify({'success': True})
 
 @app.route('/api/system/resources', methods=['GET'])
 def get_system_resources():
     """
     Get system resource information (CPU, RAM, etc.)
+
+    Served from the background sampler's latest snapshot, so the request
+    never waits on psutil. `sample_age_s` says how old the data is.
     """
     try:
-        # Get CPU usage
-        cpu_percent = psutil.cpu_percent(interval=0.5)
-        
-        # Get memory usage
-        memory = psutil.virtual_memory()
-        ram_percent = memory.percent
-        ram_used = round(memory.used / (1024 * 1024 * 1024), 2)  # GB
-        ram_total = round(memory.total / (1024 * 1024 * 1024), 2)  # GB
-        
-        # Get disk usage
-        disk = psutil.disk_usage('/')
-        disk_percent = disk.percent
-        disk_used = round(disk.used / (1024 * 1024 * 1024), 2)  # GB
-        disk_total = round(disk.total / (1024 * 1024 * 1024), 2)  # GB
-        
-        # Try to get battery info, might not be available on all systems
-        battery_percent = None
-        battery_plugged = None
-        try:
-            battery = psutil.sensors_battery()
-            if battery:
-                battery_percent = battery.percent
-                battery_plugged = battery.power_plugged
-        except:
-            pass
-        
+        snapshot = resource_sampler.snapshot
+        result = dict(snapshot.data)
+        result['sampled_at'] = snapshot.timestamp
+        result['sample_age_s'] = round(snapshot.age(), 3)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'error': f'Error getting system resources: {str(e)}'}), 500
+
+@app.route('/api/system/resources/stream', methods=['GET'])
+def stream_system_resources():
+    """
+    Stream system resource samples as Server-Sent Events
+
+    Query parameters:
+        interval: seconds between updates for this client (default 1)
+
+    Each worker serves a limited number of streams at once (429 beyond
+    that), and each stream ends after a while; EventSource reconnects.
+    """
+    try:
+        interval = float(request.args.get('interval', 1.0))
+    except ValueError:
+        return jsonify({'error': 'interval must be a number'}), 400
+    if not math.isfinite(interval):
+        return jsonify({'error': 'interval must be a finite number'}), 400
+    if not _resource_stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many open resource streams'}), 429, {'Retry-After': '5'}
+    
+    response = Response(
+        stream_with_context(stream_resource_events(resource_sampler, interval, RESOURCE_STREAM_LIFETIME)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Called by the server once the stream has ended or the client left
+    response.call_on_close(_resource_stream_slots.release)
+    return response
+
+@app.route('/api/system/resources/history', methods=['GET'])
+def get_system_resources_history():
+    """
+    Get min/avg/max history for one resource metric
+
+    Query parameters:
+        metric: dotted metric name, e.g. cpu.percent (default)
+        window: time span such as 300, 5m, 2h or 7d (default 5m)
+        resolution: bucket size in seconds; picked from the window if omitted
+
+    History is kept in this worker's memory since it started, so windows
+    longer than the worker's uptime come back partly empty.
+    """
+    metric = request.args.get('metric', 'cpu.percent')
+    try:
+        window = parse_window(request.args.get('window', '5m'))
+        resolution = request.args.get('resolution')
+        resolution = int(resolution) if resolution else None
+        return jsonify(resource_history.query(metric, window, resolution))
+    except KeyError:
         return jsonify({
-            'cpu': {
-                'percent': cpu_percent
-            },
-            'memory': {
-                'percent': ram_percent,
-                'used_gb': ram_used,
-                'total_gb': ram_total
-            },
-            'disk': {
-                'percent': disk_percent,
-                'used_gb': disk_used,
-                'total_gb': disk_total
-            },
-            'battery': {
-                'percent': battery_percent,
-                'plugged': battery_plugged
-            }
+            'error': f'Unknown metric: {metric}',
+            'metrics': list(resource_history.metrics)
+        }), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/system/processes', methods=['GET'])
+def get_system_processes():
+    """
+    Get the top-N processes by CPU, memory or disk I/O
+
+    Query parameters:
+        limit: number of processes to return (default 10)
+        sort: 'cpu' (default), 'memory' or 'io'
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 100))
+        sort_by = request.args.get('sort', 'cpu')
+        return jsonify({
+            'sort': sort_by,
+            'processes': process_monitor.top(limit, sort_by)
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        return jsonify({'error': f'Error getting system resources: {str(e)}'}), 500
+        return jsonify({'error': f'Error getting processes: {str(e)}'}), 500
+
+def _queue_upload(stored, command, options):
+    """
+    Queue a command on a stored file and build the upload response
+    """
+    try:
+        job = job_scheduler.submit(command, stored.path, **options)
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 429, {'Retry-After': '5'}
+    
+    return jsonify({
+        'success': True,
+        'message': f'File {stored.filename} uploaded successfully and {command} operation queued',
+        'filename': stored.filename,
+        'command': command,
+        'sha256': stored.sha256,
+        'size': stored.size,
+        'deduplicated': stored.deduplicated,
+        'job_id': job.id,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
+
+def _unknown_command(command):
+    return jsonify({
+        'error': f'Unknown command: {command}',
+        'commands': job_scheduler.commands
+    }), 400
+
+def _upload_error(e):
+    """
+    Map an upload store error to an HTTP response
+    """
+    if isinstance(e, UploadTooLarge):
+        return jsonify({'error': str(e)}), 413
+    if isinstance(e, RequestEntityTooLarge):
+        return jsonify({'error': f'Upload exceeds {upload_store.max_bytes} bytes'}), 413
+    if isinstance(e, UnknownUpload):
+        return jsonify({'error': str(e)}), 404
+    if isinstance(e, OffsetMismatch):
+        return jsonify({'error': str(e), 'offset': e.expected}), 409
+    if isinstance(e, UploadError):
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'error': f'Error processing file: {str(e)}'}), 500
 
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """
     Handle file uploads and process them based on the command
     """
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
+    # Werkzeug rejects oversized bodies (declared or streamed) while parsing
+    try:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file part'}), 400
+    except RequestEntityTooLarge as e:
+        return _upload_error(e)
     
     file = request.files['file']
     
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     
-    # Get the command to run on the file
+    # Get the command to run on the file; other form fields are its options
     command = request.form.get('command', 'summarize')
+    if command not in job_scheduler.commands:
+        return _unknown_command(command)
+    options = {key: value for key, value in request.form.items() if key != 'command'}
     
     try:
-        # Create uploads directory if it doesn't exist
-        upload_folder = os.path.join(os.path.dirname(__file__), 'uploads')
-        if not os.path.exists(upload_folder):
-            os.makedirs(upload_folder)
-        
-        # Save the file
-        file_path = os.path.join(upload_folder, file.filename)
-        file.save(file_path)
-        
-        # Process the file based on the command
-        # This would be handled by your task_engine.py in a real implementation
-        
-        # For now, return a simple acknowledgment
-        return jsonify({
-            'success': True,
-            'message': f'File {file.filename} uploaded successfully and {command} operation queued',
-            'filename': file.filename,
-            'command': command
-        })
+        stored = upload_store.ingest(file.stream, file.filename)
+        return _queue_upload(stored, command, options)
+    except Exception as e:
+        return _upload_error(e)
+
+@app.route('/api/upload/sessions', methods=['POST'])
+def create_upload_session():
+    """
+    Start a resumable upload. Body: {"filename": ..., "size": optional total bytes}
+    """
+    data = request.get_json(silent=True) or {}
+    if not data.get('filename'):
+        return jsonify({'error': 'No filename provided'}), 400
+    
+    try:
+        return jsonify(upload_store.create_session(data['filename'], data.get('size'))), 201
+    except Exception as e:
+        return _upload_error(e)
+
+@app.route('/api/upload/sessions/<upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    """
+    Get the offset at which a resumable upload should continue
+    """
+    try:
+        return jsonify(upload_store.session_status(upload_id))
+    except Exception as e:
+        return _upload_error(e)
+
+@app.route('/api/upload/sessions/<upload_id>', methods=['PATCH'])
+def append_upload_chunk(upload_id):
+    """
+    Append the raw request body to a resumable upload.
+    The `Upload-Offset` header must match the session's current offset.
+    """
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify({'error': 'Upload-Offset header required'}), 400
+    
+    try:
+        new_offset = upload_store.append_chunk(upload_id, offset, request.stream)
+        return jsonify({'upload_id': upload_id, 'offset': new_offset})
     except Exception as e:
-        return jsonify({'error': f'Error processing file: {str(e)}'}), 500
+        return _upload_error(e)
+
+@app.route('/api/upload/sessions/<upload_id>', methods=['DELETE'])
+def abort_upload_session(upload_id):
+    """
+    Discard a resumable upload
+    """
+    try:
+        upload_store.abort_session(upload_id)
+        return jsonify({'success': True})
+    except Exception as e:
+        return _upload_error(e)
+
+@app.route('/api/upload/sessions/<upload_id>/complete', methods=['POST'])
+def complete_upload_session(upload_id):
+    """
+    Finish a resumable upload and process it based on the command
+    """
+    data = request.get_json(silent=True) or request.form.to_dict()
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    command = data.pop('command', 'summarize')
+    if command not in job_scheduler.commands:
+        return _unknown_command(command)
+    
+    try:
+        stored = upload_store.complete_session(upload_id)
+        return _queue_upload(stored, command, data)
+    except Exception as e:
+        return _upload_error(e)
+
+@app.route('/api/jobs', methods=['GET'])
+def get_jobs_stats():
+    """
+    Get queue depth, worker count and job counts by status
+    """
+    return jsonify(job_scheduler.stats())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Get the status and, once finished, the result of a job
+    """
+    job = job_scheduler.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """
+    Cancel a queued or running job
+    """
+    job = job_scheduler.cancel(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown job: {job_id}'}), 404
+    return jsonify(job)
 
 @app.route('/api/suggestions', methods=['GET'])
 def get_suggestions():
     """
-    Get auto-suggestions for the AI assistant
-    """
-    suggestions = [
-        "What's the weather in New York?",
-        "Open Notepad",
-        "Create a Python script to scrape a website",
-        "Monitor system resources",
-        "Tell me a joke",
-        "What's the time in Tokyo?",
-        "Calculate 15% of 67.8",
-        "Summarize this text file",
-        "Generate a Bash script to backup files",
-        "Write a React component for a login form"
-    ]
+    Get auto-suggestions for the AI assistant, optionally completing `prefix`
+    """
+    prefix = request.args.get('prefix', '')
+    language = request.args.get('language', 'en')
+    if language not in SUPPORTED_LANGUAGES:
+        language = 'en'
+    try:
+        limit = int(request.args.get('limit', str(MAX_SUGGESTIONS)))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not 1 <= limit <= MAX_SUGGESTIONS:
+        return jsonify({'error': f'limit must be between 1 and {MAX_SUGGESTIONS}'}), 400
+    
+    suggestions = suggestion_index.suggest(prefix, language, limit)
     return jsonify({'suggestions': suggestions})
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    # Development server only; use run.py for production. Debug is opt-in.
+    app.run(host='0.0.0.0', port=5001,
+            debug=os.environ.get('APP_DEBUG', '').lower() in ('1', 'true', 'yes'))
@@ -0,0 +1,4 @@
+"""
+Benchmarks and load-testing tools for the backend; run them from the
+backend directory, e.g. `python -m benchmarks.bench_task_engine`.
+"""
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the task engine hot paths.
+
+Every case runs over a generated corpus covering all SUPPORTED_LANGUAGES and
+reports throughput (ops/sec), per-call latency percentiles and memory
+allocation per call. CPython has no cumulative allocation counter, so
+allocation is measured with tracemalloc as the peak bytes allocated during a
+call (`alloc_bytes`) and the blocks it leaves allocated (`net_blocks`).
+
+Results are compared against a stored baseline. Any case that gets slower or
+allocates more than the tolerances allow is reported as a REGRESSION, and
+the exit status is 1.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_task_engine
+    python -m benchmarks.bench_task_engine --cases detect_intent calculate
+    python -m benchmarks.bench_task_engine --save-baseline
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+from benchmarks.corpus import generate_corpus
+from services import task_engine
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Allowed change relative to the baseline before a case counts as regressed
+TOLERANCES = {
+    'ops_per_sec': 0.20,     # 20% fewer ops/sec
+    'p50_us': 0.25,          # 25% slower median
+    'p99_us': 0.50,          # 50% slower tail (noisier)
+    'alloc_bytes': 0.25      # 25% more memory per call...
+}
+ALLOC_SLACK_BYTES = 512      # ...beyond this absolute slack
+ALLOC_SAMPLE = 500
+
+def _process_query_uncached(query, language):
+    return task_engine.process_query(query, language)
+
+def _stream_general_query(query, language):
+    completion = task_engine.completion_service.open(query)
+    for _ in task_engine.stream_general_query(completion, query, language):
+        pass
+
+def _build_cases(corpus):
+    """
+    (name, function, list of argument tuples) for every case
+    """
+    def queries(*intents):
+        return [(entry.query,) for entry in corpus if entry.intent in intents]
+
+    mixed = [(entry.query, entry.language) for entry in corpus]
+    general = [(entry.query, entry.language) for entry in corpus if entry.intent == 'general']
+    batches = [([entry.query for entry in corpus[start:start + 256]],) for start in range(0, len(corpus), 256)]
+    return [
+        ('detect_intent', task_engine.detect_intent, mixed),
+        ('detect_intents_batch256', task_engine.detect_intents, batches),
+        ('process_query', _process_query_uncached, mixed),
+        ('process_query_cached', task_engine.process_query, mixed),
+        ('process_query_general', _process_query_uncached, general),
+        ('stream_general_query', _stream_general_query, general),
+        ('generate_code', task_engine.generate_code, queries('code_generation')),
+        ('calculate', task_engine.calculate, queries('calculation')),
+        ('get_time', task_engine.get_time, queries('time')),
+        ('handle_system_command', task_engine.handle_system_command, queries('system_command')),
+    ]
+
+def _percentile(sorted_values, fraction):
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def measure(function, inputs, min_time=1.0):
+    """
+    Benchmark `function` over `inputs`; returns a dict of results
+    """
+    # Warm-up pass (also fills caches for the cached case)
+    for args in inputs:
+        function(*args)
+
+    # Throughput: whole passes over the inputs until min_time has elapsed
+    gc.collect()
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for args in inputs:
+            function(*args)
+        calls += len(inputs)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+    ops_per_sec = calls / elapsed
+
+    # Latency: one timed pass, call by call
+    timings = []
+    clock = time.perf_counter_ns
+    for args in inputs:
+        start = clock()
+        function(*args)
+        timings.append(clock() - start)
+    timings.sort()
+
+    # Allocation: peak traced bytes within each call, and blocks left behind
+    sample = inputs[:ALLOC_SAMPLE]
+    peaks = []
+    tracemalloc.start()
+    try:
+        for args in sample:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            function(*args)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    for args in sample:
+        function(*args)
+    gc.collect()
+    net_blocks = sys.getallocatedblocks() - blocks_before
+
+    return {
+        'inputs': len(inputs),
+        'ops_per_sec': round(ops_per_sec, 1),
+        'p50_us': round(_percentile(timings, 0.50) / 1000, 2),
+        'p99_us': round(_percentile(timings, 0.99) / 1000, 2),
+        'alloc_bytes': round(sum(peaks) / len(peaks)),
+        'net_blocks': round(net_blocks / len(sample), 2)
+    }
+
+def run(case_names=None, per_language=200, min_time=1.0):
+    corpus = generate_corpus(per_language=per_language)
+    results = {}
+    original_max_entries = task_engine.response_cache.max_entries
+    original_shared = task_engine.response_cache.shared
+    for name, function, inputs in _build_cases(corpus):
+        if case_names and name not in case_names:
+            continue
+        if not inputs:
+            continue
+        # Only the cached case may use the response cache
+        cached = name == 'process_query_cached'
+        task_engine.response_cache.invalidate()
+        task_engine.response_cache.max_entries = original_max_entries if cached else 0
+        task_engine.response_cache.shared = None
+        try:
+            results[name] = measure(function, inputs, min_time)
+        finally:
+            task_engine.response_cache.max_entries = original_max_entries
+            task_engine.response_cache.shared = original_shared
+    return results
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'cpus': os.cpu_count()
+    }
+
+def compare(results, baseline):
+    """
+    Return a list of regression messages
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if reference is None:
+            continue
+        if current['ops_per_sec'] < reference['ops_per_sec'] * (1 - TOLERANCES['ops_per_sec']):
+            regressions.append(f"{name}: {current['ops_per_sec']} ops/sec, baseline {reference['ops_per_sec']}")
+        for metric in ('p50_us', 'p99_us'):
+            if current[metric] > reference[metric] * (1 + TOLERANCES[metric]):
+                regressions.append(f'{name}: {metric} {current[metric]}, baseline {reference[metric]}')
+        allowed = reference['alloc_bytes'] * (1 + TOLERANCES['alloc_bytes']) + ALLOC_SLACK_BYTES
+        if current['alloc_bytes'] > allowed:
+            regressions.append(f"{name}: {current['alloc_bytes']} bytes/call, baseline {reference['alloc_bytes']}")
+    return regressions
+
+def format_table(results, baseline=None):
+    reference = (baseline or {}).get('results', {})
+    header = f"{'case':<24}{'ops/sec':>12}{'vs base':>9}{'p50 us':>10}{'p99 us':>10}{'alloc B':>10}{'net blk':>9}"
+    lines = [header, '-' * len(header)]
+    for name, result in results.items():
+        change = ''
+        if name in reference:
+            change = f"{(result['ops_per_sec'] / reference[name]['ops_per_sec'] - 1) * 100:+.0f}%"
+        lines.append(f"{name:<24}{result['ops_per_sec']:>12,.0f}{change:>9}{result['p50_us']:>10}"
+                     f"{result['p99_us']:>10}{result['alloc_bytes']:>10}{result['net_blocks']:>9}")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the task engine hot paths')
+    parser.add_argument('--cases', nargs='*', help='only run these cases')
+    parser.add_argument('--per-language', type=int, default=200, help='corpus queries per language')
+    parser.add_argument('--min-time', type=float, default=1.0, help='seconds of throughput runs per case')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+
+    results = run(args.cases, args.per_language, args.min_time)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline saved to {args.baseline}')
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(format_table(results, baseline))
+
+    if baseline is None:
+        return 0
+    if baseline.get('environment') != environment():
+        print(f"\nNote: baseline was recorded on {baseline.get('environment')}; "
+              'timings are only comparable on the same machine.')
+    regressions = compare(results, baseline)
+    if regressions:
+        print('\n' + '!' * 60)
+        for message in regressions:
+            print(f'REGRESSION {message}')
+        print('!' * 60)
+        return 1
+    print('\nNo regressions against the baseline.')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Deterministic synthetic query corpus for benchmarks and load tests.
+
+Queries are built from per-intent templates filled with random slots. Every
+language in SUPPORTED_LANGUAGES gets the English templates (the app's users
+often type English whatever their UI language is) plus native phrasings of
+the common intents. Each entry records the intent the template was written
+for; it is not necessarily the intent the keyword matcher detects.
+"""
+import random
+from dataclasses import dataclass
+
+from services.task_engine import SUPPORTED_LANGUAGES
+
+CITIES = ['New York', 'London', 'Tokyo', 'Paris', 'Mumbai', 'Berlin', 'Sydney',
+          'Cairo', 'Moscow', 'Beijing', 'Dhaka', 'Madrid', 'Toronto', 'Delhi']
+APPS = ['notepad', 'calculator', 'chrome', 'firefox', 'terminal', 'spotify', 'vscode']
+CODE_LANGUAGES = ['python', 'javascript', 'java', 'html', 'css']
+CODE_TASKS = ['sort a list', 'reverse a string', 'read a csv file', 'call a rest api',
+              'parse json', 'find prime numbers', 'merge two dictionaries']
+TOPICS = ['black holes', 'the french revolution', 'photosynthesis', 'machine learning',
+          'the stock market', 'ancient rome', 'quantum computing', 'healthy sleep']
+
+ENGLISH_TEMPLATES = {
+    'code_generation': [
+        'write code to {task} in {code_language}',
+        'generate code for {task}',
+        'write a function to {task} using {code_language}',
+        'can you write a {code_language} script that will {task}',
+    ],
+    'system_command': [
+        'open {app}', 'please launch {app}', 'start {app} for me', 'close {app}',
+    ],
+    'system_monitor': [
+        'show me system resources', 'what is my cpu usage', 'how much memory usage right now',
+        'check disk space', 'battery status', 'system stats please',
+    ],
+    'weather': [
+        "what's the weather in {city}", 'weather forecast for {city}',
+        'will it rain in {city} tomorrow', 'temperature in {city}',
+    ],
+    'time': [
+        'what time is it', 'current time in {city}', "what's the time in {city}",
+    ],
+    'joke': [
+        'tell me a joke', 'say something funny', 'make me laugh',
+    ],
+    'calculation': [
+        'calculate {a} + {b}', 'what is {a} * {b}', '{a} / {b}', 'compute {a} ^ 2 - {b}',
+        'square root of {a}', '({a} + {b}) * {c}',
+    ],
+    'general': [
+        'tell me about {topic}', 'explain {topic} simply', 'who invented the telephone',
+        'what should I read about {topic}', 'summarize the history of {topic}',
+    ],
+}
+
+# Native phrasings of the most common intents
+NATIVE_TEMPLATES = {
+    'hi': {
+        'weather': ['{city} में मौसम कैसा है', '{city} का तापमान क्या है'],
+        'time': ['अभी क्या समय हुआ है', '{city} में समय क्या है'],
+        'joke': ['मुझे एक चुटकुला सुनाओ'],
+        'calculation': ['{a} + {b} कितना होता है', '{a} गुणा {b} की गणना करो'],
+    },
+    'bn': {
+        'weather': ['{city} এর আবহাওয়া কেমন', '{city} এ তাপমাত্রা কত'],
+        'time': ['এখন কয়টা বাজে'],
+        'joke': ['আমাকে একটা কৌতুক বলো'],
+        'calculation': ['{a} + {b} কত', '{a} গুণ {b} হিসাব করো'],
+    },
+    'fr': {
+        'weather': ['quel temps fait-il à {city}', 'météo à {city} demain'],
+        'time': ['quelle heure est-il', 'quelle heure est-il à {city}'],
+        'joke': ['raconte-moi une blague'],
+        'calculation': ['calcule {a} + {b}', 'combien font {a} fois {b}'],
+        'code_generation': ['écris du code python pour {task}'],
+    },
+    'es': {
+        'weather': ['¿qué tiempo hace en {city}?', 'pronóstico del clima en {city}'],
+        'time': ['¿qué hora es?', '¿qué hora es en {city}?'],
+        'joke': ['cuéntame un chiste'],
+        'calculation': ['calcula {a} + {b}', 'cuánto es {a} por {b}'],
+        'code_generation': ['escribe código en python para {task}'],
+    },
+    'de': {
+        'weather': ['wie ist das Wetter in {city}', 'Wettervorhersage für {city}'],
+        'time': ['wie spät ist es', 'wie spät ist es in {city}'],
+        'joke': ['erzähl mir einen Witz'],
+        'calculation': ['berechne {a} + {b}', 'was ist {a} mal {b}'],
+        'code_generation': ['schreibe Python-Code, um {task}'],
+    },
+    'ja': {
+        'weather': ['{city}の天気は？', '{city}の気温を教えて'],
+        'time': ['今何時ですか', '{city}は今何時？'],
+        'joke': ['冗談を言って'],
+        'calculation': ['{a} + {b} を計算して', '{a}かける{b}は？'],
+    },
+    'zh': {
+        'weather': ['{city}的天气怎么样', '{city}明天会下雨吗'],
+        'time': ['现在几点了', '{city}现在几点'],
+        'joke': ['讲个笑话'],
+        'calculation': ['计算 {a} + {b}', '{a}乘以{b}等于多少'],
+    },
+    'ar': {
+        'weather': ['كيف الطقس في {city}', 'ما درجة الحرارة في {city}'],
+        'time': ['كم الساعة الآن'],
+        'joke': ['قل لي نكتة'],
+        'calculation': ['احسب {a} + {b}', 'كم يساوي {a} ضرب {b}'],
+    },
+    'ru': {
+        'weather': ['какая погода в {city}', 'прогноз погоды в {city}'],
+        'time': ['который час', 'сколько времени в {city}'],
+        'joke': ['расскажи анекдот'],
+        'calculation': ['посчитай {a} + {b}', 'сколько будет {a} умножить на {b}'],
+        'code_generation': ['напиши код на python, чтобы {task}'],
+    },
+}
+
+# Rough share of each intent in assistant traffic
+INTENT_WEIGHTS = {
+    'general': 30, 'weather': 15, 'time': 12, 'calculation': 15, 'code_generation': 10,
+    'joke': 8, 'system_command': 6, 'system_monitor': 4,
+}
+
+@dataclass(frozen=True)
+class CorpusQuery:
+    language: str
+    intent: str
+    query: str
+
+def _fill(template, rng):
+    return template.format(
+        task=rng.choice(CODE_TASKS), code_language=rng.choice(CODE_LANGUAGES),
+        app=rng.choice(APPS), city=rng.choice(CITIES), topic=rng.choice(TOPICS),
+        a=rng.randint(1, 999), b=rng.randint(1, 999), c=rng.randint(2, 9)
+    )
+
+def templates_for(language, intent):
+    return ENGLISH_TEMPLATES[intent] + NATIVE_TEMPLATES.get(language, {}).get(intent, [])
+
+def generate_corpus(per_language=200, seed=1, languages=None, intents=None):
+    """
+    Return `per_language` queries for each language, intents drawn by
+    INTENT_WEIGHTS (or only from `intents`), in a reproducible order
+    """
+    rng = random.Random(seed)
+    languages = list(languages or SUPPORTED_LANGUAGES)
+    intents = list(intents or INTENT_WEIGHTS)
+    weights = [INTENT_WEIGHTS[intent] for intent in intents]
+    corpus = []
+    for language in languages:
+        for _ in range(per_language):
+            intent = rng.choices(intents, weights)[0]
+            corpus.append(CorpusQuery(language, intent, _fill(rng.choice(templates_for(language, intent)), rng)))
+    rng.shuffle(corpus)
+    return corpus
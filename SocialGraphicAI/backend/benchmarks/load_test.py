@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Traffic-replay load harness for the Flask API.
+
+Replays a request log, either a recorded one or a synthetic mix of
+/api/assistant, /api/system/resources, /api/upload and /api/suggestions
+traffic. The target is the in-process test client (`--target app`) or a
+running server (`--target http://host:port`, with one keep-alive connection
+per worker).
+
+Arrivals are open-loop. Requests are scheduled at `--rate` per second with
+Poisson gaps, and latency is measured from the scheduled time. Queueing
+delay therefore counts once the app falls behind (no coordinated omission).
+`--rate 0` runs closed-loop, as fast as the workers can go.
+
+The report gives throughput, error and rejection rates, status counts, and
+latency percentiles per endpoint and per assistant intent. With `--ramp`,
+the rate steps up until p99 exceeds `--slo-ms` or errors exceed 1%. The last
+rate that held is reported as the saturation point.
+
+`--history DIR` replays the assistant queries recorded by the query history
+store instead, oldest first.
+
+Log format (JSON lines): {"method": "POST", "path": "/api/assistant",
+"json": {...}} or {"method": "GET", "path": "/api/suggestions?prefix=wh"},
+or {"method": "POST", "path": "/api/upload", "file": "name.txt",
+"content": "...", "form": {...}} for uploads.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test --duration 10 --rate 200 --concurrency 16
+    python -m benchmarks.load_test --target http://localhost:5001 --ramp 50:800:50 --slo-ms 250
+    python -m benchmarks.load_test --save-log traffic.jsonl --requests 5000
+    python -m benchmarks.load_test --log traffic.jsonl
+    python -m benchmarks.load_test --history uploads/history --history-window 1d
+"""
+import argparse
+import http.client
+import json
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.corpus import generate_corpus
+from services.query_history import QueryHistory
+from services.resource_history import parse_window
+
+# Share of each endpoint in the synthetic mix
+DEFAULT_MIX = {'assistant': 70, 'resources': 12, 'suggestions': 15, 'upload': 3}
+ERROR_RATE_LIMIT = 0.01
+
+# Request log
+
+def synthetic_log(count, mix=None, seed=1):
+    """
+    Build `count` log entries following the endpoint mix
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    corpus = generate_corpus(per_language=max(count // 10, 10), seed=seed)
+    endpoints = list(mix)
+    weights = [mix[endpoint] for endpoint in endpoints]
+    entries = []
+    for index in range(count):
+        endpoint = rng.choices(endpoints, weights)[0]
+        if endpoint == 'assistant':
+            entry = corpus[index % len(corpus)]
+            entries.append({'method': 'POST', 'path': '/api/assistant',
+                            'json': {'query': entry.query, 'language': entry.language}})
+        elif endpoint == 'resources':
+            entries.append({'method': 'GET', 'path': '/api/system/resources'})
+        elif endpoint == 'suggestions':
+            entry = corpus[index % len(corpus)]
+            prefix = entry.query[:rng.randint(1, 6)]
+            entries.append({'method': 'GET', 'path': '/api/suggestions',
+                            'params': {'prefix': prefix, 'language': entry.language}})
+        else:
+            lines = [corpus[(index + n) % len(corpus)].query for n in range(rng.randint(20, 200))]
+            entries.append({'method': 'POST', 'path': '/api/upload', 'file': f'notes-{index}.txt',
+                            'content': '\n'.join(lines), 'form': {'command': 'summarize'}})
+    return entries
+
+def load_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def history_log(directory, window=None):
+    """
+    Log entries for the assistant queries in a query history directory
+    """
+    since = time.time() - window if window else None
+    entries = []
+    for record in QueryHistory(directory).records(since=since):
+        entries.append({'method': 'POST', 'path': '/api/assistant',
+                        'json': {'query': record['query'], 'language': record['language']}})
+    return entries
+
+def encode_request(entry):
+    """
+    Turn a log entry into (method, path, body bytes, headers)
+    """
+    method = entry.get('method', 'GET')
+    path = entry['path']
+    if entry.get('params'):
+        path += '?' + urlencode(entry['params'])
+    headers = dict(entry.get('headers', {}))
+    body = b''
+    if 'json' in entry:
+        body = json.dumps(entry['json']).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    elif 'file' in entry:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in entry.get('form', {}).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n')
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                     f'filename="{entry["file"]}"\r\nContent-Type: text/plain\r\n\r\n')
+        body = ''.join(parts).encode('utf-8') + entry.get('content', '').encode('utf-8') \
+            + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+    return method, path, body, headers
+
+def endpoint_of(entry):
+    return entry['path'].split('?', 1)[0]
+
+# Targets
+
+class AppTarget:
+    """
+    Sends requests through the Flask test client, in process
+    """
+
+    def __init__(self):
+        from app import app
+        self.app = app
+
+    def connect(self):
+        client = self.app.test_client()
+
+        def send(method, path, body, headers):
+            response = client.open(path, method=method, data=body, headers=headers)
+            return response.status_code, response.get_data()
+        return send
+
+class HttpTarget:
+    """
+    Sends requests to a running server, one keep-alive connection per worker
+    """
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+
+    def connect(self):
+        connection = [None]
+
+        def send(method, path, body, headers):
+            for attempt in range(2):
+                if connection[0] is None:
+                    connection[0] = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                try:
+                    connection[0].request(method, path, body=body or None, headers=headers)
+                    response = connection[0].getresponse()
+                    return response.status, response.read()
+                except (http.client.HTTPException, ConnectionError):
+                    # The server closed the idle connection: reconnect once
+                    connection[0].close()
+                    connection[0] = None
+                    if attempt:
+                        raise
+        return send
+
+# Running
+
+class Result:
+    __slots__ = ('endpoint', 'intent', 'status', 'latency', 'error')
+
+    def __init__(self, endpoint, intent, status, latency, error=None):
+        self.endpoint = endpoint
+        self.intent = intent
+        self.status = status
+        self.latency = latency
+        self.error = error
+
+def run_load(target, entries, rate, duration, concurrency, seed=1):
+    """
+    Replay entries (cycling) for `duration` seconds; returns (results, elapsed)
+    """
+    encoded = [(endpoint_of(entry), encode_request(entry)) for entry in entries]
+    work = queue.Queue()
+    results = []
+    results_lock = threading.Lock()
+    stop = object()
+
+    def worker():
+        send = target.connect()
+        local = []
+        while True:
+            item = work.get()
+            if item is stop:
+                break
+            scheduled, (endpoint, (method, path, body, headers)) = item
+            intent = None
+            try:
+                status, payload = send(method, path, body, headers)
+                error = None
+                if endpoint == '/api/assistant' and status == 200:
+                    intent = json.loads(payload).get('intent')
+            except Exception as e:
+                status, error = None, str(e)
+            local.append(Result(endpoint, intent, status, time.perf_counter() - scheduled, error))
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    deadline = started + duration
+    next_at = started
+    index = 0
+    while next_at < deadline:
+        if rate > 0:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            work.put((next_at, encoded[index % len(encoded)]))
+            next_at += rng.expovariate(rate)
+        else:
+            # Closed loop: keep just enough work queued for every worker
+            while work.qsize() >= concurrency:
+                time.sleep(0.0005)
+            now = time.perf_counter()
+            work.put((now, encoded[index % len(encoded)]))
+            next_at = now
+        index += 1
+
+    for _ in threads:
+        work.put(stop)
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+# Reporting
+
+def _percentiles(latencies):
+    values = sorted(latencies)
+
+    def at(fraction):
+        return values[min(int(fraction * len(values)), len(values) - 1)] * 1000
+    return {'count': len(values), 'p50_ms': round(at(0.50), 2), 'p90_ms': round(at(0.90), 2),
+            'p99_ms': round(at(0.99), 2), 'max_ms': round(values[-1] * 1000, 2)}
+
+def summarize(results, elapsed):
+    errors = sum(1 for result in results if result.status is None or result.status >= 500)
+    rejected = sum(1 for result in results if result.status == 429)
+    statuses = {}
+    by_endpoint = {}
+    by_intent = {}
+    for result in results:
+        statuses[str(result.status)] = statuses.get(str(result.status), 0) + 1
+        by_endpoint.setdefault(result.endpoint, []).append(result.latency)
+        if result.intent:
+            by_intent.setdefault(result.intent, []).append(result.latency)
+    total = len(results)
+    return {
+        'requests': total,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'error_rate': round(errors / total, 4) if total else 0.0,
+        'rejected_rate': round(rejected / total, 4) if total else 0.0,
+        'statuses': statuses,
+        'overall': _percentiles([result.latency for result in results]) if results else None,
+        'endpoints': {name: _percentiles(values) for name, values in sorted(by_endpoint.items())},
+        'intents': {name: _percentiles(values) for name, values in sorted(by_intent.items())}
+    }
+
+def format_summary(summary):
+    lines = [
+        f"{summary['requests']} requests in {summary['elapsed_s']}s: {summary['throughput_rps']} req/s, "
+        f"errors {summary['error_rate']:.2%}, rejected (429) {summary['rejected_rate']:.2%}",
+        f"statuses: {summary['statuses']}",
+        f"{'':<32}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    ]
+
+    def row(label, stats):
+        lines.append(f"{label:<32}{stats['count']:>8}{stats['p50_ms']:>10}{stats['p90_ms']:>10}"
+                     f"{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+    if summary['overall']:
+        row('all', summary['overall'])
+    for name, stats in summary['endpoints'].items():
+        row(name, stats)
+    for name, stats in summary['intents'].items():
+        row(f'  intent {name}', stats)
+    return '\n'.join(lines)
+
+def find_saturation(target, entries, rates, duration, concurrency, slo_ms):
+    """
+    Step through `rates`; returns (last rate meeting the SLO, per-rate summaries)
+    """
+    steps = []
+    sustained = None
+    for rate in rates:
+        results, elapsed = run_load(target, entries, rate, duration, concurrency)
+        summary = summarize(results, elapsed)
+        p99 = summary['overall']['p99_ms'] if summary['overall'] else float('inf')
+        held = p99 <= slo_ms and summary['error_rate'] <= ERROR_RATE_LIMIT
+        steps.append({'rate': rate, 'throughput_rps': summary['throughput_rps'], 'p99_ms': p99,
+                      'error_rate': summary['error_rate'], 'held': held})
+        print(f"rate {rate:>7.1f}/s  achieved {summary['throughput_rps']:>7.1f}/s  p99 {p99:>9.2f} ms  "
+              f"errors {summary['error_rate']:.2%}  {'ok' if held else 'SLO BROKEN'}")
+        if not held:
+            break
+        sustained = rate
+    return sustained, steps
+
+def _parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'unknown endpoint {name!r}')
+        mix[name] = float(weight)
+    return mix
+
+def _parse_ramp(text):
+    start, stop, step = (float(value) for value in text.split(':'))
+    rates = []
+    rate = start
+    while rate <= stop:
+        rates.append(rate)
+        rate += step
+    return rates
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay traffic against the Flask API')
+    parser.add_argument('--target', default='app', help="'app' for the in-process test client, or a server URL")
+    parser.add_argument('--log', help='JSON-lines request log to replay (default: synthetic mix)')
+    parser.add_argument('--history', help='replay assistant queries from this query history directory')
+    parser.add_argument('--history-window', type=parse_window, help='only the last 300, 5m, 2h, 7d, ... of history')
+    parser.add_argument('--mix', type=_parse_mix, help='synthetic mix, e.g. assistant=70,resources=10,...')
+    parser.add_argument('--requests', type=int, default=2000, help='synthetic log size')
+    parser.add_argument('--save-log', help='write the synthetic log here and exit')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=100.0, help='arrivals per second (0 = closed loop)')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per run (or per ramp step)')
+    parser.add_argument('--ramp', type=_parse_ramp, help='start:stop:step rates to find the saturation point')
+    parser.add_argument('--slo-ms', type=float, default=200.0, help='p99 latency objective for --ramp')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args(argv)
+
+    if args.log:
+        entries = load_log(args.log)
+    elif args.history:
+        entries = history_log(args.history, args.history_window)
+        if not entries:
+            print(f'No recorded queries in {args.history}')
+            return 1
+    else:
+        entries = synthetic_log(args.requests, args.mix)
+    if args.save_log:
+        with open(args.save_log, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+        print(f'Wrote {len(entries)} requests to {args.save_log}')
+        return 0
+
+    target = AppTarget() if args.target == 'app' else HttpTarget(args.target)
+
+    if args.ramp:
+        sustained, steps = find_saturation(target, entries, args.ramp, args.duration,
+                                           args.concurrency, args.slo_ms)
+        if args.json:
+            print(json.dumps({'slo_ms': args.slo_ms, 'saturation_rps': sustained, 'steps': steps}, indent=2))
+        elif sustained is None:
+            print(f'p99 exceeded {args.slo_ms} ms already at {args.ramp[0]}/s')
+        else:
+            print(f'Saturation point: {sustained}/s sustained within p99 {args.slo_ms} ms')
+        return 0
+
+    results, elapsed = run_load(target, entries, args.rate, args.duration, args.concurrency)
+    summary = summarize(results, elapsed)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Train the intent classifier offline and save it for the task engine.
+
+Training data is the synthetic corpus (benchmarks/corpus.py, with a
+different seed from the one the benchmarks use) plus hand-labelled queries
+from JSON-lines files with `query`, `language` and `intent` fields. The
+bundled intent_labels.jsonl holds the cases that keywords get wrong, such as
+'-' and '%' in prose, 'sometimes', and 'stop' or 'run' in everyday
+questions. Hand-labelled queries are repeated `--label-weight` times so
+the much larger synthetic set doesn't drown them out.
+
+Before the final fit on all the data, a model is trained without a random
+`--holdout` share of the hand-labelled queries. Keyword-only, classifier-only
+and combined accuracy is reported on those held-out queries and on the
+benchmark corpus, along with single-core throughput. Combined is how the task
+engine routes with the classifier on: keywords wherever one matches, and the
+classifier, when confident, for queries no keyword matches.
+
+Usage (from the backend directory):
+    python -m benchmarks.train_intent_classifier
+    python -m benchmarks.train_intent_classifier --data exported_labels.jsonl --epochs 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from benchmarks.corpus import generate_corpus
+from services import task_engine
+from services.intent_classifier import DEFAULT_BUCKETS, train
+from services.intent_keywords import INTENT_KEYWORDS
+
+DEFAULT_LABELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'intent_labels.jsonl')
+INTENTS = [intent for intent, _ in INTENT_KEYWORDS] + ['general_query']
+# The corpus calls general queries 'general'
+CORPUS_INTENTS = {'general': 'general_query'}
+
+def load_labels(path):
+    """
+    (query, language, intent) triples from a JSON-lines file
+    """
+    examples = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if record['intent'] not in INTENTS:
+                    raise ValueError(f"{path}: unknown intent {record['intent']!r}")
+                examples.append((record['query'], record.get('language', 'en'), record['intent']))
+    return examples
+
+def corpus_examples(per_language, seed):
+    return [(entry.query, entry.language, CORPUS_INTENTS.get(entry.intent, entry.intent))
+            for entry in generate_corpus(per_language=per_language, seed=seed)]
+
+def evaluate(model, examples, threshold):
+    """
+    Accuracy of keywords alone, the classifier alone and the two combined
+    """
+    queries = [query for query, _, _ in examples]
+    predictions = model.classify(queries)
+    correct = {'keywords': 0, 'classifier': 0, 'combined': 0}
+    for (query, language, intent), (predicted, confidence) in zip(examples, predictions):
+        keyword = task_engine.keyword_intent(query, language)
+        combined = predicted if keyword == 'general_query' and confidence >= threshold else keyword
+        correct['keywords'] += keyword == intent
+        correct['classifier'] += predicted == intent
+        correct['combined'] += combined == intent
+    return {name: count / len(examples) for name, count in correct.items()}
+
+def throughput(model, queries, batch_size, min_time=1.0):
+    """
+    Queries per second classified in batches of `batch_size`
+    """
+    batches = [queries[start:start + batch_size] for start in range(0, len(queries), batch_size)]
+    model.classify(batches[0])
+    done = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < min_time:
+        for batch in batches:
+            model.classify(batch)
+            done += len(batch)
+    return done / (time.perf_counter() - started)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the hashed n-gram intent classifier')
+    parser.add_argument('--data', nargs='*', default=[], help='extra labelled JSON-lines files')
+    parser.add_argument('--labels', default=DEFAULT_LABELS, help='hand-labelled JSON-lines file')
+    parser.add_argument('--label-weight', type=int, default=5, help='times each hand-labelled query is repeated')
+    parser.add_argument('--per-language', type=int, default=300, help='synthetic queries per language')
+    parser.add_argument('--seed', type=int, default=7, help='corpus and shuffling seed')
+    parser.add_argument('--buckets', type=int, default=DEFAULT_BUCKETS, help='hashed feature columns (power of 2)')
+    parser.add_argument('--epochs', type=int, default=12)
+    parser.add_argument('--holdout', type=float, default=0.2, help='share of hand labels held out for evaluation')
+    parser.add_argument('--threshold', type=float, default=task_engine.INTENT_CLASSIFIER_THRESHOLD,
+                        help='confidence the classifier needs to route a query no keyword matches')
+    parser.add_argument('--output', default=task_engine.INTENT_CLASSIFIER_MODEL, help='where to save the model')
+    args = parser.parse_args(argv)
+    if args.buckets & (args.buckets - 1):
+        parser.error('--buckets must be a power of 2')
+
+    labelled = load_labels(args.labels)
+    for path in args.data:
+        labelled.extend(load_labels(path))
+    synthetic = corpus_examples(args.per_language, args.seed)
+    benchmark = corpus_examples(200, 1)
+
+    def fit(hand_labelled):
+        examples = synthetic + hand_labelled * args.label_weight
+        random.Random(args.seed).shuffle(examples)
+        return train([(query, intent) for query, _, intent in examples], INTENTS, buckets=args.buckets,
+                     epochs=args.epochs, seed=args.seed, log=print)
+
+    shuffled = labelled[:]
+    random.Random(args.seed).shuffle(shuffled)
+    held_out = shuffled[:int(len(shuffled) * args.holdout)]
+    if held_out:
+        print(f'Evaluation fit ({len(held_out)} hand-labelled queries held out)')
+        model = fit(shuffled[len(held_out):])
+        for name, examples in (('held-out labels', held_out), ('benchmark corpus', benchmark)):
+            scores = evaluate(model, examples, args.threshold)
+            print(f'{name:<18}' + '  '.join(f'{key} {value:.3f}' for key, value in scores.items()))
+
+    print(f'Final fit ({len(synthetic)} synthetic + {len(labelled)} hand-labelled queries)')
+    model = fit(labelled)
+    queries = [query for query, _, _ in benchmark]
+    rates = {size: throughput(model, queries, size) for size in (1, 32, 256)}
+    print('Throughput on one core: ' + ', '.join(f'batch {size}: {rate:,.0f} queries/sec'
+                                                for size, rate in rates.items()))
+
+    model.metadata = {'trained_at': time.time(), 'examples': len(synthetic) + len(labelled),
+                      'per_language': args.per_language, 'seed': args.seed, 'epochs': args.epochs}
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    model.save(args.output)
+    print(f'Model saved to {args.output} ({os.path.getsize(args.output):,} bytes)')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Gunicorn settings for the AI Assistant Flask backend
+
+Every setting can be overridden through the environment. Gunicorn handles
+the process signals itself:
+    SIGHUP   reload this file and gracefully replace all workers (which
+             also reloads the application code unless preload_app is on)
+    SIGTERM  stop accepting connections and drain in-flight requests
+             (up to graceful_timeout) before exiting
+    SIGTTIN / SIGTTOU  add / remove one worker
+"""
+import multiprocessing
+import os
+import signal
+
+def _int_env(name, default):
+    return int(os.environ.get(name, default))
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5001')}"
+
+# Pre-fork worker processes, each serving requests on a thread pool. Threads
+# matter here because SSE streams hold a thread for as long as they're open;
+# keep RESOURCE_STREAM_MAX below this so streams can't take every thread.
+workers = _int_env('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8))
+worker_class = 'gthread'
+threads = _int_env('GUNICORN_THREADS', 8)
+worker_connections = _int_env('GUNICORN_WORKER_CONNECTIONS', 1000)
+
+# Connection handling
+keepalive = _int_env('GUNICORN_KEEPALIVE', 5)
+timeout = _int_env('GUNICORN_TIMEOUT', 60)
+graceful_timeout = _int_env('GUNICORN_GRACEFUL_TIMEOUT', 30)
+
+# Recycle workers after this many requests (plus jitter, so they don't all
+# restart at once) to cap slow memory growth
+max_requests = _int_env('GUNICORN_MAX_REQUESTS', 10000)
+max_requests_jitter = _int_env('GUNICORN_MAX_REQUESTS_JITTER', 1000)
+
+# Off by default so SIGHUP picks up code changes: new workers import the app
+# afresh. With GUNICORN_PRELOAD=1 workers fork from the master's copy of the
+# app, which saves memory, but code updates then need a full restart.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '').lower() in ('1', 'true', 'yes')
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '-')
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+def _shared_segment_path():
+    # Same defaults as app.py
+    root = os.environ.get('UPLOAD_FOLDER', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads'))
+    from services.shared_segment import default_segment_path
+    return os.environ.get('SHARED_SEGMENT_PATH', default_segment_path(root))
+
+def on_starting(server):
+    """
+    Drop responses the previous deployment left in the shared segment
+    """
+    path = _shared_segment_path()
+    if path:
+        from services.shared_segment import reset_shared_cache
+        reset_shared_cache(path)
+
+def on_reload(server):
+    on_starting(server)
+
+def post_worker_init(worker):
+    """
+    End resource streams as soon as a worker is asked to shut down, instead
+    of holding up the graceful shutdown until graceful_timeout
+    """
+    from services.resource_stream import stop_streams
+
+    def handle_exit(sig, frame):
+        stop_streams()
+        worker.handle_exit(sig, frame)
+    signal.signal(signal.SIGTERM, handle_exit)
@@ -1,9 +1,43 @@
 #!/usr/bin/env python3
 """
 Run script for the AI Assistant Flask backend
+
+By default this starts the production server: gunicorn with pre-forked
+workers configured by gunicorn.conf.py. Set APP_DEBUG=1 to run Flask's
+development server with the debugger and reloader instead.
 """
-from app import app
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+GUNICORN_CONFIG = os.path.join(BACKEND_DIR, 'gunicorn.conf.py')
+
+def debug_enabled():
+    """
+    Debug mode is strictly opt-in
+    """
+    return os.environ.get('APP_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+def run_development_server():
+    from app import app, SHARED_SEGMENT_PATH
+    from services.shared_segment import reset_shared_cache
+    if SHARED_SEGMENT_PATH:
+        # Don't serve responses cached before the restart
+        reset_shared_cache(SHARED_SEGMENT_PATH)
+    app.run(host=os.environ.get('HOST', '0.0.0.0'),
+            port=int(os.environ.get('PORT', '5001')),
+            debug=True)
+
+def run_production_server():
+    from gunicorn.app.wsgiapp import WSGIApplication
+
+    # Equivalent to `gunicorn -c gunicorn.conf.py app:app`; going through the
+    # config file path keeps SIGHUP reloads working
+    sys.argv = [sys.argv[0], '--config', GUNICORN_CONFIG, '--chdir', BACKEND_DIR, 'app:app']
+    WSGIApplication('%(prog)s [OPTIONS] [APP_MODULE]').run()
 
 if __name__ == "__main__":
-    # Run the Flask application
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    if debug_enabled():
+        run_development_server()
+    else:
+        run_production_server()
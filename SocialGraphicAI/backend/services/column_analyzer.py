@@ -0,0 +1,308 @@
+"""
+Single-pass columnar statistics for CSV and JSON-lines uploads.
+
+Records are streamed in fixed-size batches. Each batch is turned into one
+typed NumPy buffer per column, and every column folds the batch into
+incremental statistics: counts, nulls, min/max, mean/std (merged moments),
+an approximate distinct count (HyperLogLog) and approximate quantiles
+(a KLL-style compactor sketch). Memory is bounded by the batch size, the
+column limit and the fixed sketch sizes, not by the number of rows.
+"""
+import csv
+import json
+import math
+
+import numpy as np
+
+DEFAULT_BATCH_ROWS = 50000
+MAX_COLUMNS = 256
+HLL_PRECISION = 12
+QUANTILE_CAPACITY = 512
+REPORTED_QUANTILES = (0.01, 0.25, 0.5, 0.75, 0.99)
+
+NULL_TOKENS = ('', 'null', 'NULL', 'None', 'NaN', 'nan', 'NA', 'N/A')
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+def _mix64(values):
+    """
+    splitmix64 finalizer over a uint64 array
+    """
+    with np.errstate(over='ignore'):
+        z = values + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (z ^ (z >> np.uint64(31))) & _MASK64
+
+class HyperLogLog:
+    """
+    Approximate distinct counter over pre-hashed uint64 values
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = np.zeros(self.size, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        if hashes.size == 0:
+            return
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Rank = position of the leftmost 1-bit in the remaining bits
+        _, exponent = np.frexp(remainder.astype(np.float64))
+        rank = np.where(remainder == 0, 64 - self.precision + 1,
+                        64 - self.precision - exponent + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+class QuantileSketch:
+    """
+    KLL-style sketch: a stack of compactors where level i holds items of
+    weight 2**i. A full level is sorted and every other item is promoted.
+    """
+
+    def __init__(self, capacity=QUANTILE_CAPACITY, seed=0):
+        self.capacity = capacity
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, values):
+        if values.size == 0:
+            return
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        level = 0
+        while level < len(self.levels):
+            if self.levels[level].size > self.capacity:
+                items = np.sort(self.levels[level])
+                offset = int(self._rng.integers(2))
+                promoted = items[offset::2]
+                self.levels[level] = np.empty(0, dtype=np.float64)
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                self.levels[level + 1] = np.concatenate((self.levels[level + 1], promoted))
+            level += 1
+
+    def quantiles(self, probabilities):
+        items = np.concatenate(self.levels)
+        if items.size == 0:
+            return [None] * len(probabilities)
+        weights = np.concatenate([np.full(level.size, 2.0 ** i) for i, level in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        targets = np.asarray(probabilities) * cumulative[-1]
+        positions = np.minimum(np.searchsorted(cumulative, targets, side='left'), items.size - 1)
+        return [float(items[position]) for position in positions]
+
+class ColumnStats:
+    """
+    Incremental statistics for one column
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.numeric = True
+        self.count = 0
+        self.nulls = 0
+        self.minimum = None
+        self.maximum = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.numeric_count = 0
+        self.distinct = HyperLogLog()
+        self.quantiles = QuantileSketch()
+
+    def add_batch(self, values):
+        """
+        Fold a batch of raw values (strings or JSON scalars) into the stats
+        """
+        # Fill a 1-D object array explicitly: np.asarray would turn equal-length
+        # list values (e.g. JSON arrays) into a 2-D array
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+        self.count += column.size
+        is_null = np.fromiter((value is None or (isinstance(value, str) and value in NULL_TOKENS)
+                               for value in column), dtype=bool, count=column.size)
+        self.nulls += int(is_null.sum())
+        present = column[~is_null]
+        if present.size == 0:
+            return
+
+        if self.numeric:
+            try:
+                numbers = np.array([value for value in present
+                                    if not isinstance(value, (bool, list, dict))],
+                                   dtype=np.float64)
+                if numbers.size != present.size:
+                    raise ValueError('booleans and containers are not numeric')
+                self._add_numbers(numbers)
+                return
+            except (TypeError, ValueError):
+                # First non-numeric value: treat the column as text from now on
+                self.numeric = False
+                self.quantiles = None
+
+        self._add_strings(present)
+
+    def _add_numbers(self, numbers):
+        numbers = numbers[np.isfinite(numbers)]
+        if numbers.size == 0:
+            return
+        batch_min = float(numbers.min())
+        batch_max = float(numbers.max())
+        self.minimum = batch_min if self.minimum is None else min(self.minimum, batch_min)
+        self.maximum = batch_max if self.maximum is None else max(self.maximum, batch_max)
+
+        # Merge batch moments (Chan et al.) for a numerically stable mean/variance
+        batch_count = numbers.size
+        batch_mean = float(numbers.mean())
+        batch_m2 = float(((numbers - batch_mean) ** 2).sum())
+        total = self.numeric_count + batch_count
+        delta = batch_mean - self.mean
+        self.mean += delta * batch_count / total
+        self.m2 += batch_m2 + delta * delta * self.numeric_count * batch_count / total
+        self.numeric_count = total
+
+        # Normalize -0.0 so it hashes like 0.0
+        self.distinct.add_hashes(_mix64((numbers + 0.0).view(np.uint64)))
+        self.quantiles.add(numbers)
+
+    def _add_strings(self, present):
+        strings = [value if isinstance(value, str) else json.dumps(value) for value in present]
+        hashes = np.fromiter((hash(value) for value in strings), dtype=np.int64, count=len(strings))
+        self.distinct.add_hashes(_mix64(hashes.view(np.uint64)))
+        batch_min = min(strings)
+        batch_max = max(strings)
+        if self.numeric_count:
+            # Values seen while the column still looked numeric compare as text
+            self.minimum = str(self.minimum)
+            self.maximum = str(self.maximum)
+            self.numeric_count = 0
+        self.minimum = batch_min if self.minimum is None else min(self.minimum, batch_min)
+        self.maximum = batch_max if self.maximum is None else max(self.maximum, batch_max)
+
+    def to_dict(self):
+        result = {
+            'name': self.name,
+            'type': 'numeric' if self.numeric else 'string',
+            'count': self.count,
+            'nulls': self.nulls,
+            'min': self.minimum,
+            'max': self.maximum,
+            'distinct_approx': self.distinct.estimate()
+        }
+        if self.numeric:
+            result['mean'] = self.mean if self.numeric_count else None
+            result['std'] = math.sqrt(self.m2 / self.numeric_count) if self.numeric_count else None
+            result['quantiles_approx'] = dict(zip(
+                (f'p{int(q * 100):02d}' for q in REPORTED_QUANTILES),
+                self.quantiles.quantiles(REPORTED_QUANTILES)
+            ))
+        return result
+
+# Record batch readers
+
+def iter_csv_batches(path, batch_rows=DEFAULT_BATCH_ROWS, delimiter=','):
+    """
+    Yield (column names, list of column value lists) per batch of CSV rows
+    """
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        header = header[:MAX_COLUMNS]
+        width = len(header)
+        columns = [[] for _ in range(width)]
+        rows = 0
+        for row in reader:
+            if not row:
+                continue
+            for index in range(width):
+                columns[index].append(row[index] if index < len(row) else None)
+            rows += 1
+            if rows == batch_rows:
+                yield header, columns
+                columns = [[] for _ in range(width)]
+                rows = 0
+        if rows:
+            yield header, columns
+
+def iter_jsonl_batches(path, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Yield (column names, list of column value lists) per batch of JSON lines.
+    Columns are discovered as they appear, up to MAX_COLUMNS.
+    """
+    names = []
+    positions = {}
+    batch = []
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            for key in record:
+                if key not in positions and len(names) < MAX_COLUMNS:
+                    positions[key] = len(names)
+                    names.append(key)
+            batch.append(record)
+            if len(batch) == batch_rows:
+                yield list(names), [[record.get(name) for record in batch] for name in names]
+                batch = []
+    if batch:
+        yield list(names), [[record.get(name) for record in batch] for name in names]
+
+def detect_format(path):
+    """
+    Guess 'jsonl' or 'csv' from the first non-blank character of the file
+    """
+    with open(path, 'rb') as f:
+        head = f.read(4096).lstrip()
+    return 'jsonl' if head[:1] == b'{' else 'csv'
+
+def analyze_file(path, file_format=None, batch_rows=DEFAULT_BATCH_ROWS, delimiter=',', check=None):
+    """
+    Compute per-column statistics for a CSV or JSON-lines file in one pass
+    """
+    file_format = file_format or detect_format(path)
+    if file_format == 'jsonl':
+        batches = iter_jsonl_batches(path, batch_rows)
+    else:
+        batches = iter_csv_batches(path, batch_rows, delimiter)
+
+    stats = {}
+    rows = 0
+    for names, columns in batches:
+        if check is not None:
+            check()
+        batch_size = len(columns[0]) if columns else 0
+        for name, values in zip(names, columns):
+            column = stats.get(name)
+            if column is None:
+                column = stats[name] = ColumnStats(name)
+                # Rows before the column first appeared count as nulls
+                column.count = column.nulls = rows
+            column.add_batch(values)
+        rows += batch_size
+
+    return {
+        'format': file_format,
+        'rows': rows,
+        'columns': [column.to_dict() for column in stats.values()]
+    }
@@ -0,0 +1,244 @@
+"""
+Completion backends for general assistant queries.
+
+A backend turns a prompt into a stream of text tokens. CompletionService caps
+how many completions run at once. `open()` either takes a slot or raises
+CompletionBusy after waiting `queue_timeout`. It returns a CompletionStream,
+which yields tokens until the backend finishes or the request's deadline
+passes. Closing the stream part-way, for example when an SSE client
+disconnects, closes the backend's generator. That stops the fake backend's
+timer and drops the HTTP connection of a remote one, and the slot is freed.
+
+Backends:
+    fake    canned answers split into words, with configurable latency
+            before the first token and between tokens (default)
+    openai  any OpenAI-compatible /chat/completions endpoint with
+            `stream: true`, over a pooled keep-alive connection
+"""
+import json
+import random
+import re
+import threading
+import time
+
+from services.http_pool import ConnectionPool, UpstreamError
+
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_QUEUE_TIMEOUT = 0.5
+DEFAULT_DEADLINE = 30.0
+
+CANNED_RESPONSES = [
+    "I don't have enough information to answer that question properly. Could you provide more details?",
+    "That's an interesting question. In a full implementation, I would provide a detailed answer.",
+    "I'm designed to understand that query, but my knowledge base is limited in this demo.",
+    "I'd normally respond with information from reliable sources, but I'm running in demo mode.",
+    "Great question! I'd usually connect to an external API to get you the most up-to-date information."
+]
+
+class CompletionError(Exception):
+    """
+    The backend failed to produce a completion
+    """
+
+class CompletionBusy(CompletionError):
+    """
+    Every completion slot stayed taken for the whole queue timeout
+    """
+
+class FakeCompletionBackend:
+    """
+    Streams one of the canned demo answers word by word
+    """
+
+    name = 'fake'
+
+    def __init__(self, token_latency=0.0, first_token_latency=0.0):
+        self.token_latency = token_latency
+        self.first_token_latency = first_token_latency
+        self._answers = [re.findall(r'\S+\s*', response) for response in CANNED_RESPONSES]
+
+    def stream(self, prompt, deadline):
+        tokens = random.choice(self._answers)
+        if not (self.token_latency or self.first_token_latency):
+            yield from tokens
+            return
+        for index, token in enumerate(tokens):
+            delay = self.first_token_latency if index == 0 else self.token_latency
+            if delay:
+                time.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+            yield token
+
+class OpenAICompatibleBackend:
+    """
+    Streams chat completions from an OpenAI-compatible server
+    """
+
+    name = 'openai'
+
+    def __init__(self, url, model, api_key='', max_connections=DEFAULT_MAX_CONCURRENT, timeout=10.0,
+                 system_prompt='You are a helpful desktop assistant. Answer concisely.'):
+        self.model = model
+        self.api_key = api_key
+        self.system_prompt = system_prompt
+        self._pool = ConnectionPool(url, max_connections, timeout)
+
+    def stream(self, prompt, deadline):
+        body = json.dumps({
+            'model': self.model,
+            'stream': True,
+            'messages': [
+                {'role': 'system', 'content': self.system_prompt},
+                {'role': 'user', 'content': prompt}
+            ]
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Accept': 'text/event-stream'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        try:
+            response, connection = self._pool.open('POST', '/chat/completions', body, headers, deadline)
+        except UpstreamError as e:
+            raise CompletionError(str(e)) from e
+
+        completed = False
+        try:
+            if response.status != 200:
+                detail = response.read(500).decode('utf-8', 'replace')
+                raise CompletionError(f'Completion server returned HTTP {response.status}: {detail}')
+            for line in response:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    # Drain the end of the body so the connection can be reused
+                    response.read()
+                    completed = response.isclosed()
+                    return
+                try:
+                    delta = json.loads(data)['choices'][0].get('delta', {})
+                except (ValueError, KeyError, IndexError) as e:
+                    raise CompletionError(f'Invalid completion chunk: {data[:100]}') from e
+                if delta.get('content'):
+                    yield delta['content']
+        except OSError as e:
+            raise CompletionError(f'Completion stream failed: {e}') from e
+        finally:
+            # A stream abandoned part-way leaves unread data, so its
+            # connection can't be reused
+            self._pool.finish(connection, response, completed)
+
+    def stats(self):
+        return self._pool.stats()
+
+def create_backend(name, **options):
+    if name == 'fake':
+        return FakeCompletionBackend(options.get('token_latency', 0.0), options.get('first_token_latency', 0.0))
+    if name == 'openai':
+        return OpenAICompatibleBackend(options['url'], options['model'], options.get('api_key', ''),
+                                       timeout=options.get('timeout', 10.0))
+    raise ValueError(f'Unknown completion backend: {name}')
+
+class CompletionStream:
+    """
+    Tokens of one completion; holds a concurrency slot until closed
+    """
+
+    def __init__(self, service, prompt, deadline):
+        self.deadline = deadline
+        self.truncated = False
+        self.tokens = 0
+        self._service = service
+        self._tokens = service.backend.stream(prompt, deadline)
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._closed:
+            raise StopIteration
+        if time.monotonic() >= self.deadline:
+            self.truncated = True
+            self.close()
+            raise StopIteration
+        try:
+            token = next(self._tokens)
+        except StopIteration:
+            self.close()
+            raise
+        except Exception:
+            self.close()
+            raise
+        self.tokens += 1
+        return token
+
+    def close(self):
+        """
+        Stop the backend and free the slot (idempotent)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._tokens.close()
+        finally:
+            self._service._release()
+
+class CompletionService:
+    """
+    Concurrency-capped access to a completion backend
+    """
+
+    def __init__(self, backend, max_concurrent=DEFAULT_MAX_CONCURRENT, queue_timeout=DEFAULT_QUEUE_TIMEOUT,
+                 deadline=DEFAULT_DEADLINE):
+        self.backend = backend
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._stats = {'started': 0, 'rejected': 0}
+
+    def open(self, prompt, timeout=None):
+        """
+        Start a completion that must finish within `timeout` seconds
+        (capped at the service deadline); raises CompletionBusy
+        """
+        # Try without the timed wait's overhead first
+        if not (self._slots.acquire(blocking=False) or self._slots.acquire(timeout=self.queue_timeout)):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise CompletionBusy(f'All {self.max_concurrent} completion slots are busy')
+        with self._lock:
+            self._active += 1
+            self._stats['started'] += 1
+        timeout = self.deadline if timeout is None else min(timeout, self.deadline)
+        try:
+            return CompletionStream(self, prompt, time.monotonic() + timeout)
+        except BaseException:
+            self._release()
+            raise
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def complete(self, prompt, timeout=None):
+        """
+        The whole completion as one string
+        """
+        stream = self.open(prompt, timeout)
+        try:
+            return ''.join(stream).strip()
+        finally:
+            stream.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, active=self._active, max_concurrent=self.max_concurrent)
+        stats['backend'] = self.backend.name
+        if hasattr(self.backend, 'stats'):
+            stats['upstream'] = self.backend.stats()
+        return stats
@@ -0,0 +1,157 @@
+"""
+Bounded arithmetic expression engine used by the assistant's calculator.
+
+Expressions are parsed with the `ast` module, checked against a whitelist of
+arithmetic nodes and compiled into a tree of closures. Compiled evaluators
+are kept in an LRU cache keyed by the normalized expression and numeric mode.
+
+Every evaluation is bounded: the expression length and node count are capped
+at compile time (the tree has no loops, so the node count is also the number
+of evaluation steps), exponents are capped, and integer results are checked
+against a maximum size before and after each operation that can grow them.
+"""
+import ast
+import decimal
+import math
+import operator
+from fractions import Fraction
+from functools import lru_cache
+
+# Supported numeric modes
+MODE_FLOAT = 'float'
+MODE_DECIMAL = 'decimal'
+MODE_FRACTION = 'fraction'
+NUMERIC_MODES = (MODE_FLOAT, MODE_DECIMAL, MODE_FRACTION)
+
+# Evaluation limits
+MAX_EXPRESSION_LENGTH = 256
+MAX_STEPS = 128
+MAX_EXPONENT = 4096
+MAX_INT_DIGITS = 4300
+DECIMAL_PRECISION = 28
+
+_MAX_INT_BITS = int(MAX_INT_DIGITS * math.log2(10))
+_COMPILE_CACHE_SIZE = 1024
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+class ExpressionError(ValueError):
+    """
+    Raised when an expression is not allowed or exceeds the evaluation limits
+    """
+
+def _int_bits(value):
+    """
+    Return the size in bits of the integer part(s) of an exact value
+    """
+    if isinstance(value, int):
+        return value.bit_length()
+    if isinstance(value, Fraction):
+        return max(value.numerator.bit_length(), value.denominator.bit_length())
+    return 0
+
+def _check_size(value):
+    """
+    Reject exact results that grew beyond MAX_INT_DIGITS
+    """
+    if _int_bits(value) > _MAX_INT_BITS:
+        raise ExpressionError(f'Result exceeds {MAX_INT_DIGITS} digits')
+    return value
+
+def _checked_pow(base, exponent):
+    """
+    Raise base to exponent, refusing results that would be too large
+    """
+    if isinstance(exponent, (int, Fraction, decimal.Decimal)) and exponent == int(exponent):
+        exponent_int = int(exponent)
+        if abs(exponent_int) > MAX_EXPONENT:
+            raise ExpressionError(f'Exponent exceeds {MAX_EXPONENT}')
+        # Estimate the size of an exact result before computing it
+        if _int_bits(base) * abs(exponent_int) > _MAX_INT_BITS:
+            raise ExpressionError(f'Result exceeds {MAX_INT_DIGITS} digits')
+    elif isinstance(exponent, float) and abs(exponent) > MAX_EXPONENT:
+        raise ExpressionError(f'Exponent exceeds {MAX_EXPONENT}')
+    return _check_size(base ** exponent)
+
+def _make_literal(text, value, mode):
+    """
+    Convert a numeric literal to the number type used by the mode
+    """
+    if mode == MODE_DECIMAL:
+        return decimal.Decimal(text)
+    if mode == MODE_FRACTION:
+        return Fraction(text)
+    return value
+
+def _compile_node(node, source, mode, budget):
+    """
+    Compile one whitelisted AST node into a zero-argument evaluator
+    """
+    budget[0] -= 1
+    if budget[0] < 0:
+        raise ExpressionError(f'Expression exceeds {MAX_STEPS} steps')
+
+    if isinstance(node, ast.Constant):
+        if type(node.value) not in (int, float):
+            raise ExpressionError('Only numbers are allowed')
+        value = _make_literal(ast.get_source_segment(source, node), node.value, mode)
+        _check_size(value)
+        return lambda: value
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        unary = _UNARY_OPERATORS[type(node.op)]
+        operand = _compile_node(node.operand, source, mode, budget)
+        return lambda: unary(operand())
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left = _compile_node(node.left, source, mode, budget)
+        right = _compile_node(node.right, source, mode, budget)
+        if isinstance(node.op, ast.Pow):
+            return lambda: _checked_pow(left(), right())
+        binary = _BINARY_OPERATORS[type(node.op)]
+        if isinstance(node.op, (ast.Add, ast.Sub, ast.Mult)):
+            return lambda: _check_size(binary(left(), right()))
+        return lambda: binary(left(), right())
+
+    raise ExpressionError(f'Unsupported syntax: {type(node).__name__}')
+
+@lru_cache(maxsize=_COMPILE_CACHE_SIZE)
+def compile_expression(expression, mode=MODE_FLOAT):
+    """
+    Compile a normalized arithmetic expression into a cached evaluator
+    """
+    if mode not in NUMERIC_MODES:
+        raise ExpressionError(f'Unknown numeric mode: {mode}')
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f'Expression exceeds {MAX_EXPRESSION_LENGTH} characters')
+
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError:
+        raise ExpressionError('Invalid expression')
+
+    return _compile_node(tree.body, expression, mode, [MAX_STEPS])
+
+def evaluate_expression(expression, mode=MODE_FLOAT):
+    """
+    Evaluate an arithmetic expression within the engine's limits
+    """
+    evaluator = compile_expression(expression, mode)
+    if mode == MODE_DECIMAL:
+        with decimal.localcontext() as context:
+            context.prec = DECIMAL_PRECISION
+            return evaluator()
+    return evaluator()
@@ -0,0 +1,68 @@
+"""
+Commands that can be run on uploaded files through the job scheduler.
+
+Every handler takes the running Job, the stored file's path and the
+command's options, and must call `job.check_cancelled()` regularly.
+"""
+import os
+
+from services.summarizer import summarize_file, DEFAULT_TOP_K
+from services.column_analyzer import analyze_file, DEFAULT_BATCH_ROWS
+
+def _int_option(options, name, default=None):
+    value = options.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+
+def summarize(job, path, **options):
+    """
+    Extract the most informative sentences (or log lines) of a file.
+
+    Options: top_k, mode ('text' or 'log', detected if omitted), and
+    range_start/range_end to summarize only a byte range of the file.
+    """
+    size = os.path.getsize(path)
+    start = max(_int_option(options, 'range_start', 0), 0)
+    end = min(_int_option(options, 'range_end', size), size)
+    top_k = max(1, min(_int_option(options, 'top_k', DEFAULT_TOP_K), 100))
+    mode = options.get('mode') or None
+    if mode not in (None, 'text', 'log'):
+        raise ValueError(f'Unknown summarize mode: {mode}')
+    
+    result = summarize_file(path, top_k=top_k, start=start, end=end, mode=mode,
+                            check=job.check_cancelled)
+    result['size'] = size
+    result['range'] = [start, end]
+    return result
+
+def analyze(job, path, **options):
+    """
+    Compute per-column statistics for a CSV or JSON-lines file.
+
+    Options: format ('csv' or 'jsonl', detected if omitted), delimiter
+    (CSV only) and batch_rows.
+    """
+    file_format = options.get('format') or None
+    if file_format not in (None, 'csv', 'jsonl'):
+        raise ValueError(f'Unknown analyze format: {file_format}')
+    batch_rows = max(1, min(_int_option(options, 'batch_rows', DEFAULT_BATCH_ROWS), 1000000))
+    delimiter = options.get('delimiter') or ','
+    
+    return analyze_file(path, file_format=file_format, batch_rows=batch_rows,
+                        delimiter=delimiter, check=job.check_cancelled)
+
+FILE_COMMANDS = {
+    'summarize': summarize,
+    'analyze': analyze
+}
+
+def register_file_commands(scheduler):
+    """
+    Register every file command with a JobScheduler
+    """
+    for command, handler in FILE_COMMANDS.items():
+        scheduler.register(command, handler)
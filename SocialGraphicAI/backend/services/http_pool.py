@@ -0,0 +1,154 @@
+"""
+Keep-alive HTTP connection pool for calls to upstream services.
+
+Each ConnectionPool talks to one origin (scheme, host, port). Idle
+connections are kept on a stack so the most recently used, and so most
+likely still open, is reused first. At most `max_connections` are open at
+once; a caller that finds none free waits up to `acquire_timeout` and then
+gets PoolTimeout instead of queueing forever.
+
+Every socket operation is bounded by `timeout` seconds, and
+`request(deadline=...)` also caps the whole exchange at an absolute
+time.monotonic() deadline. A request that fails on a reused connection
+because the server had closed it is retried once on a fresh connection,
+unless the method isn't idempotent.
+"""
+import http.client
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_MAX_CONNECTIONS = 8
+
+_IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+# Raised when a kept-alive connection turns out to be closed
+_STALE_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+class UpstreamError(Exception):
+    """
+    An upstream request failed or timed out
+    """
+
+class PoolTimeout(UpstreamError):
+    """
+    No connection became free in time
+    """
+
+class ConnectionPool:
+    """
+    Bounded pool of keep-alive connections to one origin
+    """
+
+    def __init__(self, url, max_connections=DEFAULT_MAX_CONNECTIONS, timeout=DEFAULT_TIMEOUT,
+                 acquire_timeout=None):
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported URL scheme: {parts.scheme}')
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.acquire_timeout = timeout if acquire_timeout is None else acquire_timeout
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        self.created += 1
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self, deadline):
+        wait = self.acquire_timeout
+        if deadline is not None:
+            wait = min(wait, max(0.0, deadline - time.monotonic()))
+        if not self._slots.acquire(timeout=wait):
+            raise PoolTimeout(f'No free connection to {self.host} within {wait:.2f}s')
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, connection, reusable):
+        if reusable:
+            with self._lock:
+                self._idle.append(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def request(self, method, path, body=None, headers=None, deadline=None):
+        """
+        Send a request and read the whole response; returns (status, headers, body)
+        """
+        attempts = 2 if method in _IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            response, connection = self.open(method, path, body, headers, deadline, retry=attempt + 1 < attempts)
+            if response is None:
+                continue
+            try:
+                data = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                self._release(connection, False)
+                raise UpstreamError(f'{method} {self.host}{path}: {e}') from e
+            self._release(connection, not response.will_close)
+            return response.status, dict(response.getheaders()), data
+        raise UpstreamError(f'{method} {self.host}{path}: connection closed')
+
+    def open(self, method, path, body=None, headers=None, deadline=None, retry=False):
+        """
+        Send a request and return (response, connection) once the headers
+        have arrived, for callers that stream the body. The caller must pass
+        the connection to `finish()`. Returns (None, None) when a reused
+        connection was stale and `retry` is set.
+        """
+        connection, reused = self._acquire(deadline)
+        try:
+            timeout = self.timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout('deadline exceeded')
+                timeout = min(timeout, remaining)
+            connection.timeout = timeout
+            if connection.sock is not None:
+                connection.sock.settimeout(timeout)
+            connection.request(method, self.base_path + path, body=body, headers=headers or {})
+            return connection.getresponse(), connection
+        except _STALE_ERRORS as e:
+            self._release(connection, False)
+            if reused and retry:
+                # The other idle connections have probably timed out too
+                self.close()
+                return None, None
+            raise UpstreamError(f'{method} {self.host}{path}: {e}') from e
+        except (OSError, http.client.HTTPException) as e:
+            self._release(connection, False)
+            raise UpstreamError(f'{method} {self.host}{path}: {e}') from e
+        except BaseException:
+            self._release(connection, False)
+            raise
+
+    def finish(self, connection, response, completed):
+        """
+        Return a connection from `open()`; it is only kept if the response
+        was read to the end
+        """
+        self._release(connection, completed and not response.will_close)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def stats(self):
+        with self._lock:
+            idle = len(self._idle)
+        return {'host': self.host, 'idle': idle, 'created': self.created, 'reused': self.reused}
@@ -0,0 +1,161 @@
+"""
+Keyword tables for intent detection.
+
+INTENT_KEYWORDS holds the English phrases, which apply to every language
+because users often type English whatever their UI language is.
+NATIVE_INTENT_KEYWORDS adds phrases for each other supported language.
+Tables are in priority order: when a query matches phrases from several
+intents, the one listed first wins.
+
+Queries and phrases both go through normalize_text (NFKC, then casefold), so
+full-width forms, compatibility characters and case differences all compare
+equal: 'ＣＰＵ' matches 'cpu' and 'Schließe' matches 'schliesse'.
+"""
+import unicodedata
+
+INTENT_KEYWORDS = [
+    ('code_generation', [
+        'write code', 'generate code', 'write a function', 'create a class',
+        'python script', 'javascript function', 'html', 'css', 'java class',
+        'code for', 'generate a program', 'code to', 'write program'
+    ]),
+    ('system_command', [
+        'open ', 'run ', 'execute ', 'start ', 'launch ',
+        'close ', 'kill ', 'stop ', 'terminate '
+    ]),
+    ('system_monitor', [
+        'system resources', 'ram usage', 'cpu usage', 'memory usage',
+        'disk space', 'battery', 'system stats', 'performance'
+    ]),
+    ('weather', [
+        'weather', 'temperature', 'forecast', 'rain', 'sunny',
+        'weather in', 'weather for', 'how\'s the weather'
+    ]),
+    ('time', [
+        'time', 'current time', 'what time', 'clock', 'what\'s the time'
+    ]),
+    ('joke', [
+        'joke', 'tell me a joke', 'something funny', 'make me laugh'
+    ]),
+    ('calculation', [
+        '+', '-', '*', '/', '^', '%',
+        'calculate', 'compute', 'sum', 'add', 'subtract', 'multiply', 'divide',
+        'square root', 'power', 'percent', 'calculator'
+    ])
+]
+
+NATIVE_INTENT_KEYWORDS = {
+    'hi': {
+        'code_generation': ['कोड लिखो', 'कोड लिखें', 'प्रोग्राम लिखो', 'फ़ंक्शन लिखो', 'स्क्रिप्ट'],
+        'system_command': ['खोलो', 'खोलें', 'चालू करो', 'बंद करो', 'शुरू करो'],
+        'system_monitor': ['सिस्टम संसाधन', 'मेमोरी उपयोग', 'सीपीयू', 'बैटरी', 'डिस्क स्थान'],
+        'weather': ['मौसम', 'तापमान', 'बारिश', 'पूर्वानुमान'],
+        'time': ['समय', 'कितने बजे', 'बजे हैं'],
+        'joke': ['चुटकुला', 'मज़ाक', 'हंसाओ'],
+        'calculation': ['गणना', 'जोड़ो', 'घटाओ', 'गुणा', 'भाग दो', 'कितना होता है', 'वर्गमूल', 'प्रतिशत'],
+    },
+    'bn': {
+        'code_generation': ['কোড লেখ', 'প্রোগ্রাম লেখ', 'ফাংশন লেখ', 'স্ক্রিপ্ট'],
+        'system_command': ['খোলো', 'খুলুন', 'চালু কর', 'বন্ধ কর'],
+        'system_monitor': ['সিস্টেম রিসোর্স', 'মেমরি ব্যবহার', 'সিপিইউ', 'ব্যাটারি', 'ডিস্ক স্পেস'],
+        'weather': ['আবহাওয়া', 'তাপমাত্রা', 'বৃষ্টি', 'পূর্বাভাস'],
+        'time': ['কয়টা বাজে', 'কটা বাজে', 'সময়'],
+        'joke': ['কৌতুক', 'জোকস', 'হাসাও'],
+        'calculation': ['হিসাব', 'যোগ কর', 'বিয়োগ', 'গুণ', 'ভাগ কর', 'কত হয়', 'বর্গমূল', 'শতাংশ'],
+    },
+    'fr': {
+        'code_generation': ['écris du code', 'écrire du code', 'génère du code', 'écris une fonction',
+                            'script python', 'code python', 'code pour'],
+        'system_command': ['ouvre ', 'ouvrir ', 'lance ', 'lancer ', 'ferme ', 'fermer ', 'démarre ', 'exécute '],
+        'system_monitor': ['ressources système', 'utilisation du processeur', 'utilisation de la mémoire',
+                           'espace disque', 'batterie'],
+        'weather': ['météo', 'quel temps', 'température', 'pluie', 'prévisions', 'ensoleillé'],
+        'time': ['quelle heure', "l'heure", 'heure actuelle'],
+        'joke': ['blague', 'quelque chose de drôle', 'fais-moi rire'],
+        'calculation': ['calcule', 'calculer', 'combien font', 'combien fait', 'racine carrée', 'multiplie',
+                        'divise', 'pourcentage'],
+    },
+    'es': {
+        'code_generation': ['escribe código', 'escribir código', 'genera código', 'escribe una función',
+                            'código en', 'código para', 'script de python'],
+        'system_command': ['abre ', 'abrir ', 'ejecuta ', 'inicia ', 'cierra ', 'cerrar '],
+        'system_monitor': ['recursos del sistema', 'uso de cpu', 'uso de memoria', 'espacio en disco', 'batería'],
+        'weather': ['qué tiempo', 'clima', 'temperatura', 'lluvia', 'pronóstico', 'soleado'],
+        'time': ['qué hora', 'la hora', 'hora actual'],
+        'joke': ['chiste', 'algo gracioso', 'hazme reír'],
+        'calculation': ['calcula', 'cuánto es', 'cuánto son', 'raíz cuadrada', 'multiplica', 'divide',
+                        'porcentaje', 'suma', 'resta'],
+    },
+    'de': {
+        'code_generation': ['schreibe code', 'schreib code', 'erzeuge code', 'python-code', 'code für',
+                            'schreibe eine funktion', 'skript'],
+        'system_command': ['öffne ', 'starte ', 'schließe ', 'beende ', 'führe '],
+        'system_monitor': ['systemressourcen', 'cpu-auslastung', 'speicherauslastung', 'arbeitsspeicher',
+                           'speicherplatz', 'akku'],
+        'weather': ['wetter', 'temperatur', 'regen', 'vorhersage', 'sonnig'],
+        'time': ['wie spät', 'uhrzeit', 'wie viel uhr'],
+        'joke': ['witz', 'etwas lustiges', 'bring mich zum lachen'],
+        'calculation': ['berechne', 'rechne', ' mal ', ' plus ', ' minus ', 'geteilt durch', 'wurzel', 'prozent'],
+    },
+    'ja': {
+        'code_generation': ['コードを書', 'コードを生成', 'プログラムを書', '関数を書', 'スクリプト'],
+        'system_command': ['を開いて', 'を起動', 'を閉じて', 'を終了'],
+        'system_monitor': ['システムリソース', 'cpu使用率', 'メモリ使用量', 'ディスク容量', 'バッテリー'],
+        'weather': ['天気', '気温', '雨', '晴れ'],
+        'time': ['何時', '時刻'],
+        'joke': ['冗談', 'ジョーク', '笑わせて'],
+        'calculation': ['計算', 'かける', 'たす', 'ひく', 'わる', '平方根', 'パーセント'],
+    },
+    'zh': {
+        'code_generation': ['写代码', '编写代码', '生成代码', '写一个函数', '写程序', '脚本'],
+        'system_command': ['打开', '启动', '关闭', '运行', '退出'],
+        'system_monitor': ['系统资源', 'cpu使用率', '内存使用', '磁盘空间', '电池'],
+        'weather': ['天气', '气温', '下雨', '晴天'],
+        'time': ['几点', '时间'],
+        'joke': ['笑话', '逗我笑'],
+        'calculation': ['计算', '乘以', '除以', '加上', '减去', '等于多少', '平方根', '百分之'],
+    },
+    'ar': {
+        'code_generation': ['اكتب كود', 'اكتب برنامج', 'اكتب دالة', 'أنشئ كود', 'سكريبت'],
+        'system_command': ['افتح ', 'شغل ', 'أغلق ', 'اغلق ', 'أوقف '],
+        'system_monitor': ['موارد النظام', 'استخدام المعالج', 'استخدام الذاكرة', 'مساحة القرص', 'البطارية'],
+        'weather': ['الطقس', 'درجة الحرارة', 'مطر', 'توقعات', 'مشمس'],
+        'time': ['كم الساعة', 'الوقت'],
+        'joke': ['نكتة', 'شيء مضحك', 'أضحكني'],
+        'calculation': ['احسب', 'كم يساوي', 'ضرب', 'قسمة', 'الجذر التربيعي', 'بالمئة'],
+    },
+    'ru': {
+        'code_generation': ['напиши код', 'написать код', 'сгенерируй код', 'напиши функцию', 'код на', 'скрипт'],
+        'system_command': ['открой ', 'запусти ', 'закрой ', 'останови ', 'выполни '],
+        'system_monitor': ['системные ресурсы', 'загрузка процессора', 'использование памяти', 'место на диске',
+                           'батарея'],
+        'weather': ['погода', 'погоды', 'погоду', 'температура', 'дождь', 'прогноз', 'солнечно'],
+        'time': ['который час', 'сколько времени', 'время'],
+        'joke': ['анекдот', 'шутку', 'шутка', 'рассмеши'],
+        'calculation': ['посчитай', 'вычисли', 'сколько будет', 'умножить', 'разделить', 'плюс', 'минус',
+                        'квадратный корень', 'процент'],
+    },
+}
+
+def normalize_text(text):
+    """
+    NFKC then casefold; ASCII text only needs lowercasing, and text that
+    is already NFKC (most typed input) only needs casefolding
+    """
+    if text.isascii():
+        return text.lower()
+    if not unicodedata.is_normalized('NFKC', text):
+        text = unicodedata.normalize('NFKC', text)
+    return text.casefold()
+
+def keywords_for(language):
+    """
+    The keyword table for one language: English phrases plus its own,
+    normalized, in priority order
+    """
+    native = NATIVE_INTENT_KEYWORDS.get(language, {})
+    table = []
+    for intent, phrases in INTENT_KEYWORDS:
+        merged = dict.fromkeys(normalize_text(phrase) for phrase in phrases + native.get(intent, []))
+        table.append((intent, list(merged)))
+    return table
@@ -0,0 +1,352 @@
+"""
+Bounded background job scheduler for file commands.
+
+Jobs are queued on a fixed-size queue and run by a fixed pool of worker
+threads, so heavy file processing never runs on an HTTP worker thread.
+Submitting to a full queue raises QueueFull (the API answers 429).
+Cancellation is cooperative: queued jobs are skipped, and running handlers
+call `job.check_cancelled()` between units of work. Finished jobs are kept
+for a limited time and count, oldest evicted first.
+
+With a `state_dir`, every job's state is also written to `<id>.json` there,
+so any server process can report a job's status, and cancelling a job owned
+by another process leaves a `<id>.cancel` marker that its handler picks up.
+Queue depth and worker limits still apply per process.
+
+Jobs live in the memory of the process that accepted them, so they are lost
+when that process exits (a recycled or reloaded server worker). Each state
+file records the owner's pid; an unfinished job whose owner is gone is
+marked failed (or cancelled, if that was requested) the next time any
+process reads or sweeps its state.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+_JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+_STATE_SWEEP_INTERVAL = 60
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+class QueueFull(Exception):
+    """
+    Raised when the job queue is at capacity
+    """
+
+class JobCancelled(Exception):
+    """
+    Raised inside a handler when its job has been cancelled
+    """
+
+class Job:
+    """
+    One unit of background work and its outcome
+    """
+
+    def __init__(self, command, args, options):
+        self.id = uuid.uuid4().hex
+        self.owner_pid = os.getpid()
+        self.command = command
+        self.args = args
+        self.options = options
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        # Set by a scheduler with shared state
+        self._cancel_marker = None
+
+    @property
+    def cancel_requested(self):
+        if not self._cancel_event.is_set() and self._cancel_marker is not None:
+            # Cancellation requested through another server process
+            if os.path.exists(self._cancel_marker):
+                self._cancel_event.set()
+        return self._cancel_event.is_set()
+
+    def check_cancelled(self):
+        """
+        Raise JobCancelled if cancellation was requested
+        """
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'command': self.command,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'owner_pid': self.owner_pid
+        }
+
+class JobScheduler:
+    """
+    Fixed worker pool fed by a bounded queue
+    """
+
+    def __init__(self, max_workers=2, max_queue=64, max_retained=1000, retention_seconds=3600,
+                 state_dir=None):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_retained = max_retained
+        self.retention_seconds = retention_seconds
+        self.state_dir = state_dir
+        self._last_state_sweep = 0.0
+        if state_dir is not None:
+            os.makedirs(state_dir, exist_ok=True)
+        self._handlers = {}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._persist_lock = threading.Lock()
+        self._workers = []
+
+    @property
+    def commands(self):
+        return sorted(self._handlers)
+
+    def register(self, command, handler):
+        """
+        Register handler(job, *args, **options) for a command
+        """
+        self._handlers[command] = handler
+
+    def _ensure_workers(self):
+        # Workers start on first use so each forked server process gets its own
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.max_workers:
+                worker = threading.Thread(target=self._work, name=f'job-worker-{len(self._workers)}',
+                                          daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, command, *args, **options):
+        """
+        Queue a job; raises KeyError for unknown commands and QueueFull
+        when the queue is at capacity
+        """
+        if command not in self._handlers:
+            raise KeyError(command)
+        self._ensure_workers()
+
+        job = Job(command, args, options)
+        job._cancel_marker = self._state_path(job.id, '.cancel')
+        with self._lock:
+            evicted = self._evict()
+            try:
+                self._queue.put_nowait(job)
+                self._jobs[job.id] = job
+            except queue.Full:
+                job = None
+        # State files are written outside the lock
+        for job_id in evicted:
+            self._remove_state(job_id)
+        self._sweep_state()
+        if job is None:
+            raise QueueFull(f'Job queue is full ({self.max_queue} jobs)')
+        self._persist(job)
+        return job
+
+    def get(self, job_id):
+        """
+        Return a job's state as a dict, or None if unknown or evicted
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        return self._load(job_id)
+
+    def cancel(self, job_id):
+        """
+        Request cancellation; returns the job's state, or None if unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            cancelled = False
+            if job is not None:
+                if job.status not in FINISHED_STATES:
+                    job._cancel_event.set()
+                    if job.status == QUEUED:
+                        self._set_outcome(job, CANCELLED)
+                        cancelled = True
+                state = job.to_dict()
+        if job is not None:
+            if cancelled:
+                self._persist(job)
+            return state
+
+        # Owned by another process: leave a marker for its handler
+        state = self._load(job_id)
+        if state is not None and state['status'] not in FINISHED_STATES:
+            open(self._state_path(job_id, '.cancel'), 'w').close()
+            state['cancel_requested'] = True
+        return state
+
+    def stats(self):
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue': self.max_queue,
+                'workers': self.max_workers,
+                'jobs': counts,
+                'commands': self.commands
+            }
+
+    def _set_outcome(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+
+    def _finish(self, job, status, result=None, error=None):
+        self._set_outcome(job, status, result, error)
+        self._persist(job)
+
+    # Shared job state
+
+    def _state_path(self, job_id, suffix='.json'):
+        if self.state_dir is None or not _JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        return os.path.join(self.state_dir, job_id + suffix)
+
+    def _persist(self, job):
+        # Serialized so a stale state can never replace a newer one
+        with self._persist_lock:
+            self._write_state(job.id, job.to_dict())
+
+    def _write_state(self, job_id, state):
+        path = self._state_path(job_id)
+        if path is None:
+            return
+        try:
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error saving state of job {job_id}: {str(e)}")
+
+    def _load(self, job_id):
+        path = self._state_path(job_id)
+        if path is None:
+            return None
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state['status'] not in FINISHED_STATES and self._orphaned(state):
+            # Its owner exited before finishing it, so nothing else will
+            cancelled = os.path.exists(self._state_path(job_id, '.cancel'))
+            state.update(status=CANCELLED if cancelled else FAILED, finished_at=time.time(),
+                         error=None if cancelled else 'The server process running this job exited')
+            self._write_state(job_id, state)
+        return state
+
+    def _orphaned(self, state):
+        """
+        Whether an unfinished job's owning process has exited
+        """
+        pid = state.get('owner_pid')
+        if not isinstance(pid, int) or pid <= 0:
+            # Written before owners were recorded
+            return True
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            pass
+        return False
+
+    def _remove_state(self, job_id):
+        for suffix in ('.json', '.cancel'):
+            path = self._state_path(job_id, suffix)
+            if path is not None and os.path.exists(path):
+                os.remove(path)
+
+    def _sweep_state(self):
+        """
+        Fail jobs of exited processes and remove expired state left behind
+        by other (possibly dead) processes
+        """
+        now = time.time()
+        with self._lock:
+            if self.state_dir is None or now - self._last_state_sweep < _STATE_SWEEP_INTERVAL:
+                return
+            self._last_state_sweep = now
+        cutoff = now - self.retention_seconds
+        for name in os.listdir(self.state_dir):
+            job_id, suffix = os.path.splitext(name)
+            if suffix != '.json':
+                continue
+            state = self._load(job_id)
+            if state and state['status'] in FINISHED_STATES and (state['finished_at'] or 0) < cutoff:
+                self._remove_state(job_id)
+
+    def _evict(self):
+        """
+        Drop finished jobs beyond the retention limits (caller holds the
+        lock); returns their ids so the caller can remove their state files
+        """
+        cutoff = time.time() - self.retention_seconds
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATES]
+        excess = len(self._jobs) - self.max_retained
+        evicted = []
+        for job in finished:
+            if excess <= 0 and job.finished_at >= cutoff:
+                break
+            del self._jobs[job.id]
+            evicted.append(job.id)
+            excess -= 1
+        return evicted
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                with self._lock:
+                    if job.status != QUEUED:
+                        continue
+                    if job.cancel_requested:
+                        self._set_outcome(job, CANCELLED)
+                    else:
+                        job.status = RUNNING
+                        job.started_at = time.time()
+                self._persist(job)
+                if job.status == CANCELLED:
+                    continue
+                try:
+                    result = self._handlers[job.command](job, *job.args, **job.options)
+                    self._finish(job, SUCCEEDED, result=result)
+                except JobCancelled:
+                    self._finish(job, CANCELLED)
+                except Exception as e:
+                    print(f"Error running {job.command} job {job.id}: {str(e)}")
+                    self._finish(job, FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,296 @@
+"""
+Request and intent metrics in Prometheus text format.
+
+Counters and fixed-bucket histograms are kept in plain dicts keyed by label
+values and updated under one lock. Call sites guard every update with
+`metrics.enabled`, so a disabled registry costs one attribute check.
+
+Each server process counts on its own. With a `shared_dir`, every process
+periodically writes its totals to `<shared_dir>/metrics-<pid>.json`, and
+rendering sums the files of all processes. When a process has exited, its
+totals are folded into `metrics-archive.json` so counters never go back.
+"""
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow handlers
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+_ARCHIVE_FILE = 'metrics-archive.json'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic counter with fixed label names
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.values = {}
+
+    def inc(self, *label_values, amount=1):
+        # Caller holds the registry lock
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def export(self):
+        return {json.dumps(key): value for key, value in self.values.items()}
+
+    @staticmethod
+    def merge(total, exported):
+        for key, value in exported.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, exported):
+        for key, value in sorted(exported.items()):
+            yield f'{self.name}{_format_labels(self.labels, json.loads(key))} {_format_number(value)}'
+
+class Histogram:
+    """
+    Fixed-bucket histogram with fixed label names
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+
+    def observe(self, value, *label_values):
+        # Caller holds the registry lock
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def export(self):
+        return {json.dumps(key): list(series) for key, series in self.values.items()}
+
+    @staticmethod
+    def merge(total, exported):
+        for key, series in exported.items():
+            current = total.get(key)
+            if current is None:
+                total[key] = list(series)
+            else:
+                for index, value in enumerate(series):
+                    current[index] += value
+
+    def render(self, exported):
+        bounds = [_format_number(bound) for bound in self.buckets] + ['+Inf']
+        for key, series in sorted(exported.items()):
+            label_values = json.loads(key)
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, (('le', bound),))
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = _format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{labels} {_format_number(series[-1])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+class MetricsRegistry:
+    """
+    The set of metrics exposed on /metrics
+    """
+
+    def __init__(self, enabled=True, shared_dir=None, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.enabled = enabled
+        self.shared_dir = None
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self._metrics = {}
+        self._flusher = None
+        self._flusher_pid = None
+        if shared_dir is not None:
+            self.share(shared_dir)
+
+    def share(self, shared_dir):
+        """
+        Aggregate across processes through files in `shared_dir`
+        """
+        os.makedirs(shared_dir, exist_ok=True)
+        self.shared_dir = shared_dir
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _export(self):
+        with self.lock:
+            return {name: metric.export() for name, metric in self._metrics.items()}
+
+    # Cross-process aggregation
+
+    def start_flusher(self):
+        """
+        Start the thread that publishes this process's totals (idempotent;
+        restarts in a forked child)
+        """
+        if self.shared_dir is None or not self.enabled:
+            return
+        if self._flusher_pid == os.getpid() and self._flusher.is_alive():
+            return
+        self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Error writing metrics: {str(e)}")
+
+    def flush(self):
+        """
+        Write this process's totals to its file in the shared directory
+        """
+        path = os.path.join(self.shared_dir, f'metrics-{os.getpid()}.json')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._export(), f)
+        os.replace(tmp_path, path)
+
+    def _merged_exports(self):
+        """
+        Sum the totals of every process, archiving those of exited ones
+        """
+        self.flush()
+        archive_path = os.path.join(self.shared_dir, _ARCHIVE_FILE)
+        lock_fd = os.open(archive_path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            archive = self._read_export(archive_path) or {}
+            archived = False
+            totals = {}
+            for name in os.listdir(self.shared_dir):
+                if not (name.startswith('metrics-') and name.endswith('.json')) or name == _ARCHIVE_FILE:
+                    continue
+                path = os.path.join(self.shared_dir, name)
+                exported = self._read_export(path)
+                if exported is None:
+                    continue
+                if self._process_alive(int(name[len('metrics-'):-len('.json')])):
+                    self._merge_into(totals, exported)
+                else:
+                    self._merge_into(archive, exported)
+                    os.remove(path)
+                    archived = True
+            if archived:
+                tmp_path = archive_path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(archive, f)
+                os.replace(tmp_path, archive_path)
+            self._merge_into(totals, archive)
+            return totals
+        finally:
+            os.close(lock_fd)
+
+    def _merge_into(self, totals, exported):
+        for name, series in exported.items():
+            metric = self._metrics.get(name)
+            if metric is not None:
+                metric.merge(totals.setdefault(name, {}), series)
+
+    @staticmethod
+    def _read_export(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _process_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def render(self):
+        """
+        Render every metric in Prometheus text exposition format
+        """
+        exports = self._merged_exports() if self.shared_dir is not None else self._export()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f'# HELP {name} {metric.help}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.render(exports.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+def _env_enabled():
+    return os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+# Process-wide registry; the app points `shared_dir` at its data directory
+metrics = MetricsRegistry(enabled=_env_enabled())
+
+http_requests = metrics.counter(
+    'assistant_http_requests_total', 'HTTP requests by route, method and status',
+    ('route', 'method', 'status'))
+http_errors = metrics.counter(
+    'assistant_http_request_errors_total', 'HTTP requests that raised or answered 5xx',
+    ('route', 'method'))
+http_latency = metrics.histogram(
+    'assistant_http_request_duration_seconds', 'Time spent in route handlers',
+    ('route', 'method'))
+intent_latency = metrics.histogram(
+    'assistant_intent_duration_seconds', 'Time spent in process_query intent handlers',
+    ('intent',))
+intent_errors = metrics.counter(
+    'assistant_intent_errors_total', 'Intent handlers that raised', ('intent',))
+intent_cache_hits = metrics.counter(
+    'assistant_intent_cache_hits_total', 'Queries answered from the response cache', ('intent',))
+
+def observe_request(route, method, status, elapsed):
+    with metrics.lock:
+        http_requests.inc(route, method, str(status))
+        http_latency.observe(elapsed, route, method)
+        if status >= 500:
+            http_errors.inc(route, method)
+
+def observe_intent(intent, elapsed):
+    with metrics.lock:
+        intent_latency.observe(elapsed, intent)
+
+def count_intent_error(intent):
+    with metrics.lock:
+        intent_errors.inc(intent)
+
+def count_cache_hit(intent):
+    with metrics.lock:
+        intent_cache_hits.inc(intent)
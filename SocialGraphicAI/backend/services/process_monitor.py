@@ -0,0 +1,108 @@
+"""
+Top-N process breakdown by CPU, resident memory and disk I/O.
+
+A sweep is a single `psutil.process_iter(attrs=...)` pass, which reads every
+attribute for a process in one go. Between sweeps the monitor keeps the CPU
+time and I/O counters last seen for each process, so CPU percentages and
+I/O rates come from deltas instead of blocking per-process measurements.
+Sweeps closer together than `min_sweep_interval` reuse the previous result.
+"""
+import heapq
+import threading
+import time
+
+import psutil
+
+MB = 1024 * 1024
+
+_SWEEP_ATTRS = ['pid', 'name', 'username', 'create_time', 'cpu_times', 'memory_info', 'io_counters']
+
+# Sort keys accepted by top()
+SORT_KEYS = {
+    'cpu': 'cpu_percent',
+    'memory': 'rss_mb',
+    'io': 'io_bytes_per_sec'
+}
+
+class ProcessMonitor:
+    """
+    Caches per-process counters between sweeps to compute usage deltas
+    """
+
+    def __init__(self, min_sweep_interval=1.0):
+        self.min_sweep_interval = min_sweep_interval
+        # pid -> (create_time, cpu seconds, io bytes, sweep time)
+        self._previous = {}
+        self._processes = []
+        self._last_sweep = None
+        self._lock = threading.Lock()
+
+    def sweep(self):
+        """
+        Refresh the per-process usage table and return it
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._last_sweep is not None and now - self._last_sweep < self.min_sweep_interval:
+                return self._processes
+
+            wall_now = time.time()
+            current = {}
+            processes = []
+            for proc in psutil.process_iter(attrs=_SWEEP_ATTRS, ad_value=None):
+                info = proc.info
+                pid = info['pid']
+                create_time = info['create_time'] or 0.0
+                cpu_times = info['cpu_times']
+                cpu_total = cpu_times.user + cpu_times.system if cpu_times else 0.0
+                io = info['io_counters']
+                io_total = io.read_bytes + io.write_bytes if io else None
+
+                previous = self._previous.get(pid)
+                if previous is not None and previous[0] == create_time:
+                    elapsed = now - previous[3]
+                    cpu_percent = (cpu_total - previous[1]) / elapsed * 100 if elapsed > 0 else 0.0
+                    io_rate = ((io_total - previous[2]) / elapsed
+                               if elapsed > 0 and io_total is not None and previous[2] is not None
+                               else 0.0)
+                else:
+                    # New process (or reused PID): fall back to its lifetime average
+                    lifetime = wall_now - create_time if create_time else 0.0
+                    cpu_percent = cpu_total / lifetime * 100 if lifetime > 0 else 0.0
+                    io_rate = 0.0
+                current[pid] = (create_time, cpu_total, io_total, now)
+
+                memory_info = info['memory_info']
+                processes.append({
+                    'pid': pid,
+                    'name': info['name'],
+                    'username': info['username'],
+                    'cpu_percent': round(max(cpu_percent, 0.0), 1),
+                    'rss_mb': round(memory_info.rss / MB, 1) if memory_info else 0.0,
+                    'io_bytes_per_sec': round(max(io_rate, 0.0), 1)
+                })
+
+            # Dropping unseen PIDs keeps the cache the size of the process table
+            self._previous = current
+            self._processes = processes
+            self._last_sweep = now
+            return processes
+
+    def top(self, limit=10, sort_by='cpu'):
+        """
+        Return the `limit` heaviest processes by 'cpu', 'memory' or 'io'
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f'Unknown sort key: {sort_by}')
+        key = SORT_KEYS[sort_by]
+        return heapq.nlargest(limit, self.sweep(), key=lambda proc: proc[key])
+
+    def breakdown(self, limit=5):
+        """
+        Return the top processes for every sort key from a single sweep
+        """
+        processes = self.sweep()
+        return {
+            sort_by: heapq.nlargest(limit, processes, key=lambda proc, key=key: proc[key])
+            for sort_by, key in SORT_KEYS.items()
+        }
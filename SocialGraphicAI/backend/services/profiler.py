@@ -0,0 +1,332 @@
+"""
+On-demand sampling profiler for assistant requests.
+
+Profiling is armed for the next N assistant requests, optionally only those
+whose detected intent matches. While a profiled request runs, a sampler
+thread reads its stack from `sys._current_frames()` every few milliseconds.
+Stacks are aggregated per function and exported as collapsed stacks (for
+flamegraph.pl / speedscope) or as speedscope JSON.
+
+Control state and results live in a directory shared by all server
+processes. Arming writes `control.json`; a watcher thread in each process
+notices within a second. Every recorded request claims one unit of the
+budget under a file lock, and each process writes its stacks to
+`<profile id>-<pid>.json`, which the reports merge. When disarmed, a request
+pays one attribute check; with no directory configured, nothing runs at all.
+"""
+import fcntl
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+DEFAULT_INTERVAL = 0.001
+MAX_REQUESTS = 1000
+MAX_DEPTH = 128
+WATCH_INTERVAL = 1.0
+
+_CONTROL_FILE = 'control.json'
+
+class ProfileSession:
+    """
+    Samples collected for one request
+    """
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.stacks = {}
+        self.samples = 0
+
+def _frame_name(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+class RequestProfiler:
+    """
+    Arms, runs and reports sampling profiles
+    """
+
+    def __init__(self, directory=None, interval=DEFAULT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        # The only thing a request checks while profiling is off
+        self.armed = False
+        self._control = None
+        self._control_mtime = None
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+        self._switch_interval = None
+        self._watcher_pid = None
+        self._stacks = {}
+        self._recorded = 0
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def configure(self, directory, interval=DEFAULT_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.interval = interval
+        self.start_watcher()
+        # Forked server processes need their own watcher thread
+        os.register_at_fork(after_in_child=self.start_watcher)
+
+    # Control file
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_control(self):
+        try:
+            with open(self._path(_CONTROL_FILE)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_control(self, control):
+        tmp_path = self._path(f'{_CONTROL_FILE}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(control, f)
+        os.replace(tmp_path, self._path(_CONTROL_FILE))
+
+    def _locked(self):
+        fd = os.open(self._path('control.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def arm(self, requests, intent=None):
+        """
+        Start a new profile covering the next `requests` matching requests
+        """
+        requests = max(1, min(int(requests), MAX_REQUESTS))
+        fd = self._locked()
+        try:
+            previous = self._read_control()
+            if previous is not None:
+                self._remove_results(previous['id'])
+            control = {
+                'id': uuid.uuid4().hex,
+                'requested': requests,
+                'remaining': requests,
+                'intent': intent,
+                'interval': self.interval,
+                'armed_at': time.time()
+            }
+            self._write_control(control)
+        finally:
+            os.close(fd)
+        self._apply(control)
+        return control
+
+    def disarm(self):
+        """
+        Stop profiling and discard the results
+        """
+        fd = self._locked()
+        try:
+            control = self._read_control()
+            if control is not None:
+                self._remove_results(control['id'])
+                os.remove(self._path(_CONTROL_FILE))
+        finally:
+            os.close(fd)
+        self._apply(None)
+
+    def _remove_results(self, profile_id):
+        for name in os.listdir(self.directory):
+            if name.startswith(profile_id + '-'):
+                os.remove(self._path(name))
+
+    def _apply(self, control):
+        with self._lock:
+            if control is None or self._control is None or control['id'] != self._control['id']:
+                self._stacks = {}
+                self._recorded = 0
+            self._control = control
+            self.armed = control is not None and control['remaining'] > 0
+
+    def start_watcher(self):
+        if self.directory is None or self._watcher_pid == os.getpid():
+            return
+        self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, name='profiler-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            try:
+                mtime = os.stat(self._path(_CONTROL_FILE)).st_mtime_ns
+            except OSError:
+                mtime = None
+            if mtime != self._control_mtime:
+                self._control_mtime = mtime
+                self._apply(self._read_control() if mtime is not None else None)
+            time.sleep(WATCH_INTERVAL)
+
+    # Sampling
+
+    def begin(self):
+        """
+        Start sampling the calling thread; returns a session or None
+        """
+        if not self.armed:
+            return None
+        session = ProfileSession(threading.get_ident())
+        with self._lock:
+            self._sessions[session.thread_id] = session
+            if self._sampler is None or not self._sampler.is_alive():
+                # A busy request thread only yields the GIL every switch
+                # interval (5 ms by default), so shorten it while sampling
+                self._switch_interval = sys.getswitchinterval()
+                sys.setswitchinterval(min(self._switch_interval, self.interval / 2))
+                self._sampler = threading.Thread(target=self._sample, name='profiler-sampler', daemon=True)
+                self._sampler.start()
+        return session
+
+    def end(self, session, intent=None):
+        """
+        Stop sampling; keeps the samples if the request matches the profile
+        and its budget isn't used up
+        """
+        with self._lock:
+            self._sessions.pop(session.thread_id, None)
+            control = self._control
+        if control is None or (control['intent'] and control['intent'] != intent):
+            return False
+        if not self._claim(control['id']):
+            return False
+
+        with self._lock:
+            if self._control is None or self._control['id'] != control['id']:
+                return False
+            for stack, count in session.stacks.items():
+                self._stacks[stack] = self._stacks.get(stack, 0) + count
+            self._recorded += 1
+            result = {'requests': self._recorded, 'stacks': self._stacks}
+            path = self._path(f"{control['id']}-{os.getpid()}.json")
+            with open(path + '.tmp', 'w') as f:
+                json.dump(result, f)
+            os.replace(path + '.tmp', path)
+        return True
+
+    def _claim(self, profile_id):
+        """
+        Take one request from the shared budget
+        """
+        fd = self._locked()
+        try:
+            control = self._read_control()
+            if control is None or control['id'] != profile_id or control['remaining'] <= 0:
+                self._apply(control)
+                return False
+            control['remaining'] -= 1
+            self._write_control(control)
+        finally:
+            os.close(fd)
+        self._apply(control)
+        return True
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    sys.setswitchinterval(self._switch_interval)
+                    self._sampler = None
+                    return
+                sessions = list(self._sessions.values())
+            frames = sys._current_frames()
+            for session in sessions:
+                frame = frames.get(session.thread_id)
+                if frame is None or frame.f_code.co_filename == __file__:
+                    # Caught inside begin()/end() rather than the request
+                    continue
+                names = []
+                while frame is not None and len(names) < MAX_DEPTH:
+                    names.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                if names:
+                    stack = ';'.join(reversed(names))
+                    session.stacks[stack] = session.stacks.get(stack, 0) + 1
+                    session.samples += 1
+            del frames
+            time.sleep(self.interval)
+
+    # Reports
+
+    def _merged(self):
+        control = self._read_control()
+        stacks = {}
+        requests = 0
+        if control is not None:
+            for name in os.listdir(self.directory):
+                if not (name.startswith(control['id'] + '-') and name.endswith('.json')):
+                    continue
+                try:
+                    with open(self._path(name)) as f:
+                        result = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                requests += result['requests']
+                for stack, count in result['stacks'].items():
+                    stacks[stack] = stacks.get(stack, 0) + count
+        return control, requests, stacks
+
+    def status(self):
+        control, requests, stacks = self._merged()
+        return {
+            'armed': bool(control and control['remaining'] > 0),
+            'profile': control,
+            'recorded_requests': requests,
+            'samples': sum(stacks.values())
+        }
+
+    def collapsed(self):
+        """
+        Brendan Gregg's collapsed stack format, one `a;b;c count` per line
+        """
+        _, _, stacks = self._merged()
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+    def speedscope(self):
+        """
+        A speedscope 'sampled' profile, weighted in milliseconds
+        """
+        control, requests, stacks = self._merged()
+        interval_ms = (control['interval'] if control else self.interval) * 1000
+        frames = []
+        index = {}
+        samples = []
+        weights = []
+        for stack, count in sorted(stacks.items()):
+            sample = []
+            for name in stack.split(';'):
+                if name not in index:
+                    index[name] = len(frames)
+                    function, _, location = name.rpartition(' (')
+                    file_name, _, line = location.rstrip(')').rpartition(':')
+                    frames.append({'name': function, 'file': file_name, 'line': int(line)})
+                sample.append(index[name])
+            samples.append(sample)
+            weights.append(count * interval_ms)
+        title = f"/api/assistant ({requests} requests"
+        if control and control['intent']:
+            title += f", intent {control['intent']}"
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': title + ')',
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            }],
+            'name': 'assistant profile',
+            'exporter': 'social-graphic-ai'
+        }
+
+profiler = RequestProfiler()
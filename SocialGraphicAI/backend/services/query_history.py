@@ -0,0 +1,389 @@
+"""
+Append-only history of assistant queries.
+
+`record()` puts a (timestamp, query, language, intent, latency, cached) tuple
+on a bounded in-memory queue and returns; it never touches the disk and never
+waits. When the queue is full the record is dropped and counted. A writer
+thread in each process drains the queue and appends what it finds in one
+transaction per batch.
+
+Records go to SQLite segment files in WAL mode, named after the time they
+were started (`queries-<epoch ms>.sqlite`), with indexes on time and on
+(intent, time). Every server process appends to the newest segment, and
+SQLite serializes their transactions. When the newest segment grows past
+`segment_bytes` a writer starts a new one under a directory lock. Old
+segments are deleted once everything in them is older than
+`retention_seconds` or the total size goes over `max_bytes`. Because each
+segment only holds records from before the next one started, readers can
+skip segments outside the requested time range.
+"""
+import fcntl
+import heapq
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_RETENTION = 30 * 24 * 3600
+MAX_QUERY_LENGTH = 2000
+
+_SWEEP_INTERVAL = 60
+_SEGMENT_PREFIX = 'queries-'
+_SEGMENT_SUFFIX = '.sqlite'
+_COLUMNS = ('timestamp', 'query', 'language', 'intent', 'latency_ms', 'cached')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    query TEXT NOT NULL,
+    language TEXT NOT NULL,
+    intent TEXT NOT NULL,
+    latency_ms REAL NOT NULL,
+    cached INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS queries_timestamp ON queries (timestamp);
+CREATE INDEX IF NOT EXISTS queries_intent_timestamp ON queries (intent, timestamp);
+"""
+
+def _segment_start(name):
+    return int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]) / 1000
+
+class QueryHistory:
+    """
+    Non-blocking recorder and reader for the query history
+    """
+
+    def __init__(self, directory=None, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.directory = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = DEFAULT_QUEUE_SIZE
+        self.segment_bytes = DEFAULT_SEGMENT_BYTES
+        self.max_bytes = DEFAULT_MAX_BYTES
+        self.retention_seconds = DEFAULT_RETENTION
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self._writer_pid = None
+        self._start_lock = threading.Lock()
+        self._reset()
+        if directory is not None:
+            self.configure(directory)
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def configure(self, directory, max_queue=DEFAULT_QUEUE_SIZE, segment_bytes=DEFAULT_SEGMENT_BYTES,
+                  max_bytes=DEFAULT_MAX_BYTES, retention_seconds=DEFAULT_RETENTION):
+        os.makedirs(directory, exist_ok=True)
+        self.max_queue = max_queue
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.retention_seconds = retention_seconds
+        self._reset()
+        self.directory = directory
+        # A queue inherited across fork may have been locked by another thread
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._writer_pid = None
+        self._segment = None
+        self._connection = None
+        self._last_sweep = 0.0
+
+    # Recording
+
+    def record(self, query, language, intent, latency, cached=False, timestamp=None):
+        """
+        Queue one record; drops it rather than wait when the queue is full
+        """
+        if self.directory is None:
+            return False
+        if self._writer_pid != os.getpid():
+            self._start_writer()
+        try:
+            self._queue.put_nowait((
+                time.time() if timestamp is None else timestamp,
+                query[:MAX_QUERY_LENGTH], language, intent, latency * 1000, int(cached)
+            ))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def _start_writer(self):
+        with self._start_lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            threading.Thread(target=self._write_loop, name='query-history-writer', daemon=True).start()
+
+    def flush(self, timeout=None):
+        """
+        Wait until everything queued so far is written (for tests and shutdown)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _write_loop(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._append(batch)
+                    self.written += len(batch)
+                if time.monotonic() - self._last_sweep >= _SWEEP_INTERVAL:
+                    self._last_sweep = time.monotonic()
+                    self.sweep()
+            except (OSError, sqlite3.Error) as e:
+                self.write_errors += 1
+                print(f"Error writing query history: {str(e)}")
+                self._close()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _append(self, batch):
+        newest = self._newest_segment()
+        if newest is None:
+            newest = self._rotate(None)
+        if newest != self._segment:
+            self._open(newest)
+        if self._logical_size() >= self.segment_bytes:
+            self._open(self._rotate(newest))
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO queries (timestamp, query, language, intent, latency_ms, cached) '
+                'VALUES (?, ?, ?, ?, ?, ?)', batch)
+
+    def _logical_size(self):
+        # Counts pages still in the WAL, unlike the size of the main file
+        page_count = self._connection.execute('PRAGMA page_count').fetchone()[0]
+        page_size = self._connection.execute('PRAGMA page_size').fetchone()[0]
+        return page_count * page_size
+
+    def _open(self, name):
+        self._close()
+        connection = sqlite3.connect(self._path(name), timeout=10, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(_SCHEMA)
+        self._connection = connection
+        self._segment = name
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._segment = None
+
+    def _rotate(self, seen):
+        """
+        Start a new segment, unless another process did since we looked
+        """
+        fd = os.open(self._path('history.lock'), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            newest = self._newest_segment()
+            if newest != seen and newest is not None:
+                return newest
+            start = max(int(time.time() * 1000), int(_segment_start(seen) * 1000) + 1 if seen else 0)
+            name = f'{_SEGMENT_PREFIX}{start:013d}{_SEGMENT_SUFFIX}'
+            connection = sqlite3.connect(self._path(name))
+            try:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(_SCHEMA)
+            finally:
+                connection.close()
+        finally:
+            os.close(fd)
+        # Sweep with the next batch
+        self._last_sweep = 0.0
+        return name
+
+    # Segments
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def segments(self):
+        """
+        Segment file names, oldest first
+        """
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return sorted(name for name in names
+                      if name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX))
+
+    def _newest_segment(self):
+        segments = self.segments()
+        return segments[-1] if segments else None
+
+    def _segment_size(self, name):
+        size = 0
+        for suffix in ('', '-wal'):
+            try:
+                size += os.path.getsize(self._path(name + suffix))
+            except OSError:
+                pass
+        return size
+
+    def sweep(self, now=None):
+        """
+        Delete segments past the retention period or the size limit; the
+        newest segment is always kept
+        """
+        if self.directory is None:
+            return 0
+        now = time.time() if now is None else now
+        segments = self.segments()
+        sizes = [self._segment_size(name) for name in segments]
+        total = sum(sizes)
+        removed = 0
+        for index, name in enumerate(segments[:-1]):
+            # Everything in a segment predates the start of the next one
+            expired = _segment_start(segments[index + 1]) < now - self.retention_seconds
+            if not expired and total <= self.max_bytes:
+                break
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self._path(name + suffix))
+                except FileNotFoundError:
+                    pass
+            total -= sizes[index]
+            removed += 1
+        return removed
+
+    # Reading
+
+    def _where(self, intent, language, since, until):
+        clauses, params = [], []
+        for column, value in (('intent', intent), ('language', language)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def _segments_between(self, since, until):
+        segments = self.segments()
+        selected = []
+        for index, name in enumerate(segments):
+            if until is not None and _segment_start(name) >= until:
+                break
+            next_start = _segment_start(segments[index + 1]) if index + 1 < len(segments) else None
+            if since is not None and next_start is not None and next_start < since:
+                continue
+            selected.append(name)
+        return selected
+
+    def _cursor(self, name, sql, params):
+        try:
+            connection = sqlite3.connect(f'file:{self._path(name)}?mode=ro', uri=True, timeout=10)
+        except sqlite3.Error:
+            # Removed by a sweep since it was listed
+            return
+        try:
+            yield from connection.execute(sql, params)
+        except sqlite3.Error as e:
+            print(f"Error reading query history segment {name}: {str(e)}")
+        finally:
+            connection.close()
+
+    def records(self, intent=None, language=None, since=None, until=None, newest_first=False):
+        """
+        Iterate over matching records as dicts, in time order
+        """
+        if self.directory is None:
+            return
+        where, params = self._where(intent, language, since, until)
+        order = 'DESC' if newest_first else 'ASC'
+        sql = f'SELECT {", ".join(_COLUMNS)} FROM queries{where} ORDER BY timestamp {order}'
+        segments = self._segments_between(since, until)
+        cursors = [self._cursor(name, sql, params) for name in segments]
+        # Segments overlap only while several processes write around a rotation
+        for row in heapq.merge(*cursors, key=lambda row: row[0], reverse=newest_first):
+            record = dict(zip(_COLUMNS, row))
+            record['cached'] = bool(record['cached'])
+            yield record
+
+    def query(self, intent=None, language=None, since=None, until=None, limit=100):
+        """
+        The newest `limit` matching records
+        """
+        results = []
+        for record in self.records(intent, language, since, until, newest_first=True):
+            results.append(record)
+            if len(results) >= limit:
+                break
+        return results
+
+    def summary(self, since=None, until=None):
+        """
+        Count and mean/max latency per intent
+        """
+        where, params = self._where(None, None, since, until)
+        sql = (f'SELECT intent, COUNT(*), SUM(latency_ms), MAX(latency_ms), SUM(cached) '
+               f'FROM queries{where} GROUP BY intent')
+        totals = {}
+        for name in self._segments_between(since, until):
+            for intent, count, latency, slowest, cached in self._cursor(name, sql, params):
+                entry = totals.setdefault(intent, {'count': 0, 'latency_ms': 0.0, 'max_latency_ms': 0.0, 'cached': 0})
+                entry['count'] += count
+                entry['latency_ms'] += latency
+                entry['max_latency_ms'] = max(entry['max_latency_ms'], slowest)
+                entry['cached'] += cached
+        return {
+            intent: {
+                'count': entry['count'],
+                'cached': entry['cached'],
+                'mean_latency_ms': round(entry['latency_ms'] / entry['count'], 3),
+                'max_latency_ms': round(entry['max_latency_ms'], 3)
+            }
+            for intent, entry in totals.items()
+        }
+
+    def stats(self):
+        segments = self.segments() if self.directory is not None else []
+        return {
+            'enabled': self.enabled,
+            'queued': self._queue.qsize(),
+            'recorded': self.recorded,
+            'written': self.written,
+            'dropped': self.dropped,
+            'write_errors': self.write_errors,
+            'segments': len(segments),
+            'bytes': sum(self._segment_size(name) for name in segments)
+        }
+
+query_history = QueryHistory()
@@ -0,0 +1,170 @@
+"""
+Round-robin time-series store for system resource samples.
+
+Each tier keeps fixed-size ring buffers (plain `array`s) of min/sum/max/count
+rollups at one resolution. Every incoming sample is folded directly into the
+current bucket of every tier, so rollups are exact and nothing is ever
+appended: memory use is fixed when the store is created, however long the
+process runs. Range queries walk only the slots inside the requested window.
+
+The store lives in the memory of the process that owns it. It starts empty
+whenever that process starts, so after a restart (or a server worker being
+replaced) the coarse tiers only cover the time since, not their full span.
+"""
+import math
+import threading
+import time
+from array import array
+
+from services.resource_stream import flatten_metrics
+
+# Scalar metrics recorded from each resource snapshot
+HISTORY_METRICS = (
+    'cpu.percent',
+    'memory.percent',
+    'disk.percent',
+    'disk_io.read_bytes_per_sec',
+    'disk_io.write_bytes_per_sec',
+    'network.bytes_sent_per_sec',
+    'network.bytes_recv_per_sec'
+)
+
+# (resolution in seconds, number of slots): 1 h of 1 s, 1 day of 1 min,
+# 30 days of 1 h
+DEFAULT_TIERS = ((1, 3600), (60, 1440), (3600, 720))
+
+_WINDOW_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_window(window):
+    """
+    Parse a window such as '300', '5m', '2h' or '7d' into seconds
+    """
+    window = str(window).strip().lower()
+    unit = 1
+    if window and window[-1] in _WINDOW_UNITS:
+        unit = _WINDOW_UNITS[window[-1]]
+        window = window[:-1]
+    seconds = float(window) * unit
+    if not math.isfinite(seconds) or seconds <= 0:
+        raise ValueError('window must be a positive, finite number of seconds')
+    return seconds
+
+class _Tier:
+    """
+    Ring buffers for all metrics at one resolution
+    """
+
+    def __init__(self, resolution, slots, metric_count):
+        self.resolution = resolution
+        self.slots = slots
+        # Bucket number held by each slot; -1 marks an empty slot
+        self.buckets = array('q', [-1]) * slots
+        self.mins = [array('d', [0.0]) * slots for _ in range(metric_count)]
+        self.maxs = [array('d', [0.0]) * slots for _ in range(metric_count)]
+        self.sums = [array('d', [0.0]) * slots for _ in range(metric_count)]
+        self.counts = [array('l', [0]) * slots for _ in range(metric_count)]
+
+    def record(self, timestamp, values):
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.slots
+        if self.buckets[slot] != bucket:
+            # The slot still holds an older bucket: recycle it
+            self.buckets[slot] = bucket
+            for index in range(len(values)):
+                self.counts[index][slot] = 0
+                self.sums[index][slot] = 0.0
+
+        for index, value in enumerate(values):
+            if value is None:
+                continue
+            count = self.counts[index][slot]
+            if count == 0 or value < self.mins[index][slot]:
+                self.mins[index][slot] = value
+            if count == 0 or value > self.maxs[index][slot]:
+                self.maxs[index][slot] = value
+            self.sums[index][slot] += value
+            self.counts[index][slot] = count + 1
+
+    def query(self, index, start, end):
+        first = int(start // self.resolution)
+        last = int(end // self.resolution)
+        # Never walk further back than the ring holds
+        first = max(first, last - self.slots + 1)
+
+        points = []
+        for bucket in range(first, last + 1):
+            slot = bucket % self.slots
+            if self.buckets[slot] != bucket:
+                continue
+            count = self.counts[index][slot]
+            if count == 0:
+                continue
+            points.append({
+                't': bucket * self.resolution,
+                'min': self.mins[index][slot],
+                'avg': round(self.sums[index][slot] / count, 4),
+                'max': self.maxs[index][slot]
+            })
+        return points
+
+class ResourceHistory:
+    """
+    Fixed-memory multi-resolution history of resource metrics
+    """
+
+    def __init__(self, metrics=HISTORY_METRICS, tiers=DEFAULT_TIERS):
+        self.metrics = tuple(metrics)
+        self._metric_index = {metric: index for index, metric in enumerate(self.metrics)}
+        self._tiers = [_Tier(resolution, slots, len(self.metrics))
+                       for resolution, slots in sorted(tiers)]
+        self._lock = threading.Lock()
+
+    @property
+    def resolutions(self):
+        return [tier.resolution for tier in self._tiers]
+
+    def record(self, timestamp, values):
+        """
+        Record one sample: `values` maps metric name to a number or None
+        """
+        row = []
+        for metric in self.metrics:
+            value = values.get(metric)
+            row.append(float(value) if isinstance(value, (int, float)) else None)
+        with self._lock:
+            for tier in self._tiers:
+                tier.record(timestamp, row)
+
+    def record_snapshot(self, snapshot):
+        """
+        Record a ResourceSnapshot; usable as a sampler listener
+        """
+        self.record(snapshot.timestamp, flatten_metrics(snapshot.data))
+
+    def query(self, metric, window, resolution=None, end=None):
+        """
+        Return min/avg/max points for `metric` over the last `window` seconds.
+
+        Without an explicit resolution, the finest tier whose ring covers the
+        whole window is used.
+        """
+        if metric not in self._metric_index:
+            raise KeyError(metric)
+        end = time.time() if end is None else end
+
+        if resolution is None:
+            tier = next((tier for tier in self._tiers
+                         if tier.resolution * tier.slots >= window), self._tiers[-1])
+        else:
+            tier = next((tier for tier in self._tiers if tier.resolution == resolution), None)
+            if tier is None:
+                raise ValueError(f'Unsupported resolution: {resolution}')
+
+        with self._lock:
+            points = tier.query(self._metric_index[metric], end - window, end)
+        return {
+            'metric': metric,
+            'window': window,
+            'resolution': tier.resolution,
+            'points': points
+        }
@@ -0,0 +1,273 @@
+"""
+Background sampler for system resource metrics.
+
+A daemon thread polls psutil on a fixed interval and publishes each result as
+an immutable ResourceSnapshot. Readers grab the latest snapshot without
+touching psutil, so serving resource data never blocks a request thread.
+Disk I/O and network rates are computed from the counter deltas between two
+consecutive samples.
+
+With a SharedSegment, only the process elected through the segment samples
+psutil and writes each sample there; every other process polls the segment
+and republishes the leader's samples locally. A follower takes over as soon
+as the leader exits.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+
+import psutil
+
+DEFAULT_INTERVAL = 1.0
+# CPU measurement window for the first snapshot, taken synchronously in start()
+FIRST_SAMPLE_WINDOW = 0.1
+GB = 1024 * 1024 * 1024
+
+@dataclass(frozen=True)
+class ResourceSnapshot:
+    """
+    One published sample. `data` is never mutated after publication.
+    """
+    seq: int
+    timestamp: float
+    monotonic: float
+    data: dict = field(default_factory=dict)
+
+    def age(self):
+        """
+        Seconds since this sample was taken
+        """
+        return time.monotonic() - self.monotonic
+
+def _rate(current, previous, elapsed):
+    """
+    Per-second rate of a monotonically increasing counter
+    """
+    if previous is None or elapsed <= 0 or current < previous:
+        return 0.0
+    return round((current - previous) / elapsed, 2)
+
+class ResourceSampler:
+    """
+    Periodically samples CPU, memory, disk, battery, disk I/O and NIC usage
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, disk_path='/', segment=None):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.segment = segment
+        self._segment_version = 0
+        self._snapshot = None
+        self._seq = 0
+        self._previous_counters = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self._published = threading.Condition()
+        self._listeners = []
+
+    @property
+    def snapshot(self):
+        """
+        The most recently published ResourceSnapshot (None before the first sample)
+        """
+        return self._snapshot
+
+    def add_listener(self, callback):
+        """
+        Register a callable invoked with every new snapshot on the sampler thread
+        """
+        self._listeners.append(callback)
+
+    def start(self):
+        """
+        Take a first sample and start the background thread (idempotent)
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            # Followers start from the leader's latest sample when there is one
+            if self._is_sampling_process() or not self._follow():
+                self._prime()
+                self.sample_once()
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name='resource-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop the background thread
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _prime(self):
+        # Prime psutil's CPU counters and block briefly, so the first
+        # snapshot measures a real interval instead of reading 0.0
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        time.sleep(FIRST_SAMPLE_WINDOW)
+
+    def _is_sampling_process(self):
+        return self.segment is None or self.segment.try_lead()
+
+    def _run(self):
+        leading = self._is_sampling_process()
+        while True:
+            # Followers poll faster than the sampling interval to keep lag low
+            if self._stop_event.wait(self.interval if leading else self.interval / 4):
+                break
+            try:
+                if not leading and self._is_sampling_process():
+                    # The previous leader exited: take over sampling
+                    leading = True
+                    self._prime()
+                if leading:
+                    self.sample_once()
+                else:
+                    self._follow()
+            except Exception as e:
+                print(f"Error sampling system resources: {str(e)}")
+
+    def _follow(self):
+        """
+        Republish the leader's latest sample if it is new; returns True if
+        a shared sample was available
+        """
+        if self.segment.snapshot_version() == self._segment_version:
+            return self._snapshot is not None
+        shared = self.segment.read_snapshot()
+        if shared is None:
+            return False
+        version, timestamp, data = shared
+        if version != self._segment_version:
+            self._segment_version = version
+            # Translate the leader's wall-clock time onto this process's monotonic clock
+            self._publish(timestamp, time.monotonic() - (time.time() - timestamp), data)
+        return True
+
+    def sample_once(self):
+        """
+        Collect one sample and publish it as the current snapshot
+        """
+        now = time.monotonic()
+        counters = (now, self._read_disk_io(), self._read_net_io())
+        data = self._collect(counters)
+        self._previous_counters = counters
+        timestamp = time.time()
+        if self.segment is not None and self.segment.is_leader:
+            self.segment.write_snapshot(timestamp, data)
+        return self._publish(timestamp, now, data)
+
+    def _publish(self, timestamp, monotonic, data):
+        self._seq += 1
+        snapshot = ResourceSnapshot(seq=self._seq, timestamp=timestamp, monotonic=monotonic, data=data)
+        # Publishing is a single reference swap, so readers never see a partial sample
+        with self._published:
+            self._snapshot = snapshot
+            self._published.notify_all()
+
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                print(f"Error in resource sampler listener: {str(e)}")
+        return snapshot
+
+    def wait_for_snapshot(self, after_seq, timeout=None):
+        """
+        Block until a snapshot newer than `after_seq` is published.
+        Returns it, or None if the timeout expires first.
+        """
+        with self._published:
+            self._published.wait_for(
+                lambda: self._snapshot is not None and self._snapshot.seq > after_seq,
+                timeout
+            )
+            snapshot = self._snapshot
+        if snapshot is None or snapshot.seq <= after_seq:
+            return None
+        return snapshot
+
+    def _read_disk_io(self):
+        try:
+            return psutil.disk_io_counters()
+        except Exception:
+            return None
+
+    def _read_net_io(self):
+        try:
+            return psutil.net_io_counters(pernic=True)
+        except Exception:
+            return {}
+
+    def _collect(self, counters):
+        now, disk_io, net_io = counters
+        previous = self._previous_counters
+        elapsed = now - previous[0] if previous else 0.0
+
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+
+        # Battery info might not be available on all systems
+        battery_percent = None
+        battery_plugged = None
+        try:
+            battery = psutil.sensors_battery()
+            if battery:
+                battery_percent = battery.percent
+                battery_plugged = battery.power_plugged
+        except Exception:
+            pass
+
+        disk_io_rates = None
+        if disk_io is not None:
+            prev_disk = previous[1] if previous else None
+            disk_io_rates = {
+                'read_bytes_per_sec': _rate(disk_io.read_bytes, prev_disk and prev_disk.read_bytes, elapsed),
+                'write_bytes_per_sec': _rate(disk_io.write_bytes, prev_disk and prev_disk.write_bytes, elapsed),
+                'read_count_per_sec': _rate(disk_io.read_count, prev_disk and prev_disk.read_count, elapsed),
+                'write_count_per_sec': _rate(disk_io.write_count, prev_disk and prev_disk.write_count, elapsed)
+            }
+
+        interfaces = {}
+        prev_net = previous[2] if previous else {}
+        for name, nic in net_io.items():
+            prev_nic = prev_net.get(name)
+            interfaces[name] = {
+                'bytes_sent_per_sec': _rate(nic.bytes_sent, prev_nic and prev_nic.bytes_sent, elapsed),
+                'bytes_recv_per_sec': _rate(nic.bytes_recv, prev_nic and prev_nic.bytes_recv, elapsed),
+                'packets_sent_per_sec': _rate(nic.packets_sent, prev_nic and prev_nic.packets_sent, elapsed),
+                'packets_recv_per_sec': _rate(nic.packets_recv, prev_nic and prev_nic.packets_recv, elapsed)
+            }
+
+        return {
+            'cpu': {
+                'percent': psutil.cpu_percent(interval=None),
+                'per_core': psutil.cpu_percent(interval=None, percpu=True)
+            },
+            'memory': {
+                'percent': memory.percent,
+                'used_gb': round(memory.used / GB, 2),
+                'total_gb': round(memory.total / GB, 2)
+            },
+            'disk': {
+                'percent': disk.percent,
+                'used_gb': round(disk.used / GB, 2),
+                'total_gb': round(disk.total / GB, 2)
+            },
+            'battery': {
+                'percent': battery_percent,
+                'plugged': battery_plugged
+            },
+            'disk_io': disk_io_rates,
+            'network': {
+                'bytes_sent_per_sec': round(sum(nic['bytes_sent_per_sec'] for nic in interfaces.values()), 2),
+                'bytes_recv_per_sec': round(sum(nic['bytes_recv_per_sec'] for nic in interfaces.values()), 2),
+                'interfaces': interfaces
+            }
+        }
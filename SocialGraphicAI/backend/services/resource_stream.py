@@ -0,0 +1,117 @@
+"""
+Server-Sent Events stream of system resource samples.
+
+Every connected client reads from the same ResourceSampler, so the number of
+open dashboards does not change how often psutil is polled. The first event
+carries the full payload; later events only carry the metrics that changed
+since the last event sent to that client.
+
+An open stream holds a server thread, so streams end after `max_lifetime`
+seconds and the browser's EventSource reconnects on its own (after the
+advertised `retry` delay) with a fresh snapshot. stop_streams() ends every
+stream in the process at its next update, so that a worker shutting down
+doesn't wait on them.
+"""
+import json
+import threading
+import time
+
+MIN_STREAM_INTERVAL = 0.5
+MAX_STREAM_INTERVAL = 60.0
+KEEPALIVE_INTERVAL = 15.0
+DEFAULT_STREAM_LIFETIME = 300.0
+
+_stopping = threading.Event()
+
+def flatten_metrics(data, prefix=''):
+    """
+    Flatten a nested metrics dict into {'dotted.path': value}
+    """
+    flat = {}
+    for key, value in data.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, path + '.'))
+        else:
+            flat[path] = value
+    return flat
+
+def diff_metrics(previous, current):
+    """
+    Return (changed, removed) between two flattened metric dicts
+    """
+    changed = {path: value for path, value in current.items()
+               if path not in previous or previous[path] != value}
+    removed = [path for path in previous if path not in current]
+    return changed, removed
+
+def format_event(event, payload):
+    """
+    Encode one SSE event
+    """
+    return f'event: {event}\ndata: {json.dumps(payload)}\n\n'
+
+def clamp_interval(interval, sampler_interval):
+    """
+    Clamp a client-requested update interval to the supported range
+    """
+    floor = max(MIN_STREAM_INTERVAL, sampler_interval)
+    return min(max(interval, floor), MAX_STREAM_INTERVAL)
+
+def stop_streams():
+    """
+    End every open stream in this process at its next update
+    """
+    _stopping.set()
+
+def stream_resource_events(sampler, interval, max_lifetime=DEFAULT_STREAM_LIFETIME):
+    """
+    Generate SSE events for one client at its chosen update interval,
+    for at most `max_lifetime` seconds
+    """
+    sampler.start()
+    interval = clamp_interval(interval, sampler.interval)
+    ends_at = time.monotonic() + max_lifetime
+
+    snapshot = sampler.snapshot
+    sent = flatten_metrics(snapshot.data)
+    yield f'retry: {int(interval * 1000)}\n\n'
+    yield format_event('snapshot', {
+        'seq': snapshot.seq,
+        'sampled_at': snapshot.timestamp,
+        'data': snapshot.data
+    })
+
+    last_seq = snapshot.seq
+    last_event = time.monotonic()
+    next_due = last_event + interval
+    while True:
+        # Sleep until this client's next update is due, then take the
+        # newest sample published since the last one it received
+        delay = next_due - time.monotonic()
+        if delay > 0 and _stopping.wait(delay):
+            return
+        if _stopping.is_set() or time.monotonic() >= ends_at:
+            return
+        next_due = max(next_due + interval, time.monotonic())
+
+        snapshot = sampler.wait_for_snapshot(last_seq, timeout=interval)
+        changed, removed = {}, []
+        if snapshot is not None:
+            current = flatten_metrics(snapshot.data)
+            changed, removed = diff_metrics(sent, current)
+            sent = current
+            last_seq = snapshot.seq
+
+        if changed or removed:
+            last_event = time.monotonic()
+            yield format_event('delta', {
+                'seq': snapshot.seq,
+                'sampled_at': snapshot.timestamp,
+                'changed': changed,
+                'removed': removed
+            })
+        elif time.monotonic() - last_event >= KEEPALIVE_INTERVAL:
+            # Comment lines keep proxies from closing an idle stream
+            last_event = time.monotonic()
+            yield ': keepalive\n\n'
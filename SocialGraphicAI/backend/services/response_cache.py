@@ -0,0 +1,157 @@
+"""
+In-process response cache for deterministic assistant intents.
+
+Entries are keyed by the normalized query and language, expire after a
+per-intent TTL and are evicted least-recently-used once the cache is full.
+Only intents listed in the TTL table are cached, so nondeterministic answers
+(jokes, weather, time, general queries) are always recomputed.
+
+With a SharedCache attached, local misses fall back to the cache shared by
+all server processes, and every stored response is written to it too.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds each cacheable intent's responses stay valid
+DEFAULT_INTENT_TTLS = {
+    'code_generation': 3600,
+    'calculation': 3600,
+    'system_command': 600
+}
+
+DEFAULT_MAX_ENTRIES = 1024
+
+def normalize_query(query):
+    """
+    Collapse runs of whitespace. process_query applies this before
+    dispatch, so the cache key and the handler see the same text.
+    """
+    return ' '.join(query.split())
+
+def _shared_key(key):
+    query, language = key
+    return f'{language}\x00{query}'
+
+class ResponseCache:
+    """
+    Thread-safe TTL + LRU cache of (intent, response) pairs
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, intent_ttls=None, clock=time.monotonic,
+                 shared=None):
+        self.max_entries = max_entries
+        self.intent_ttls = dict(DEFAULT_INTENT_TTLS if intent_ttls is None else intent_ttls)
+        self.shared = shared
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def is_cacheable(self, intent):
+        """
+        Return True if responses for this intent may be cached
+        """
+        return self.intent_ttls.get(intent, 0) > 0
+
+    def get(self, query, language='en'):
+        """
+        Return the cached (intent, response) pair for a query, or None
+        """
+        key = (normalize_query(query), language)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, intent, response = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return intent, response
+                del self._entries[key]
+                self.expirations += 1
+
+        shared_entry = self.shared.get(_shared_key(key)) if self.shared is not None else None
+        with self._lock:
+            if shared_entry is None:
+                self.misses += 1
+                return None
+            # Warmed by another process: keep a local copy until it expires there
+            (intent, response), expires_at = shared_entry
+            self._store(key, self._clock() + (expires_at - time.time()), intent, response)
+            self.hits += 1
+            return intent, response
+
+    def put(self, query, language, intent, response):
+        """
+        Cache a response if its intent is cacheable; returns True if stored
+        """
+        ttl = self.intent_ttls.get(intent, 0)
+        if ttl <= 0 or self.max_entries <= 0:
+            return False
+
+        key = (normalize_query(query), language)
+        with self._lock:
+            self._store(key, self._clock() + ttl, intent, response)
+        if self.shared is not None:
+            self.shared.put(_shared_key(key), [intent, response], ttl)
+        return True
+
+    def _store(self, key, expires_at, intent, response):
+        # Caller holds the lock
+        self._entries[key] = (expires_at, intent, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, query=None, language=None, intent=None):
+        """
+        Remove matching entries; with no filters, clears the cache.
+        Returns the number of entries removed.
+        """
+        normalized = normalize_query(query) if query is not None else None
+        if self.shared is not None:
+            if normalized is None and language is None and intent is None:
+                self.shared.invalidate()
+            else:
+                def match(shared_key, value):
+                    entry_language, entry_query = shared_key.split('\x00', 1)
+                    return ((normalized is None or entry_query == normalized)
+                            and (language is None or entry_language == language)
+                            and (intent is None or value[0] == intent))
+                self.shared.invalidate(match)
+        
+        with self._lock:
+            if normalized is None and language is None and intent is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+
+            doomed = [
+                key for key, (_, entry_intent, _) in self._entries.items()
+                if (normalized is None or key[0] == normalized)
+                and (language is None or key[1] == language)
+                and (intent is None or entry_intent == intent)
+            ]
+            for key in doomed:
+                del self._entries[key]
+            return len(doomed)
+
+    def stats(self):
+        """
+        Return the cache counters
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'intent_ttls': dict(self.intent_ttls),
+                'shared': self.shared.stats() if self.shared is not None else None
+            }
@@ -0,0 +1,365 @@
+"""
+Memory-mapped segment shared by all server processes.
+
+The segment is a fixed-size file mapped MAP_SHARED by every worker. It holds:
+
+- the latest resource snapshot, written only by the elected sampler process
+  (the one holding an exclusive flock on `<path>.lock`) and read by all
+  others instead of sampling psutil themselves;
+- a bounded key/value cache of assistant responses, split into fixed-size
+  slots grouped in small buckets.
+
+Every record is guarded by a version counter (a seqlock): a writer makes it
+odd, writes, then makes it even again. Readers never lock. They copy the
+record and retry if the version changed or was odd while they read. Writers
+serialize with a thread lock plus an fcntl record lock on the record's bytes.
+Clearing the cache bumps a generation number instead of touching slots.
+
+The segment lives under the deployment's own upload directory, so separate
+deployments on one host never share a cache or a sampler. Segment and lock
+files must belong to the server's user and are kept at mode 0600; a file
+planted by anyone else is refused. The server clears the cache with
+reset_shared_cache() whenever it starts or reloads, so a new deployment
+never serves responses cached by the previous one.
+"""
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b'SGAISEG1'
+DEFAULT_SNAPSHOT_CAPACITY = 64 * 1024
+DEFAULT_CACHE_SLOTS = 1024
+DEFAULT_SLOT_SIZE = 4096
+BUCKET_WAYS = 4
+READ_RETRIES = 4
+
+# magic, snapshot capacity, cache slots, slot size, cache generation
+_HEADER = struct.Struct('<8sIIIQ')
+# version, length, writer pid
+_SNAPSHOT_HEADER = struct.Struct('<QII')
+# version, key hash, generation, expires at (epoch seconds), length
+_SLOT_HEADER = struct.Struct('<QQQdI')
+
+_HEADER_SIZE = 64
+_SNAPSHOT_OFFSET = _HEADER_SIZE
+_GENERATION_OFFSET = _HEADER.size - 8
+_SLOT_HEADER_SIZE = 40
+
+def default_segment_path(root):
+    """
+    The segment of the deployment whose upload directory is `root`
+    """
+    return os.path.join(root, 'shared.seg')
+
+def _open_private(path, flags=os.O_RDWR | os.O_CREAT):
+    """
+    Open a segment or lock file readable and writable only by this user;
+    refuses symlinks and files owned by another user
+    """
+    fd = os.open(path, flags | os.O_NOFOLLOW, 0o600)
+    try:
+        info = os.fstat(fd)
+        if info.st_uid != os.geteuid():
+            raise PermissionError(f'{path} is owned by another user')
+        if info.st_mode & 0o077:
+            os.fchmod(fd, 0o600)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+def reset_shared_cache(path):
+    """
+    Drop every response cached in the segment at `path`, if it exists
+    """
+    try:
+        fd = _open_private(path, os.O_RDWR)
+    except FileNotFoundError:
+        return
+    try:
+        # Same record lock as SharedCache.invalidate()
+        fcntl.lockf(fd, fcntl.LOCK_EX, 8, _GENERATION_OFFSET)
+        header = os.pread(fd, _HEADER.size, 0)
+        if len(header) == _HEADER.size and header[:len(MAGIC)] == MAGIC:
+            os.pwrite(fd, struct.pack('<Q', _HEADER.unpack(header)[4] + 1), _GENERATION_OFFSET)
+    finally:
+        os.close(fd)
+
+def _key_hash(key):
+    # Stable across processes, unlike hash() which is seeded per interpreter
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class SharedSegment:
+    """
+    A shared snapshot area followed by the cache slots
+    """
+
+    def __init__(self, path, snapshot_capacity=DEFAULT_SNAPSHOT_CAPACITY,
+                 cache_slots=DEFAULT_CACHE_SLOTS, slot_size=DEFAULT_SLOT_SIZE):
+        if cache_slots % BUCKET_WAYS or slot_size <= _SLOT_HEADER_SIZE:
+            raise ValueError('cache_slots must be a multiple of 4 and slot_size larger than 40')
+        self.path = path
+        self.snapshot_capacity = snapshot_capacity
+        self.cache_slots = cache_slots
+        self.slot_size = slot_size
+        self.cache_offset = _SNAPSHOT_OFFSET + _SNAPSHOT_HEADER.size + snapshot_capacity
+        self.size = self.cache_offset + cache_slots * slot_size
+
+        self._fd = _open_private(path)
+        self._init_segment()
+        self._map = mmap.mmap(self._fd, self.size, mmap.MAP_SHARED)
+        self._write_lock = threading.Lock()
+        self._lead_fd = None
+
+    def _init_segment(self):
+        """
+        Size and format the file unless it already has this layout
+        """
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            expected = (MAGIC, self.snapshot_capacity, self.cache_slots, self.slot_size)
+            if len(header) == _HEADER.size and _HEADER.unpack(header)[:4] == expected \
+                    and os.fstat(self._fd).st_size == self.size:
+                return
+            os.ftruncate(self._fd, 0)
+            os.ftruncate(self._fd, self.size)
+            os.pwrite(self._fd, _HEADER.pack(*expected, 1), 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+        if self._lead_fd is not None:
+            os.close(self._lead_fd)
+            self._lead_fd = None
+
+    # Writer helpers
+
+    def _lock_record(self, offset, length):
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+
+    def _unlock_record(self, offset, length):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
+
+    def _read_u64(self, offset):
+        return struct.unpack_from('<Q', self._map, offset)[0]
+
+    def _write_u64(self, offset, value):
+        struct.pack_into('<Q', self._map, offset, value)
+
+    # Sampler election
+
+    def try_lead(self):
+        """
+        Try to become the process that samples for everyone; returns True
+        while this process holds the role. Released when the process exits.
+        """
+        if self._lead_fd is not None:
+            return True
+        fd = _open_private(self.path + '.lock')
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lead_fd = fd
+        return True
+
+    @property
+    def is_leader(self):
+        return self._lead_fd is not None
+
+    # Snapshot
+
+    def write_snapshot(self, timestamp, data):
+        """
+        Publish a snapshot; returns False if it doesn't fit the snapshot area
+        """
+        payload = json.dumps({'timestamp': timestamp, 'data': data}).encode('utf-8')
+        if len(payload) > self.snapshot_capacity:
+            return False
+        with self._write_lock:
+            version = self._read_u64(_SNAPSHOT_OFFSET)
+            self._write_u64(_SNAPSHOT_OFFSET, version | 1)
+            start = _SNAPSHOT_OFFSET + _SNAPSHOT_HEADER.size
+            self._map[start:start + len(payload)] = payload
+            struct.pack_into('<II', self._map, _SNAPSHOT_OFFSET + 8, len(payload), os.getpid())
+            self._write_u64(_SNAPSHOT_OFFSET, (version | 1) + 1)
+        return True
+
+    def snapshot_version(self):
+        return self._read_u64(_SNAPSHOT_OFFSET)
+
+    def read_snapshot(self):
+        """
+        Return (version, timestamp, data) of the latest snapshot, or None
+        """
+        start = _SNAPSHOT_OFFSET + _SNAPSHOT_HEADER.size
+        for _ in range(READ_RETRIES):
+            version, length, _ = _SNAPSHOT_HEADER.unpack_from(self._map, _SNAPSHOT_OFFSET)
+            if version == 0:
+                return None
+            if version & 1:
+                continue
+            payload = self._map[start:start + length]
+            if self._read_u64(_SNAPSHOT_OFFSET) != version:
+                continue
+            snapshot = json.loads(payload)
+            return version, snapshot['timestamp'], snapshot['data']
+        return None
+
+class SharedCache:
+    """
+    Bounded, 4-way bucketed key/value cache in a SharedSegment.
+    Values must be JSON-serializable; oversized entries are not stored.
+    """
+
+    def __init__(self, segment):
+        self.segment = segment
+        self.buckets = segment.cache_slots // BUCKET_WAYS
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def _generation(self):
+        return self.segment._read_u64(_GENERATION_OFFSET)
+
+    def _slot_offsets(self, key_hash):
+        first = (key_hash % self.buckets) * BUCKET_WAYS
+        return [self.segment.cache_offset + (first + way) * self.segment.slot_size
+                for way in range(BUCKET_WAYS)]
+
+    def _read_slot(self, offset):
+        """
+        Consistent copy of a slot as (version, key hash, generation, expires, payload)
+        """
+        buffer = self.segment._map
+        for _ in range(READ_RETRIES):
+            version, key_hash, generation, expires_at, length = _SLOT_HEADER.unpack_from(buffer, offset)
+            if version & 1:
+                continue
+            start = offset + _SLOT_HEADER_SIZE
+            payload = buffer[start:start + length]
+            if self.segment._read_u64(offset) == version:
+                return version, key_hash, generation, expires_at, payload
+        return None
+
+    def get(self, key):
+        """
+        Return (value, expires_at) for `key`, or None
+        """
+        key_hash = _key_hash(key)
+        generation = self._generation()
+        now = time.time()
+        for offset in self._slot_offsets(key_hash):
+            record = self._read_slot(offset)
+            if record is None or record[1] != key_hash or record[2] != generation or record[3] <= now:
+                continue
+            stored_key, value = json.loads(record[4])
+            if stored_key == key:
+                self.hits += 1
+                return value, record[3]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, ttl):
+        """
+        Store a value for `ttl` seconds; returns False if it doesn't fit a slot
+        """
+        payload = json.dumps([key, value]).encode('utf-8')
+        if len(payload) > self.segment.slot_size - _SLOT_HEADER_SIZE:
+            self.skipped += 1
+            return False
+
+        key_hash = _key_hash(key)
+        generation = self._generation()
+        now = time.time()
+        offsets = self._slot_offsets(key_hash)
+
+        # Reuse the key's slot, else a free or stale one, else the one expiring soonest
+        target = None
+        soonest = None
+        for offset in offsets:
+            _, slot_hash, slot_generation, expires_at, _ = _SLOT_HEADER.unpack_from(self.segment._map, offset)
+            if slot_hash == key_hash and slot_generation == generation:
+                target = offset
+                break
+            if target is None and (slot_generation != generation or expires_at <= now):
+                target = offset
+            if soonest is None or expires_at < soonest[0]:
+                soonest = (expires_at, offset)
+        if target is None:
+            target = soonest[1]
+
+        segment = self.segment
+        with segment._write_lock:
+            segment._lock_record(target, segment.slot_size)
+            try:
+                version = segment._read_u64(target)
+                segment._write_u64(target, version | 1)
+                start = target + _SLOT_HEADER_SIZE
+                segment._map[start:start + len(payload)] = payload
+                struct.pack_into('<QQdI', segment._map, target + 8,
+                                 key_hash, generation, now + ttl, len(payload))
+                segment._write_u64(target, (version | 1) + 1)
+            finally:
+                segment._unlock_record(target, segment.slot_size)
+        return True
+
+    def invalidate(self, match=None):
+        """
+        Drop entries whose (key, value) satisfy `match`; with no predicate,
+        drops everything by moving to a new generation. Returns the number
+        of entries removed (None for a full clear).
+        """
+        segment = self.segment
+        if match is None:
+            with segment._write_lock:
+                segment._lock_record(_GENERATION_OFFSET, 8)
+                try:
+                    segment._write_u64(_GENERATION_OFFSET, self._generation() + 1)
+                finally:
+                    segment._unlock_record(_GENERATION_OFFSET, 8)
+            return None
+
+        generation = self._generation()
+        removed = 0
+        for slot in range(segment.cache_slots):
+            offset = segment.cache_offset + slot * segment.slot_size
+            record = self._read_slot(offset)
+            if record is None or record[2] != generation or not record[4]:
+                continue
+            key, value = json.loads(record[4])
+            if not match(key, value):
+                continue
+            with segment._write_lock:
+                segment._lock_record(offset, segment.slot_size)
+                try:
+                    version = segment._read_u64(offset)
+                    if version == record[0]:
+                        # Generation 0 is never current, so the slot reads as empty
+                        segment._write_u64(offset, version | 1)
+                        segment._write_u64(offset + 16, 0)
+                        segment._write_u64(offset, (version | 1) + 1)
+                        removed += 1
+                finally:
+                    segment._unlock_record(offset, segment.slot_size)
+        return removed
+
+    def stats(self):
+        return {
+            'path': self.segment.path,
+            'slots': self.segment.cache_slots,
+            'slot_size': self.segment.slot_size,
+            'generation': self._generation(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'skipped_oversized': self.skipped
+        }
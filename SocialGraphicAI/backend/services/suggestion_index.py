@@ -0,0 +1,287 @@
+"""
+Prefix index for assistant autocomplete.
+
+Each language has its own index of suggestion texts keyed by a normalized
+form (casefolded, whitespace collapsed). Keys live in a sorted array, so the
+entries under a prefix are one contiguous range found by bisection. New keys
+go to a sorted side array. Once that reaches an eighth of the main array, a
+background thread merges it in, which keeps the cost of merges linear overall
+and off the request path. Lookups search the side arrays as well.
+
+Each language keeps at most `max_entries` texts. The same background pass
+evicts the lowest-scoring ones, in batches of an eighth of the limit.
+
+Scores weight frequency by recency with forward decay: a use at time t adds
+2 ** ((t - epoch) / half_life). Older uses are therefore worth
+exponentially less than new ones, yet no stored score ever has to be decayed.
+Because scores only grow, the top-k of a prefix can be cached and kept exact
+by updating the cached lists of a key's prefixes whenever it is used. Small
+ranges are scanned directly; larger ones are served from this LRU prefix
+cache. The empty and one-character prefixes, whose ranges are the largest,
+are filled in by the merge so they are never computed on a keystroke.
+
+With a million indexed queries a warm lookup takes tens of microseconds and
+recording a query a few more.
+"""
+import bisect
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_HALF_LIFE = 7 * 24 * 3600
+MAX_RESULTS = 10
+SCAN_LIMIT = 128
+PENDING_LIMIT = 1024
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_CACHE_SIZE = 50000
+MAX_TEXT_LENGTH = 200
+# Rescale scores before the forward-decay weights approach float overflow
+_MAX_EXPONENT = 900
+
+# Shown before anyone has typed anything
+DEFAULT_SUGGESTIONS = [
+    "What's the weather in New York?",
+    "Open Notepad",
+    "Create a Python script to scrape a website",
+    "Monitor system resources",
+    "Tell me a joke",
+    "What's the time in Tokyo?",
+    "Calculate 15% of 67.8",
+    "Summarize this text file",
+    "Generate a Bash script to backup files",
+    "Write a React component for a login form"
+]
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index with cached top-k per prefix
+    """
+
+    def __init__(self, half_life=DEFAULT_HALF_LIFE, cache_size=DEFAULT_CACHE_SIZE,
+                 max_entries=DEFAULT_MAX_ENTRIES, clock=time.time):
+        self.half_life = half_life
+        self.cache_size = cache_size
+        self.max_entries = max_entries
+        self._clock = clock
+        self._epoch = clock()
+        self._keys = []
+        # Keys being merged into _keys by the background merge
+        self._merging = []
+        self._pending = []
+        # key -> [score, display text]
+        self._entries = {}
+        # prefix -> list of (score, key), best first, at most MAX_RESULTS long
+        self._cache = OrderedDict()
+        # Keys used while a merge runs, whose new scores the merge may have missed
+        self._touched = None
+        self._merger = None
+        self._rescales = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _weight(self, timestamp):
+        exponent = (timestamp - self._epoch) / self.half_life
+        if exponent > _MAX_EXPONENT:
+            self._rescale(exponent)
+            exponent = (timestamp - self._epoch) / self.half_life
+        return 2.0 ** exponent
+
+    def _rescale(self, exponent):
+        # Move the epoch forward; relative order is unchanged
+        factor = 2.0 ** -exponent
+        self._epoch += exponent * self.half_life
+        for entry in self._entries.values():
+            entry[0] *= factor
+        self._cache.clear()
+        self._rescales += 1
+
+    def add(self, text, count=1, timestamp=None):
+        """
+        Record `count` uses of a suggestion text
+        """
+        text = ' '.join(text.split())[:MAX_TEXT_LENGTH]
+        key = normalize(text)
+        if not key:
+            return
+        with self._lock:
+            weight = count * self._weight(self._clock() if timestamp is None else timestamp)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [0.0, text]
+                bisect.insort(self._pending, key)
+            entry[0] += weight
+            entry[1] = text
+            self._update_cache(key, entry[0])
+            if self._touched is not None:
+                self._touched.add(key)
+            elif (len(self._pending) > max(PENDING_LIMIT, len(self._keys) // 8)
+                  or len(self._entries) > self.max_entries + max(1, self.max_entries // 8)):
+                self._merging, self._pending = self._pending, []
+                self._touched = set()
+                self._merger = threading.Thread(target=self._merge, name='suggestion-merge', daemon=True)
+                self._merger.start()
+
+    def flush(self):
+        """
+        Wait for a background merge to finish
+        """
+        merger = self._merger
+        if merger is not None:
+            merger.join()
+
+    def _merge(self):
+        """
+        Merge the side array into the main one, evict the lowest-scoring
+        entries over the limit and warm the top-level prefixes. Runs on its
+        own thread and only takes the lock to swap the results in.
+        """
+        with self._lock:
+            keys, merging, rescales = self._keys, self._merging, self._rescales
+        # Two sorted runs, which list.sort merges in linear time. Scores are
+        # read without the lock; they only grow while this runs.
+        merged = keys + merging
+        merged.sort()
+        excess = len(self._entries) - self.max_entries
+        evicted = ()
+        if excess > 0:
+            evicted = {key for _, key in heapq.nsmallest(excess, ((self._entries[key][0], key)
+                                                                  for key in merged))}
+            merged = [key for key in merged if key not in evicted]
+        missing = {prefix for prefix in {''} | {key[0] for key in merged} if prefix not in self._cache}
+        warm = self._warm(merged, missing)
+
+        with self._lock:
+            touched, self._touched = self._touched, None
+            for key in evicted:
+                if key in touched:
+                    # Used again meanwhile, so keep it
+                    bisect.insort(self._pending, key)
+                else:
+                    del self._entries[key]
+            self._keys, self._merging = merged, []
+            if self._rescales == rescales:
+                for prefix, top in warm.items():
+                    self._cache.setdefault(prefix, top)
+            for key in touched:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._update_cache(key, entry[0])
+
+    def _warm(self, keys, prefixes):
+        """
+        Compute the top-k lists of the given empty and one-character
+        prefixes in a single pass
+        """
+        # A min-heap of the best MAX_RESULTS so far for each prefix
+        heaps = {prefix: [] for prefix in prefixes}
+        if not heaps:
+            return {}
+        everything = heaps.get('')
+        for key in keys:
+            item = (self._entries[key][0], key)
+            for heap in (everything, heaps.get(key[0])):
+                if heap is None:
+                    continue
+                if len(heap) < MAX_RESULTS:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        return {prefix: sorted(heap, reverse=True) for prefix, heap in heaps.items()}
+
+    def _update_cache(self, key, score):
+        # Only prefixes that are cached need updating; others are computed on demand
+        for length in range(len(key) + 1):
+            top = self._cache.get(key[:length])
+            if top is None:
+                continue
+            for position, (_, cached_key) in enumerate(top):
+                if cached_key == key:
+                    del top[position]
+                    break
+            else:
+                if len(top) == MAX_RESULTS and score <= top[-1][0]:
+                    continue
+            bisect.insort(top, (score, key), key=lambda item: -item[0])
+            del top[MAX_RESULTS:]
+
+    def _range(self, keys, prefix):
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\U0010ffff', start)
+        return start, end
+
+    def top(self, prefix, limit=MAX_RESULTS):
+        """
+        Return up to `limit` (text, score) pairs starting with `prefix`, best first
+        """
+        prefix = normalize(prefix) if prefix.strip() else ''
+        limit = max(1, min(limit, MAX_RESULTS))
+        with self._lock:
+            top = self._cache.get(prefix)
+            if top is not None and any(key not in self._entries for _, key in top):
+                # Holds an evicted key
+                del self._cache[prefix]
+                top = None
+            if top is not None:
+                self._cache.move_to_end(prefix)
+            else:
+                ranges = [(keys, *self._range(keys, prefix))
+                          for keys in (self._keys, self._merging, self._pending)]
+                top = heapq.nlargest(MAX_RESULTS, ((self._entries[key][0], key)
+                                                   for keys, start, end in ranges
+                                                   for key in keys[start:end]))
+                if sum(end - start for _, start, end in ranges) > SCAN_LIMIT:
+                    # Large ranges are worth remembering
+                    self._cache[prefix] = top
+                    if len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+            return [(self._entries[key][1], score) for score, key in top[:limit]]
+
+class SuggestionIndex:
+    """
+    One PrefixIndex per language
+    """
+
+    def __init__(self, half_life=DEFAULT_HALF_LIFE, cache_size=DEFAULT_CACHE_SIZE,
+                 max_entries=DEFAULT_MAX_ENTRIES, defaults=DEFAULT_SUGGESTIONS):
+        self.half_life = half_life
+        self.cache_size = cache_size
+        self.max_entries = max_entries
+        self._indexes = {}
+        self._lock = threading.Lock()
+        # Seeded in reverse so that ties keep the listed order; one real use outranks them
+        english = self._index('en')
+        for position, text in enumerate(reversed(defaults)):
+            english.add(text, count=0.5 + position / (10 * len(defaults)))
+
+    def _index(self, language):
+        index = self._indexes.get(language)
+        if index is None:
+            with self._lock:
+                index = self._indexes.setdefault(language, PrefixIndex(self.half_life, self.cache_size,
+                                                                          self.max_entries))
+        return index
+
+    def record(self, query, language='en', count=1, timestamp=None):
+        self._index(language).add(query, count, timestamp)
+
+    def suggest(self, prefix, language='en', limit=MAX_RESULTS):
+        """
+        Suggestions for a prefix in one language, topped up from English
+        when the language has too few of its own
+        """
+        results = self._index(language).top(prefix, limit)
+        if len(results) < limit and language != 'en':
+            seen = {normalize(text) for text, _ in results}
+            for text, score in self._index('en').top(prefix, limit):
+                if normalize(text) not in seen and len(results) < limit:
+                    results.append((text, score))
+        return [text for text, _ in results]
+
+    def stats(self):
+        return {language: len(index) for language, index in self._indexes.items()}
@@ -0,0 +1,303 @@
+"""
+Constant-memory extractive summarizer for uploaded text and log files.
+
+The file (or a byte range of it) is memory-mapped and pushed through
+generator stages: chunk reader -> incremental UTF-8 decoder -> line splitter
+-> unit builder (log lines, or sentences for prose). Two passes are made:
+
+1. Statistics: a Misra-Gries summary of the most frequent terms and, for
+   logs, a count-min sketch of line templates (digits masked).
+2. Scoring: every unit is scored against those fixed-size summaries and
+   offered to a bounded top-k heap.
+
+Each stage holds at most one chunk, one line and one unit at a time, and the
+summaries and heap have fixed sizes, so peak memory does not depend on the
+size of the file.
+"""
+import codecs
+import heapq
+import mmap
+import os
+import re
+from array import array
+
+CHUNK_SIZE = 1024 * 1024
+MAX_LINE_CHARS = 4096
+MAX_UNIT_CHARS = 2048
+DEFAULT_TOP_K = 10
+TERM_SUMMARY_SIZE = 2048
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+DETECT_SAMPLE_LINES = 200
+
+_WORD_PATTERN = re.compile(r"[^\W\d_][\w'-]{2,}", re.UNICODE)
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+_DIGITS = re.compile(r'0x[0-9a-fA-F]+|\d+')
+_LOG_LINE = re.compile(
+    r'^\s*(\[?\d{4}-\d{2}-\d{2}|\[?\d{2}:\d{2}:\d{2}|\w{3}\s+\d{1,2}\s+\d{2}:\d{2}'
+    r'|\[?(TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b)'
+)
+_LOG_LEVELS = re.compile(r'\b(TRACE|DEBUG|INFO|WARN|WARNING|ERROR|FATAL|CRITICAL)\b')
+
+_LEVEL_WEIGHTS = {
+    'FATAL': 4.0, 'CRITICAL': 4.0, 'ERROR': 3.0,
+    'WARN': 2.0, 'WARNING': 2.0, 'INFO': 0.5,
+    'DEBUG': 0.0, 'TRACE': 0.0
+}
+_FAILURE_WORDS = re.compile(r'exception|traceback|failed|failure|timeout|refused|denied|panic',
+                            re.IGNORECASE)
+
+_STOPWORDS = frozenset('''
+the and for that with this from are was were have has had not but you your they
+their them his her its our out all any can will would could should into than then
+there these those what when where which while who whom why how also been being
+more most other some such only own same very just over under again about after
+before between both each few off once here does did doing
+'''.split())
+
+# Generator stages
+
+def read_chunks(path, start=0, end=None, chunk_size=CHUNK_SIZE, check=None):
+    """
+    Yield bytes chunks of path[start:end] from a memory map.
+
+    A range that starts mid-line begins at the next full line, and one that
+    ends mid-line includes the rest of that line, so adjacent ranges cover
+    every line exactly once.
+    """
+    size = os.path.getsize(path)
+    end = size if end is None else min(end, size)
+    if size == 0 or start >= end:
+        return
+
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if start > 0 and mapped[start - 1:start] != b'\n':
+            newline = mapped.find(b'\n', start, end)
+            if newline == -1:
+                return
+            start = newline + 1
+        if end < size and mapped[end - 1:end] != b'\n':
+            newline = mapped.find(b'\n', end)
+            end = size if newline == -1 else newline + 1
+
+        for offset in range(start, end, chunk_size):
+            if check is not None:
+                check()
+            yield mapped[offset:min(offset + chunk_size, end)]
+
+def decode(chunks, encoding='utf-8'):
+    """
+    Incrementally decode byte chunks, keeping split multi-byte characters intact
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def split_lines(texts, max_chars=MAX_LINE_CHARS):
+    """
+    Split decoded text into lines; overlong lines are truncated to max_chars
+    """
+    carry = ''
+    for text in texts:
+        parts = (carry + text).split('\n')
+        carry = parts.pop()
+        for line in parts:
+            yield line.rstrip('\r')[:max_chars]
+        if len(carry) > max_chars:
+            # Keep the start of a runaway line and drop the rest
+            carry = carry[:max_chars]
+    if carry:
+        yield carry.rstrip('\r')
+
+def log_units(lines):
+    """
+    Each non-empty log line is one unit: yields (line number, text)
+    """
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            yield number, line.strip()
+
+def sentence_units(lines, max_chars=MAX_UNIT_CHARS):
+    """
+    Group lines into paragraphs and split them into sentences:
+    yields (line number where the sentence's paragraph starts, sentence)
+    """
+    paragraph = []
+    length = 0
+    start_line = 1
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if stripped:
+            if not paragraph:
+                start_line = number
+            paragraph.append(stripped)
+            length += len(stripped) + 1
+        if paragraph and (not stripped or length >= max_chars):
+            for sentence in _SENTENCE_END.split(' '.join(paragraph)):
+                if sentence:
+                    yield start_line, sentence[:max_chars]
+            paragraph = []
+            length = 0
+    if paragraph:
+        for sentence in _SENTENCE_END.split(' '.join(paragraph)):
+            if sentence:
+                yield start_line, sentence[:max_chars]
+
+# Fixed-size summaries
+
+class TermSummary:
+    """
+    Misra-Gries heavy-hitters summary of term frequencies
+    """
+
+    def __init__(self, size=TERM_SUMMARY_SIZE):
+        self.size = size
+        self.counts = {}
+        self.total = 0
+
+    def add(self, term):
+        self.total += 1
+        counts = self.counts
+        if term in counts:
+            counts[term] += 1
+        elif len(counts) < self.size:
+            counts[term] = 1
+        else:
+            # Decrement everything; drop terms that reach zero
+            for key in list(counts):
+                counts[key] -= 1
+                if counts[key] == 0:
+                    del counts[key]
+
+    def weight(self, term):
+        return self.counts.get(term, 0) / self.total if self.total else 0.0
+
+    def top(self, count):
+        return [term for term, _ in heapq.nlargest(count, self.counts.items(), key=lambda item: item[1])]
+
+class CountMinSketch:
+    """
+    Approximate counter with fixed memory
+    """
+
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('L', [0]) * width for _ in range(depth)]
+
+    def _slots(self, key):
+        # Double hashing from one built-in hash; the sketch only lives for
+        # one summarize call, so per-process hash randomization is harmless
+        first = hash(key)
+        second = (first >> 17) | 1
+        for row in range(self.depth):
+            yield row, (first + row * second) % self.width
+
+    def add(self, key):
+        for row, slot in self._slots(key):
+            self.rows[row][slot] += 1
+
+    def estimate(self, key):
+        return min(self.rows[row][slot] for row, slot in self._slots(key))
+
+def _terms(text):
+    return [word for word in (match.lower() for match in _WORD_PATTERN.findall(text))
+            if word not in _STOPWORDS]
+
+def _template(line):
+    return _DIGITS.sub('#', line[:120])
+
+def detect_mode(path, start=0, end=None):
+    """
+    Guess whether a file (range) is a log or prose from its first lines
+    """
+    sampled = 0
+    log_like = 0
+    for line in split_lines(decode(read_chunks(path, start, end, chunk_size=64 * 1024))):
+        if not line.strip():
+            continue
+        sampled += 1
+        if _LOG_LINE.match(line):
+            log_like += 1
+        if sampled >= DETECT_SAMPLE_LINES:
+            break
+    return 'log' if sampled and log_like / sampled >= 0.5 else 'text'
+
+def summarize_file(path, top_k=DEFAULT_TOP_K, start=0, end=None, mode=None, check=None):
+    """
+    Summarize path[start:end] by extracting its top_k highest-scoring
+    sentences (prose) or lines (logs)
+    """
+    mode = mode or detect_mode(path, start, end)
+    units = log_units if mode == 'log' else sentence_units
+
+    def stream():
+        return units(split_lines(decode(read_chunks(path, start, end, check=check))))
+
+    # Pass 1: fixed-size statistics
+    terms = TermSummary()
+    templates = CountMinSketch() if mode == 'log' else None
+    levels = {}
+    unit_count = 0
+    for _, text in stream():
+        unit_count += 1
+        for term in _terms(text):
+            terms.add(term)
+        if templates is not None:
+            templates.add(_template(text))
+            level = _LOG_LEVELS.search(text)
+            if level:
+                name = level.group(1)
+                levels[name] = levels.get(name, 0) + 1
+
+    # Pass 2: score every unit into a bounded heap holding at most one unit
+    # per template, so repeated lines can't fill the whole summary
+    heap = []
+    chosen = {}
+    for sequence, (line_number, text) in enumerate(stream()):
+        if mode == 'log':
+            level = _LOG_LEVELS.search(text)
+            score = _LEVEL_WEIGHTS.get(level.group(1), 0.0) if level else 0.0
+            if _FAILURE_WORDS.search(text):
+                score += 2.0
+            # Rare line shapes are more interesting than repeated ones
+            score += 1.0 / templates.estimate(_template(text))
+        else:
+            unit_terms = _terms(text)
+            if not unit_terms:
+                continue
+            score = sum(terms.weight(term) for term in unit_terms) / len(unit_terms) ** 0.5
+            score *= 1.0 + 1.0 / (1 + sequence)
+        entry = (score, -sequence, line_number, text)
+        key = _template(text)
+        current = chosen.get(key)
+        if current is not None:
+            if entry > current:
+                heap[heap.index(current)] = entry
+                heapq.heapify(heap)
+                chosen[key] = entry
+        elif len(heap) < top_k:
+            heapq.heappush(heap, entry)
+            chosen[key] = entry
+        elif entry > heap[0]:
+            evicted = heapq.heapreplace(heap, entry)
+            del chosen[_template(evicted[3])]
+            chosen[key] = entry
+
+    # Present the selected units in file order
+    selected = sorted(heap, key=lambda entry: -entry[1])
+    summary = {
+        'mode': mode,
+        'units': unit_count,
+        'top_terms': terms.top(10),
+        'summary': [{'line': line_number, 'text': text, 'score': round(score, 4)}
+                    for score, _, line_number, text in selected]
+    }
+    if mode == 'log':
+        summary['levels'] = levels
+    return summary
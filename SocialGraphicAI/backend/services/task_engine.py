@@ -3,9 +3,65 @@ import sys
 import re
 import json
 import datetime
+import time
 import subprocess
 import platform
 import random
+import threading
+from services.expression_engine import evaluate_expression
+from services.response_cache import ResponseCache, normalize_query
+from services.process_monitor import ProcessMonitor
+from services.metrics import metrics, observe_intent, count_intent_error, count_cache_hit
+from services.query_history import query_history
+from services.weather import WeatherService, WeatherError, LocationNotFound, create_provider, describe
+from services.timezone_index import timezone_index
+from services.intent_keywords import INTENT_KEYWORDS, keywords_for, normalize_text
+from services.completion import CompletionService, CompletionError, CANNED_RESPONSES, create_backend
+
+# Numeric mode used by the calculator ('float', 'decimal' or 'fraction')
+CALCULATION_MODE = os.environ.get('CALCULATION_MODE', 'float')
+
+# Cache of responses for intents whose answer depends only on the query
+response_cache = ResponseCache(max_entries=int(os.environ.get('RESPONSE_CACHE_SIZE', '1024')))
+
+# Optional statistical intent classifier (services/intent_classifier.py),
+# enabled with INTENT_CLASSIFIER=on. The keyword matcher always decides when
+# a keyword matches; the classifier only gets the queries that would
+# otherwise be general queries, and its answer is used when its probability
+# reaches the threshold.
+INTENT_CLASSIFIER = os.environ.get('INTENT_CLASSIFIER', 'off') == 'on'
+INTENT_CLASSIFIER_MODEL = os.environ.get(
+    'INTENT_CLASSIFIER_MODEL', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'intent_classifier.npz')
+)
+INTENT_CLASSIFIER_THRESHOLD = float(os.environ.get('INTENT_CLASSIFIER_THRESHOLD', '0.8'))
+
+# Shared per-process usage tracker for the system monitor
+process_monitor = ProcessMonitor()
+
+# Weather lookups with a per-location cache ('stub' or 'open-meteo')
+WEATHER_TIMEOUT = float(os.environ.get('WEATHER_TIMEOUT', '3.0'))
+weather_service = WeatherService(
+    create_provider(os.environ.get('WEATHER_PROVIDER', 'stub'), timeout=WEATHER_TIMEOUT),
+    ttl=float(os.environ.get('WEATHER_TTL', '600')),
+    stale_ttl=float(os.environ.get('WEATHER_STALE_TTL', '3600')),
+    timeout=WEATHER_TIMEOUT
+)
+
+# Completion backend for general queries ('fake' or 'openai')
+completion_service = CompletionService(
+    create_backend(
+        os.environ.get('LLM_BACKEND', 'fake'),
+        url=os.environ.get('LLM_URL', 'http://localhost:11434/v1'),
+        model=os.environ.get('LLM_MODEL', ''),
+        api_key=os.environ.get('LLM_API_KEY', ''),
+        timeout=float(os.environ.get('LLM_TIMEOUT', '10')),
+        token_latency=float(os.environ.get('LLM_FAKE_TOKEN_LATENCY', '0')),
+        first_token_latency=float(os.environ.get('LLM_FAKE_FIRST_TOKEN_LATENCY', '0'))
+    ),
+    max_concurrent=int(os.environ.get('LLM_MAX_CONCURRENT', '8')),
+    queue_timeout=float(os.environ.get('LLM_QUEUE_TIMEOUT', '0.5')),
+    deadline=float(os.environ.get('LLM_DEADLINE', '30'))
+)
 
 # Dictionary of supported languages
 SUPPORTED_LANGUAGES = {
@@ -21,90 +77,212 @@ SUPPORTED_LANGUAGES = {
     'ru': 'Russian'
 }
 
+# Arithmetic operators only count as calculation keywords after a number or
+# a closing parenthesis, so that hyphens in prose ('well-known') don't
+_OPERATORS = frozenset('+-*/^%')
+
+def _keyword_starts_at(text, start):
+    """
+    Whether a keyword match at `start` stands on its own: phrases starting
+    with a Latin letter must also start a word, so 'time' doesn't match
+    inside 'sometimes'. Checked per match rather than in the regex, where
+    a lookbehind on every phrase slows the scan several times over.
+    """
+    char = text[start]
+    if 'a' <= char <= 'z':
+        return start == 0 or not 'a' <= text[start - 1] <= 'z'
+    if char in _OPERATORS:
+        before = text[:start].rstrip()[-1:]
+        return before.isdigit() or before == ')'
+    return True
+
+def _compile_intent_matcher(keyword_table):
+    """
+    Compile an intent keyword table into a single regex.
+
+    Every phrase sits inside a zero-width lookahead, so one scan reports a
+    match at each position where any phrase starts, including phrases that
+    overlap. Each intent gets its own named group and the groups are laid
+    out in priority order, so at any position the highest-priority intent
+    is the one reported.
+    """
+    groups = []
+    for intent, phrases in keyword_table:
+        # Longest phrases first so a shorter prefix never shadows them
+        alternatives = '|'.join(
+            re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True)
+        )
+        groups.append(f'(?P<{intent}>{alternatives})')
+    priority = {intent: rank for rank, (intent, _) in enumerate(keyword_table)}
+    return re.compile('(?=' + '|'.join(groups) + ')'), priority
+
+# Compiled matchers by language, built the first time a language is seen
+_intent_matchers = {}
+_intent_matchers_lock = threading.Lock()
+_TOP_PRIORITY = 0
+
+def _intent_matcher(language):
+    """
+    The (pattern, priority) pair for a language; unsupported languages
+    share the English one
+    """
+    matcher = _intent_matchers.get(language)
+    if matcher is None:
+        if language not in SUPPORTED_LANGUAGES:
+            return _intent_matcher('en')
+        with _intent_matchers_lock:
+            matcher = _intent_matchers.get(language)
+            if matcher is None:
+                matcher = _intent_matchers[language] = _compile_intent_matcher(keywords_for(language))
+    return matcher
+
+def match_intents(query, language='en'):
+    """
+    Return the intents whose keywords appear in the query, in priority order
+    """
+    pattern, priority = _intent_matcher(language)
+    text = normalize_text(query)
+    found = {match.lastgroup for match in pattern.finditer(text) if _keyword_starts_at(text, match.start())}
+    return sorted(found, key=priority.__getitem__)
+
+# Loaded on first use; False once loading has failed or is disabled
+_intent_classifier = None
+_intent_classifier_lock = threading.Lock()
+
+def _load_intent_classifier():
+    """
+    The IntentClassifier, or None if it is disabled or can't be loaded
+    """
+    global _intent_classifier
+    if _intent_classifier is None:
+        with _intent_classifier_lock:
+            if _intent_classifier is None:
+                classifier = False
+                if INTENT_CLASSIFIER:
+                    try:
+                        from services.intent_classifier import IntentClassifier
+                        classifier = IntentClassifier.load(INTENT_CLASSIFIER_MODEL)
+                    except Exception as e:
+                        print(f"Error loading intent classifier: {str(e)}")
+                _intent_classifier = classifier
+    return _intent_classifier or None
+
 # Basic natural language processing to detect intent
+def keyword_intent(query, language='en'):
+    """
+    Detects the intent of the user query from the keyword tables alone
+    """
+    pattern, priority = _intent_matcher(language)
+    text = normalize_text(query)
+    best = None
+    for match in pattern.finditer(text):
+        if not _keyword_starts_at(text, match.start()):
+            continue
+        rank = priority[match.lastgroup]
+        if best is None or rank < best:
+            best = rank
+            if rank == _TOP_PRIORITY:
+                break
+    
+    if best is None:
+        # Default to general query
+        return 'general_query'
+    return INTENT_KEYWORDS[best][0]
+
+def classify_intents(queries, language='en'):
+    """
+    (intent, confidence, source) for each query in a batch. Keywords decide
+    wherever they match. The queries no keyword matches are scored by the
+    classifier in one pass and take its answer when it is confident
+    enough; confidence is None for queries it didn't score.
+    """
+    results = [(keyword_intent(query, language), None, 'keywords') for query in queries]
+    unmatched = [position for position, (intent, _, _) in enumerate(results) if intent == 'general_query']
+    classifier = _load_intent_classifier() if unmatched else None
+    if classifier is None:
+        return results
+    predictions = classifier.classify([queries[position] for position in unmatched])
+    for position, (intent, confidence) in zip(unmatched, predictions):
+        if confidence >= INTENT_CLASSIFIER_THRESHOLD:
+            results[position] = (intent, confidence, 'classifier')
+        else:
+            results[position] = ('general_query', confidence, 'keywords')
+    return results
+
 def detect_intent(query, language='en'):
     """
     Detects the intent of the user query
     """
-    query = query.lower()
-    
-    # Check for code generation requests
-    if any(phrase in query for phrase in [
-        'write code', 'generate code', 'write a function', 'create a class',
-        'python script', 'javascript function', 'html', 'css', 'java class',
-        'code for', 'generate a program', 'code to', 'write program'
-    ]):
-        return 'code_generation'
-    
-    # Check for system commands
-    if any(phrase in query for phrase in [
-        'open ', 'run ', 'execute ', 'start ', 'launch ',
-        'close ', 'kill ', 'stop ', 'terminate '
-    ]):
-        return 'system_command'
-    
-    # Check for system monitoring
-    if any(phrase in query for phrase in [
-        'system resources', 'ram usage', 'cpu usage', 'memory usage',
-        'disk space', 'battery', 'system stats', 'performance'
-    ]):
-        return 'system_monitor'
-    
-    # Check for weather requests
-    if any(phrase in query for phrase in [
-        'weather', 'temperature', 'forecast', 'rain', 'sunny',
-        'weather in', 'weather for', 'how\'s the weather'
-    ]):
-        return 'weather'
-    
-    # Check for time requests
-    if any(phrase in query for phrase in [
-        'time', 'current time', 'what time', 'clock', 'what\'s the time'
-    ]):
-        return 'time'
-    
-    # Check for jokes
-    if any(phrase in query for phrase in [
-        'joke', 'tell me a joke', 'something funny', 'make me laugh'
-    ]):
-        return 'joke'
-    
-    # Check for math calculations
-    if any(char in query for char in '+-*/^%') or any(word in query for word in [
-        'calculate', 'compute', 'sum', 'add', 'subtract', 'multiply', 'divide',
-        'square root', 'power', 'percent', 'calculator'
-    ]):
-        return 'calculation'
-    
-    # Default to general query
-    return 'general_query'
+    intent = keyword_intent(query, language)
+    classifier = _load_intent_classifier() if intent == 'general_query' else None
+    if classifier is None:
+        return intent
+    predicted, confidence = classifier.classify([query])[0]
+    return predicted if confidence >= INTENT_CLASSIFIER_THRESHOLD else intent
+
+def detect_intents(queries, language='en'):
+    """
+    Detect the intent of each query in a batch
+    """
+    return [intent for intent, _, _ in classify_intents(queries, language)]
 
 def process_query(query, language='en', voice_mode=False):
     """
     Process the user query and return a response
     """
+    received = time.perf_counter() if query_history.enabled else 0.0
+    # Normalize once so handlers see exactly the text the cache is keyed on
+    query = normalize_query(query)
+    
+    # Serve deterministic intents straight from the cache when possible
+    cached = response_cache.get(query, language)
+    if cached is not None:
+        intent, response = cached
+        if metrics.enabled:
+            count_cache_hit(intent)
+        if received:
+            query_history.record(query, language, intent, time.perf_counter() - received, cached=True)
+        return _build_result(query, response, intent, voice_mode, language)
+    
     # Detect the intent
     intent = detect_intent(query, language)
+    data = None
+    started = time.perf_counter() if metrics.enabled else 0.0
     
     # Process based on intent
-    if intent == 'code_generation':
-        response = generate_code(query)
-    elif intent == 'system_command':
-        response = handle_system_command(query)
-    elif intent == 'system_monitor':
-        response = "I'll show you the system resources monitor."
-    elif intent == 'weather':
-        response = get_weather(query)
-    elif intent == 'time':
-        response = get_time(query)
-    elif intent == 'joke':
-        response = get_joke()
-    elif intent == 'calculation':
-        response = calculate(query)
-    else:
-        response = handle_general_query(query)
-    
-    # Build the result object
+    try:
+        if intent == 'code_generation':
+            response = generate_code(query)
+        elif intent == 'system_command':
+            response = handle_system_command(query)
+        elif intent == 'system_monitor':
+            response, data = get_system_monitor_report()
+        elif intent == 'weather':
+            response = get_weather(query)
+        elif intent == 'time':
+            response = get_time(query)
+        elif intent == 'joke':
+            response = get_joke()
+        elif intent == 'calculation':
+            response = calculate(query)
+        else:
+            response = handle_general_query(query)
+    except Exception:
+        if started:
+            count_intent_error(intent)
+        raise
+    if started:
+        observe_intent(intent, time.perf_counter() - started)
+    
+    response_cache.put(query, language, intent, response)
+    if received:
+        query_history.record(query, language, intent, time.perf_counter() - received)
+    return _build_result(query, response, intent, voice_mode, language, data)
+
+def _build_result(query, response, intent, voice_mode, language, data=None):
+    """
+    Build the result object returned for a query
+    """
     result = {
         'query': query,
         'response': response,
@@ -113,6 +291,8 @@ def process_query(query, language='en', voice_mode=False):
         'voice_mode': voice_mode,
         'language': language
     }
+    if data is not None:
+        result['data'] = data
     
     return result
 
@@ -367,22 +547,39 @@ def handle_system_command(query):
     
     return "I can't execute that system command for safety reasons."
 
+def get_system_monitor_report(limit=5):
+    """
+    Summarize the heaviest processes by CPU, memory and I/O
+    """
+    breakdown = process_monitor.breakdown(limit)
+    
+    def describe(processes, key, unit):
+        return ', '.join(f"{proc['name']} ({proc[key]}{unit})" for proc in processes)
+    
+    response = (
+        f"Top processes by CPU: {describe(breakdown['cpu'], 'cpu_percent', '%')}. "
+        f"By memory: {describe(breakdown['memory'], 'rss_mb', ' MB')}. "
+        f"By disk I/O: {describe(breakdown['io'], 'io_bytes_per_sec', ' B/s')}."
+    )
+    return response, {'processes': breakdown}
+
 def get_weather(query):
     """
     Get weather information
     """
-    # In a real implementation, this would call a weather API
-    # For demonstration, return a sample response
-    
     # Try to extract location
-    location_match = re.search(r'in ([a-zA-Z\s]+)', query)
-    location = location_match.group(1) if location_match else "your location"
-    
-    # Generate random weather data for demo purposes
-    temp = random.randint(50, 90)
-    conditions = random.choice(['sunny', 'partly cloudy', 'cloudy', 'rainy', 'stormy', 'snowy'])
+    location_match = re.search(r'\bin ([a-zA-Z\s]+)', query)
+    location = location_match.group(1).strip() if location_match else ''
+    location = re.sub(r'\s+(today|tonight|tomorrow|now|right now)$', '', location, flags=re.IGNORECASE)
+    location = location or os.environ.get('WEATHER_DEFAULT_LOCATION', 'your location')
     
-    return f"The weather in {location} is currently {conditions} with a temperature of {temp}°F. Forecast shows similar conditions throughout the day."
+    try:
+        return describe(weather_service.get(location))
+    except LocationNotFound:
+        return f"I couldn't find a place called {location}. Try a city name, like 'weather in London'."
+    except WeatherError as e:
+        print(f"Error getting weather: {str(e)}")
+        return f"Sorry, I can't get the weather for {location} right now. Please try again in a moment."
 
 def get_time(query):
     """
@@ -391,13 +588,22 @@ def get_time(query):
     now = datetime.datetime.now()
     
     # Check if a specific location/timezone is mentioned
-    location_match = re.search(r'in ([a-zA-Z\s]+)', query)
+    location_match = re.search(r'\b(?:in|at|for) ([^?!.,;]+)', query, re.IGNORECASE)
     
     if location_match:
         location = location_match.group(1).strip()
-        # In a real implementation, we would convert to the requested timezone
-        # For demonstration, just mention that we would do this
-        return f"The current time in {location} would be displayed here. Your local time is {now.strftime('%I:%M %p')}."
+        match = timezone_index.resolve(location)
+        if match is None:
+            return f"I couldn't find a time zone for {location}. Your local time is {now.strftime('%I:%M %p')}."
+        there = timezone_index.now(match)
+        clock, abbreviation, offset = there.strftime('%I:%M %p|%Z|%z').split('|')
+        offset = f"UTC{offset[:3]}:{offset[3:]}"
+        # Zones without a common abbreviation report just the offset
+        zone_name = offset if abbreviation[0] in '+-' else f"{abbreviation}, {offset}"
+        text = f"The current time in {match.name} is {clock} ({zone_name})"
+        if there.date() != now.date():
+            text += f" on {there.strftime('%A')}"
+        return text + "."
     else:
         return f"The current time is {now.strftime('%I:%M %p')}."
 
@@ -419,9 +625,11 @@ def get_joke():
     ]
     return random.choice(jokes)
 
-def calculate(query):
+def calculate(query, mode=CALCULATION_MODE):
     """
     Perform a calculation
+
+    `mode` selects the number type: 'float' (default), 'decimal' or 'fraction'
     """
     # Strip words and extract just the math expression
     # This is a simplified implementation
@@ -457,9 +665,9 @@ def calculate(query):
         return "I couldn't extract a valid calculation from your query."
     
     try:
-        # WARNING: eval is unsafe for user input in production
-        # In a real implementation, use a safer method to evaluate expressions
-        result = eval(expression)
+        # Evaluated by the bounded AST engine rather than eval(), so no
+        # input can run arbitrary code or pin the worker
+        result = evaluate_expression(expression, mode)
         return f"The result of {expression} is {result}"
     except Exception as e:
         return f"Sorry, I couldn't calculate that. Error: {str(e)}"
@@ -468,16 +676,42 @@ def handle_general_query(query):
     """
     Handle general queries that don't match specific intents
     """
-    # In a real implementation, this would call an AI API or use a knowledge base
-    # For demonstration, return a simple response
-    responses = [
-        "I don't have enough information to answer that question properly. Could you provide more details?",
-        "That's an interesting question. In a full implementation, I would provide a detailed answer.",
-        "I'm designed to understand that query, but my knowledge base is limited in this demo.",
-        "I'd normally respond with information from reliable sources, but I'm running in demo mode.",
-        "Great question! I'd usually connect to an external API to get you the most up-to-date information."
-    ]
-    return random.choice(responses)
+    try:
+        response = completion_service.complete(query)
+    except CompletionError as e:
+        print(f"Error completing general query: {str(e)}")
+        response = ''
+    return response or random.choice(CANNED_RESPONSES)
+
+def stream_general_query(completion, query, language='en', voice_mode=False):
+    """
+    Yield ('token', text) for each token of an opened completion, then
+    ('done', result) with the full result; ('error', message) if the
+    backend fails part-way
+    """
+    received = time.perf_counter()
+    tokens = []
+    try:
+        for token in completion:
+            tokens.append(token)
+            yield 'token', token
+    except CompletionError as e:
+        print(f"Error streaming general query: {str(e)}")
+        if metrics.enabled:
+            count_intent_error('general_query')
+        yield 'error', f'Error processing query: {str(e)}'
+        return
+    finally:
+        completion.close()
+    
+    elapsed = time.perf_counter() - received
+    if metrics.enabled:
+        observe_intent('general_query', elapsed)
+    if query_history.enabled:
+        query_history.record(query, language, 'general_query', elapsed)
+    result = _build_result(query, ''.join(tokens).strip(), 'general_query', voice_mode, language)
+    result['truncated'] = completion.truncated
+    yield 'done', result
 
 # If run directly, test with a sample query
 if __name__ == "__main__":
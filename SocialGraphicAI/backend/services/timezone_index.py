@@ -0,0 +1,257 @@
+"""
+Place name to IANA time zone index for time queries.
+
+Names come from two sources: the city part of every zone in the bundled
+zoneinfo database ('America/Argentina/Buenos_Aires' gives 'buenos aires'),
+and CITY_TABLE below, which adds countries, US states, big cities without
+a zone of their own, and common aliases. Names are normalized once
+(casefolded, accents and punctuation removed) into a sorted array. Exact
+lookups use a dict, prefix lookups bisect the array, and fuzzy lookups only
+compare names that share a first letter with the query.
+
+Nothing is built until the first lookup. ZoneInfo objects are created once
+per zone and reused, and resolved phrases are memoized, so answering a time
+query is a dict lookup plus formatting.
+"""
+import bisect
+import datetime
+import difflib
+import re
+import threading
+import unicodedata
+import zoneinfo
+from dataclasses import dataclass
+
+# zone: comma-separated extra names that resolve to it
+CITY_TABLE = """
+America/New_York: new york city, nyc, manhattan, brooklyn, washington, washington dc, boston, philadelphia,
+    atlanta, miami, orlando, pittsburgh, baltimore, charlotte, east coast, eastern time, est, edt,
+    usa, us, united states, united states of america, america, massachusetts, florida, georgia, pennsylvania
+America/Chicago: dallas, houston, austin, san antonio, minneapolis, st louis, saint louis, new orleans,
+    kansas city, nashville, milwaukee, texas, illinois, central time, cst, cdt
+America/Denver: salt lake city, albuquerque, colorado, utah, mountain time, mst, mdt
+America/Phoenix: arizona, tucson
+America/Los_Angeles: san francisco, sf, la, san diego, san jose, seattle, portland, las vegas, sacramento,
+    silicon valley, california, washington state, oregon, nevada, west coast, pacific time, pst, pdt
+America/Anchorage: alaska
+Pacific/Honolulu: hawaii
+America/Toronto: ottawa, ontario, quebec city
+America/Montreal: montreal, quebec
+America/Vancouver: british columbia
+America/Edmonton: calgary, alberta
+America/Mexico_City: mexico, guadalajara, monterrey
+America/Sao_Paulo: brazil, rio de janeiro, rio, brasilia
+America/Argentina/Buenos_Aires: argentina
+America/Bogota: colombia, medellin
+America/Lima: peru
+America/Santiago: chile
+America/Caracas: venezuela
+Europe/London: uk, united kingdom, great britain, britain, england, scotland, wales, edinburgh, manchester,
+    birmingham, liverpool, glasgow, gmt, bst
+Europe/Dublin: ireland
+Europe/Paris: france, lyon, marseille, nice
+Europe/Berlin: germany, munich, frankfurt, hamburg, cologne, stuttgart, cet, cest
+Europe/Madrid: spain, barcelona, valencia, seville
+Europe/Rome: italy, milan, naples, florence, venice, turin
+Europe/Amsterdam: netherlands, holland, rotterdam, the hague
+Europe/Brussels: belgium
+Europe/Zurich: switzerland, geneva, bern
+Europe/Vienna: austria
+Europe/Stockholm: sweden
+Europe/Oslo: norway
+Europe/Copenhagen: denmark
+Europe/Helsinki: finland
+Europe/Warsaw: poland, krakow
+Europe/Prague: czechia, czech republic
+Europe/Athens: greece
+Europe/Lisbon: portugal, porto
+Europe/Istanbul: turkey, turkiye, ankara
+Europe/Kyiv: ukraine, kiev
+Europe/Moscow: russia, saint petersburg, st petersburg, msk
+Africa/Cairo: egypt, alexandria
+Africa/Lagos: nigeria, abuja
+Africa/Nairobi: kenya
+Africa/Johannesburg: south africa, cape town, pretoria, durban
+Africa/Casablanca: morocco, rabat
+Asia/Dubai: uae, united arab emirates, abu dhabi, sharjah
+Asia/Riyadh: saudi arabia, jeddah, mecca
+Asia/Qatar: qatar, doha
+Asia/Tehran: iran
+Asia/Jerusalem: israel, tel aviv
+Asia/Karachi: pakistan, lahore, islamabad
+Asia/Kolkata: india, ist, delhi, new delhi, mumbai, bombay, bangalore, bengaluru, chennai, madras, hyderabad,
+    pune, ahmedabad, jaipur, calcutta
+Asia/Kathmandu: nepal
+Asia/Dhaka: bangladesh, chittagong
+Asia/Bangkok: thailand
+Asia/Ho_Chi_Minh: vietnam, saigon, hanoi
+Asia/Jakarta: indonesia
+Asia/Singapore: singapore
+Asia/Kuala_Lumpur: malaysia
+Asia/Manila: philippines
+Asia/Shanghai: china, beijing, peking, shenzhen, guangzhou, chengdu, wuhan
+Asia/Hong_Kong: hong kong, hk
+Asia/Taipei: taiwan
+Asia/Seoul: south korea, korea, busan
+Asia/Tokyo: japan, osaka, kyoto, yokohama, jst
+Australia/Sydney: australia, canberra, aest
+Australia/Melbourne: victoria
+Australia/Perth: western australia
+Pacific/Auckland: new zealand, wellington, nz
+UTC: utc, zulu, coordinated universal time
+"""
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_NON_PLACE_WORDS = {'right', 'now', 'today', 'tonight', 'currently', 'please', 'zone', 'timezone', 'time'}
+MAX_NAME_WORDS = 5
+
+def normalize(name):
+    """
+    Casefold, drop accents and punctuation, collapse whitespace
+    """
+    name = unicodedata.normalize('NFKD', name.replace('_', ' '))
+    name = ''.join(char for char in name if not unicodedata.combining(char))
+    return ' '.join(_PUNCTUATION.sub(' ', name.casefold()).split())
+
+@dataclass(frozen=True)
+class ZoneMatch:
+    name: str
+    zone: str
+    exact: bool = True
+
+class TimezoneIndex:
+    """
+    Lazily built name -> zone index
+    """
+
+    def __init__(self, table=CITY_TABLE):
+        self._table = table
+        self._names = None
+        self._zones_by_name = None
+        self._display = None
+        self._by_letter = None
+        self._zone_objects = {}
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _build(self):
+        zones = {}
+        display = {}
+
+        def add(name, zone, shown):
+            key = normalize(name)
+            if key and key not in zones:
+                zones[key] = zone
+                display[key] = shown
+
+        available = zoneinfo.available_timezones()
+        # Table entries first, so that they win over zone-derived names
+        for line in re.sub(r',\s*\n\s+', ', ', self._table).strip().splitlines():
+            zone, _, aliases = line.partition(':')
+            if zone.strip() not in available:
+                # Older tz databases lack some newer names (Europe/Kyiv)
+                continue
+            for alias in aliases.split(','):
+                alias = alias.strip()
+                add(alias, zone.strip(), alias.title() if len(alias) > 3 else alias.upper())
+        for zone in sorted(available):
+            parts = zone.split('/')
+            if parts[0] in ('Etc', 'SystemV') or len(parts) == 1:
+                continue
+            add(parts[-1], zone, parts[-1].replace('_', ' '))
+            add(zone, zone, parts[-1].replace('_', ' '))
+
+        by_letter = {}
+        for key in zones:
+            by_letter.setdefault(key[0], []).append(key)
+        self._display = display
+        self._by_letter = by_letter
+        self._zones_by_name = zones
+        self._names = sorted(zones)
+
+    def _ensure_built(self):
+        if self._names is None:
+            with self._lock:
+                if self._names is None:
+                    self._build()
+
+    def __len__(self):
+        self._ensure_built()
+        return len(self._names)
+
+    def _match(self, key, exact=True):
+        return ZoneMatch(self._display[key], self._zones_by_name[key], exact)
+
+    def lookup(self, name):
+        """
+        Exact match on a normalized name, or None
+        """
+        self._ensure_built()
+        key = normalize(name)
+        return self._match(key) if key in self._zones_by_name else None
+
+    def prefix(self, text, limit=10):
+        """
+        Up to `limit` matches whose names start with `text`, alphabetically
+        """
+        self._ensure_built()
+        key = normalize(text)
+        start = bisect.bisect_left(self._names, key)
+        matches = []
+        for name in self._names[start:start + limit]:
+            if not name.startswith(key):
+                break
+            matches.append(self._match(name, exact=name == key))
+        return matches
+
+    def fuzzy(self, text, cutoff=0.8):
+        """
+        Closest name by edit similarity, for typos like 'tokio' or 'londn'
+        """
+        self._ensure_built()
+        key = normalize(text)
+        if not key:
+            return None
+        close = difflib.get_close_matches(key, self._by_letter.get(key[0], ()), n=1, cutoff=cutoff)
+        return self._match(close[0], exact=False) if close else None
+
+    def resolve(self, phrase):
+        """
+        Find the place named at the start of a phrase such as
+        'new york right now', trying the longest run of words first,
+        then a fuzzy match; memoized
+        """
+        if phrase in self._resolved:
+            return self._resolved[phrase]
+        self._ensure_built()
+        words = normalize(phrase).split()[:MAX_NAME_WORDS]
+        match = self._longest_name(words)
+        if match is None and words[:1] == ['the']:
+            match = self._longest_name(words[1:])
+        if match is None:
+            place = ' '.join(word for word in words if word not in _NON_PLACE_WORDS and word != 'the')
+            match = self.fuzzy(place) if place else None
+        if len(self._resolved) < 10000:
+            self._resolved[phrase] = match
+        return match
+
+    def _longest_name(self, words):
+        for length in range(len(words), 0, -1):
+            candidate = ' '.join(words[:length])
+            if candidate in self._zones_by_name:
+                return self._match(candidate)
+        return None
+
+    def zone(self, key):
+        """
+        The shared ZoneInfo object for a zone key
+        """
+        zone = self._zone_objects.get(key)
+        if zone is None:
+            zone = self._zone_objects[key] = zoneinfo.ZoneInfo(key)
+        return zone
+
+    def now(self, match):
+        return datetime.datetime.now(self.zone(match.zone))
+
+timezone_index = TimezoneIndex()
@@ -0,0 +1,323 @@
+"""
+Content-addressed storage for uploaded files.
+
+Uploads are streamed to a temporary file in fixed-size chunks while their
+SHA-256 is computed, and the size limit is enforced as soon as it is crossed.
+Finished files are stored under `objects/<first two hex digits>/<sha256>`,
+so uploading the same content twice only keeps one copy.
+
+Large files can also be sent as resumable sessions: the client creates a
+session, appends chunks at explicit byte offsets (retrying from the last
+acknowledged offset after a failure) and then completes it. Session state
+lives on disk, so any worker process can accept the next chunk; appends hold
+an exclusive lock on the session's part file. Sessions left idle for longer
+than `session_ttl` are removed.
+
+Stored objects are kept for `object_ttl` after they were last uploaded
+(uploading the same content again renews them) and then removed, along with
+temporary files that a killed worker left behind. A job that already has an
+object open can still read it after it is removed.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+
+from werkzeug.utils import secure_filename
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+DEFAULT_SESSION_TTL = 24 * 3600
+DEFAULT_OBJECT_TTL = 30 * 24 * 3600
+_EXPIRY_SWEEP_INTERVAL = 300
+
+_UPLOAD_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+class UploadError(Exception):
+    """
+    Base class for upload failures
+    """
+
+class UploadTooLarge(UploadError):
+    """
+    Raised when an upload exceeds the configured maximum size
+    """
+
+class UnknownUpload(UploadError):
+    """
+    Raised for a missing or invalid upload session id
+    """
+
+class OffsetMismatch(UploadError):
+    """
+    Raised when a chunk does not start where the session currently ends
+    """
+
+    def __init__(self, expected):
+        super().__init__(f'Expected offset {expected}')
+        self.expected = expected
+
+@dataclass(frozen=True)
+class StoredUpload:
+    """
+    A file stored in the content-addressed store
+    """
+    sha256: str
+    size: int
+    path: str
+    filename: str
+    deduplicated: bool
+
+class UploadStore:
+    """
+    Streams uploads into a content-addressed directory tree
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES, chunk_size=DEFAULT_CHUNK_SIZE,
+                 session_ttl=DEFAULT_SESSION_TTL, object_ttl=DEFAULT_OBJECT_TTL):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.session_ttl = session_ttl
+        self.object_ttl = object_ttl
+        self._last_expiry_sweep = 0.0
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.sessions_dir = os.path.join(root, 'sessions')
+        for directory in (self.objects_dir, self.tmp_dir, self.sessions_dir):
+            os.makedirs(directory, exist_ok=True)
+
+    def object_path(self, sha256):
+        """
+        Path of the stored object with the given digest
+        """
+        if not _SHA256_PATTERN.match(sha256):
+            raise UnknownUpload(f'Invalid digest: {sha256}')
+        return os.path.join(self.objects_dir, sha256[:2], sha256)
+
+    def ingest(self, stream, filename):
+        """
+        Stream a complete upload into the store
+        """
+        self.sweep()
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            digest = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f'Upload exceeds {self.max_bytes} bytes')
+                    digest.update(chunk)
+                    out.write(chunk)
+            return self._commit(tmp_path, digest.hexdigest(), size, filename)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _commit(self, tmp_path, sha256, size, filename):
+        """
+        Move a fully written temp file to its content address
+        """
+        path = self.object_path(sha256)
+        deduplicated = os.path.exists(path)
+        if deduplicated:
+            # Renew the object's retention
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                deduplicated = False
+        if not deduplicated:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+        return StoredUpload(sha256=sha256, size=size, path=path,
+                            filename=secure_filename(filename) or sha256,
+                            deduplicated=deduplicated)
+
+    # Resumable sessions
+
+    def _session_paths(self, upload_id):
+        if not _UPLOAD_ID_PATTERN.match(upload_id or ''):
+            raise UnknownUpload(f'Unknown upload: {upload_id}')
+        base = os.path.join(self.sessions_dir, upload_id)
+        return base + '.json', base + '.part'
+
+    def create_session(self, filename, total_size=None):
+        """
+        Start a resumable upload and return its session info
+        """
+        if total_size is not None:
+            try:
+                if isinstance(total_size, bool) or (isinstance(total_size, float)
+                                                    and not total_size.is_integer()):
+                    raise TypeError(total_size)
+                total_size = int(total_size)
+            except (TypeError, ValueError):
+                raise UploadError(f'Invalid upload size: {total_size!r}')
+            if total_size < 0:
+                raise UploadError(f'Invalid upload size: {total_size}')
+            if total_size > self.max_bytes:
+                raise UploadTooLarge(f'Upload exceeds {self.max_bytes} bytes')
+        self.sweep()
+
+        upload_id = uuid.uuid4().hex
+        meta_path, part_path = self._session_paths(upload_id)
+        open(part_path, 'wb').close()
+        with open(meta_path, 'w') as f:
+            json.dump({'filename': filename, 'total_size': total_size}, f)
+        return self.session_status(upload_id)
+
+    def session_status(self, upload_id):
+        """
+        Return the session's metadata and the offset the next chunk must start at
+        """
+        meta_path, part_path = self._session_paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            offset = os.path.getsize(part_path)
+        except FileNotFoundError:
+            raise UnknownUpload(f'Unknown upload: {upload_id}')
+        return {
+            'upload_id': upload_id,
+            'filename': meta['filename'],
+            'total_size': meta['total_size'],
+            'offset': offset
+        }
+
+    def append_chunk(self, upload_id, offset, stream):
+        """
+        Append a chunk that starts at `offset`; returns the new offset
+        """
+        _, part_path = self._session_paths(upload_id)
+        try:
+            out = open(part_path, 'r+b')
+        except FileNotFoundError:
+            raise UnknownUpload(f'Unknown upload: {upload_id}')
+
+        with out:
+            # Held until the chunk is written, so concurrent appends at the
+            # same offset can't both pass the check
+            fcntl.flock(out, fcntl.LOCK_EX)
+            status = self.session_status(upload_id)
+            if offset != status['offset']:
+                raise OffsetMismatch(status['offset'])
+            limit = self.max_bytes
+            if status['total_size'] is not None:
+                limit = min(limit, status['total_size'])
+
+            size = offset
+            out.seek(offset)
+            try:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > limit:
+                        raise UploadTooLarge(f'Upload exceeds {limit} bytes')
+                    out.write(chunk)
+            except Exception:
+                # Roll back to the last acknowledged offset so the client can retry
+                out.truncate(offset)
+                raise
+            out.truncate(size)
+        return size
+
+    def complete_session(self, upload_id):
+        """
+        Finish a resumable upload and move it into the store
+        """
+        status = self.session_status(upload_id)
+        if status['total_size'] is not None and status['offset'] != status['total_size']:
+            raise OffsetMismatch(status['offset'])
+
+        meta_path, part_path = self._session_paths(upload_id)
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            # Wait for any in-flight append before hashing
+            fcntl.flock(f, fcntl.LOCK_EX)
+            size = os.fstat(f.fileno()).st_size
+            if status['total_size'] is not None and size != status['total_size']:
+                raise OffsetMismatch(size)
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                digest.update(chunk)
+            stored = self._commit(part_path, digest.hexdigest(), size, status['filename'])
+        for path in (meta_path, part_path):
+            if os.path.exists(path):
+                os.remove(path)
+        return stored
+
+    def abort_session(self, upload_id):
+        """
+        Discard a resumable upload
+        """
+        for path in self._session_paths(upload_id):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # Retention
+
+    def sweep(self, now=None):
+        """
+        Remove expired sessions, objects and temporary files; runs at most
+        once per sweep interval unless `now` is given
+        """
+        if now is None:
+            now = time.time()
+            if now - self._last_expiry_sweep < _EXPIRY_SWEEP_INTERVAL:
+                return 0
+        self._last_expiry_sweep = now
+        return self.expire_sessions(now) + self.expire_objects(now)
+
+    def expire_sessions(self, now=None):
+        """
+        Remove sessions not written to for longer than `session_ttl`
+        """
+        if now is None:
+            now = time.time()
+
+        expired = 0
+        for name in os.listdir(self.sessions_dir):
+            upload_id, suffix = os.path.splitext(name)
+            if suffix != '.part':
+                continue
+            try:
+                idle = now - os.path.getmtime(os.path.join(self.sessions_dir, name))
+                if idle > self.session_ttl:
+                    self.abort_session(upload_id)
+                    expired += 1
+            except (OSError, UnknownUpload):
+                continue
+        return expired
+
+    def expire_objects(self, now=None):
+        """
+        Remove objects not uploaded for longer than `object_ttl`, and
+        temporary files older than `session_ttl`
+        """
+        if now is None:
+            now = time.time()
+
+        expired = 0
+        for directory, ttl in ((self.objects_dir, self.object_ttl), (self.tmp_dir, self.session_ttl)):
+            for parent, _, names in os.walk(directory):
+                for name in names:
+                    path = os.path.join(parent, name)
+                    try:
+                        if now - os.path.getmtime(path) > ttl:
+                            os.remove(path)
+                            expired += 1
+                    except OSError:
+                        continue
+        return expired
@@ -0,0 +1,261 @@
+"""
+Weather lookups for the assistant.
+
+A provider turns a location name into a WeatherReport. WeatherService sits
+in front of it with a per-location TTL cache and single-flight coalescing:
+however many requests ask about the same place at once, one upstream call is
+made and they all share its result.
+
+Reports stay fresh for `ttl` seconds, and are kept as stale for
+`stale_ttl` more. A request for a stale report starts a refresh and waits for
+it up to `stale_wait` seconds. If the upstream is slower or failing, the
+request gets the stale report (flagged `stale`), and the refresh carries on in
+the background. Only a location with no usable report waits the full
+`timeout`.
+
+Providers:
+    stub        deterministic local readings, no network (default)
+    open-meteo  Open-Meteo geocoding and forecast APIs over pooled
+                keep-alive HTTPS connections
+"""
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, replace
+from urllib.parse import urlencode
+
+from services.http_pool import ConnectionPool, UpstreamError
+
+DEFAULT_TTL = 600
+DEFAULT_STALE_TTL = 3600
+DEFAULT_STALE_WAIT = 0.25
+DEFAULT_TIMEOUT = 3.0
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_FETCH_WORKERS = 4
+# Unknown places are remembered too, so typos don't hit the upstream each time
+NOT_FOUND_TTL = 300
+
+CONDITIONS = ['sunny', 'partly cloudy', 'cloudy', 'rainy', 'stormy', 'snowy']
+
+# WMO weather interpretation codes used by Open-Meteo
+_WMO_CONDITIONS = [
+    (0, 'clear'), (1, 'mostly clear'), (2, 'partly cloudy'), (3, 'overcast'),
+    (48, 'foggy'), (57, 'drizzly'), (67, 'rainy'), (77, 'snowy'), (82, 'showery'),
+    (86, 'snowy'), (99, 'stormy')
+]
+
+class WeatherError(Exception):
+    """
+    No weather could be had for a location
+    """
+
+class LocationNotFound(WeatherError):
+    """
+    The provider doesn't know the location
+    """
+
+@dataclass(frozen=True)
+class WeatherReport:
+    location: str
+    temperature_f: float
+    conditions: str
+    high_f: float = None
+    low_f: float = None
+    fetched_at: float = 0.0
+    stale: bool = False
+
+def describe(report):
+    """
+    The sentence the assistant answers with
+    """
+    text = (f"The weather in {report.location} is currently {report.conditions} "
+            f"with a temperature of {report.temperature_f:.0f}°F.")
+    if report.high_f is not None and report.low_f is not None:
+        text += f" Today's high is {report.high_f:.0f}°F and the low {report.low_f:.0f}°F."
+    else:
+        text += " Forecast shows similar conditions throughout the day."
+    if report.stale:
+        text += f" (Last updated at {time.strftime('%I:%M %p', time.localtime(report.fetched_at))}.)"
+    return text
+
+class StubWeatherProvider:
+    """
+    Local provider for development and tests: readings are derived from the
+    location name, with optional artificial latency and failures
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency=0.0, fail=False):
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, location):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail:
+            raise WeatherError('stub provider set to fail')
+        rng = random.Random(location.casefold())
+        temperature = rng.randint(50, 90)
+        return WeatherReport(location, temperature, rng.choice(CONDITIONS),
+                             high_f=temperature + rng.randint(0, 8), low_f=temperature - rng.randint(0, 12))
+
+class OpenMeteoProvider:
+    """
+    Open-Meteo geocoding plus current conditions; no API key needed
+    """
+
+    name = 'open-meteo'
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_connections=8,
+                 geocoding_url='https://geocoding-api.open-meteo.com/v1',
+                 forecast_url='https://api.open-meteo.com/v1'):
+        self.timeout = timeout
+        self._geocoding = ConnectionPool(geocoding_url, max_connections, timeout)
+        self._forecast = ConnectionPool(forecast_url, max_connections, timeout)
+
+    def _get(self, pool, path, params, deadline):
+        status, _, body = pool.request('GET', f'{path}?{urlencode(params)}',
+                                       headers={'Accept': 'application/json'}, deadline=deadline)
+        if status != 200:
+            raise WeatherError(f'{pool.host} returned HTTP {status}')
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise WeatherError(f'{pool.host} returned invalid JSON') from e
+
+    def fetch(self, location):
+        deadline = time.monotonic() + self.timeout
+        try:
+            places = self._get(self._geocoding, '/search', {'name': location, 'count': 1}, deadline)
+            if not places.get('results'):
+                raise LocationNotFound(location)
+            place = places['results'][0]
+            forecast = self._get(self._forecast, '/forecast', {
+                'latitude': place['latitude'],
+                'longitude': place['longitude'],
+                'current': 'temperature_2m,weather_code',
+                'daily': 'temperature_2m_max,temperature_2m_min',
+                'temperature_unit': 'fahrenheit',
+                'forecast_days': 1,
+                'timezone': 'auto'
+            }, deadline)
+            current = forecast['current']
+            daily = forecast.get('daily', {})
+        except UpstreamError as e:
+            raise WeatherError(str(e)) from e
+        except (KeyError, IndexError, TypeError) as e:
+            raise WeatherError(f'Unexpected weather response: {e}') from e
+        code = current.get('weather_code', 0)
+        conditions = next((name for limit, name in _WMO_CONDITIONS if code <= limit), 'stormy')
+        highs, lows = daily.get('temperature_2m_max') or [None], daily.get('temperature_2m_min') or [None]
+        return WeatherReport(place.get('name', location), current['temperature_2m'], conditions,
+                             high_f=highs[0], low_f=lows[0])
+
+    def stats(self):
+        return {'geocoding': self._geocoding.stats(), 'forecast': self._forecast.stats()}
+
+def create_provider(name, timeout=DEFAULT_TIMEOUT):
+    if name == 'stub':
+        return StubWeatherProvider()
+    if name == 'open-meteo':
+        return OpenMeteoProvider(timeout=timeout)
+    raise ValueError(f'Unknown weather provider: {name}')
+
+class WeatherService:
+    """
+    TTL cache with single-flight refreshes in front of a provider
+    """
+
+    def __init__(self, provider, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, stale_wait=DEFAULT_STALE_WAIT,
+                 timeout=DEFAULT_TIMEOUT, max_entries=DEFAULT_MAX_ENTRIES, fetch_workers=DEFAULT_FETCH_WORKERS):
+        self.provider = provider
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_wait = stale_wait
+        self.timeout = timeout
+        self.max_entries = max_entries
+        # key -> (report or None if not found, fetched_at)
+        self._entries = OrderedDict()
+        # key -> Future of the refresh in progress
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='weather-fetch')
+        self._stats = {'hits': 0, 'stale': 0, 'misses': 0, 'coalesced': 0, 'fetches': 0, 'errors': 0}
+
+    def get(self, location):
+        """
+        Return a WeatherReport for `location`; raises WeatherError
+        """
+        key = ' '.join(location.casefold().split())
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            age = now - entry[1] if entry is not None else None
+            if entry is not None and age < (self.ttl if entry[0] is not None else NOT_FOUND_TTL):
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._found(location, entry[0])
+            usable = entry is not None and entry[0] is not None and age < self.ttl + self.stale_ttl
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = self._executor.submit(self._refresh, key, location)
+            else:
+                self._stats['coalesced'] += 1
+            self._stats['stale' if usable else 'misses'] += 1
+
+        try:
+            return self._found(location, flight.result(timeout=self.stale_wait if usable else self.timeout))
+        except FutureTimeout:
+            if usable:
+                return replace(entry[0], stale=True)
+            raise WeatherError(f'Weather for {location} is taking too long')
+        except WeatherError:
+            if usable:
+                return replace(entry[0], stale=True)
+            raise
+
+    @staticmethod
+    def _found(location, report):
+        if report is None:
+            raise LocationNotFound(location)
+        return report
+
+    def _refresh(self, key, location):
+        try:
+            self._stats['fetches'] += 1
+            try:
+                report = replace(self.provider.fetch(location), fetched_at=time.time())
+            except LocationNotFound:
+                report = None
+            with self._lock:
+                self._entries[key] = (report, time.time())
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return report
+        except Exception:
+            self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, entries=len(self._entries), in_flight=len(self._flights))
+        stats['provider'] = self.provider.name
+        if hasattr(self.provider, 'stats'):
+            stats['upstream'] = self.provider.stats()
+        return stats
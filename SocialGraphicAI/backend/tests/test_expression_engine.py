@@ -0,0 +1,67 @@
+import decimal
+from fractions import Fraction
+
+import pytest
+
+from services.expression_engine import (ExpressionError, MAX_EXPONENT, MAX_EXPRESSION_LENGTH, MAX_STEPS,
+                                        MODE_DECIMAL, MODE_FRACTION, compile_expression, evaluate_expression)
+
+@pytest.mark.parametrize('expression, expected', [
+    ('1 + 2 * 3', 7),
+    ('(1 + 2) * 3', 9),
+    ('-5 + 3', -2),
+    ('2 ** 10', 1024),
+    ('7 // 2', 3),
+    ('7 % 4', 3),
+    ('10 / 4', 2.5),
+])
+def test_arithmetic(expression, expected):
+    assert evaluate_expression(expression) == expected
+
+def test_decimal_mode_is_exact():
+    assert evaluate_expression('0.1 + 0.2', MODE_DECIMAL) == decimal.Decimal('0.3')
+
+def test_fraction_mode_is_exact():
+    assert evaluate_expression('1 / 3 + 1 / 6', MODE_FRACTION) == Fraction(1, 2)
+
+@pytest.mark.parametrize('expression', [
+    '__import__("os")',
+    'abs(-1)',
+    'x + 1',
+    '"a" * 3',
+    '[1, 2]',
+    '1 if 1 else 2',
+    '1 < 2',
+])
+def test_rejects_anything_but_arithmetic(expression):
+    with pytest.raises(ExpressionError):
+        evaluate_expression(expression)
+
+def test_rejects_invalid_syntax():
+    with pytest.raises(ExpressionError):
+        evaluate_expression('1 +')
+
+def test_limits_length():
+    with pytest.raises(ExpressionError):
+        evaluate_expression('1+' * (MAX_EXPRESSION_LENGTH // 2) + '1')
+
+def test_limits_steps():
+    expression = '+'.join(['1'] * (MAX_STEPS // 2 + 1))
+    assert len(expression) <= MAX_EXPRESSION_LENGTH
+    with pytest.raises(ExpressionError):
+        evaluate_expression(expression)
+
+def test_limits_exponent():
+    with pytest.raises(ExpressionError):
+        evaluate_expression(f'2 ** {MAX_EXPONENT + 1}')
+
+def test_limits_result_size():
+    with pytest.raises(ExpressionError):
+        evaluate_expression('9 ** 4000 * 9 ** 4000')
+
+def test_unknown_mode():
+    with pytest.raises(ExpressionError):
+        evaluate_expression('1', 'complex')
+
+def test_compiled_evaluators_are_cached():
+    assert compile_expression('6 * 7') is compile_expression('6 * 7')
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from services import task_engine
+from services.intent_classifier import IntentClassifier, featurize
+
+MISROUTES = ['sometimes I wonder', 'my favourite pastime is reading', 'a well-known story']
+
+@pytest.fixture(scope='module')
+def model():
+    return IntentClassifier.load(task_engine.INTENT_CLASSIFIER_MODEL)
+
+@pytest.fixture
+def classifier_on(monkeypatch, model):
+    monkeypatch.setattr(task_engine, '_intent_classifier', model)
+    return model
+
+def test_features_do_not_depend_on_the_batch():
+    _, alone, _ = featurize(['what time is it'])
+    _, batched, counts = featurize(['2 + 2', 'what time is it', 'tell me a joke'])
+    start = counts[0]
+    assert np.array_equal(batched[start:start + counts[1]], alone)
+
+def test_classify_matches_predict_proba(model):
+    queries = ['what time is it in Tokyo', 'tell me a joke', 'what is 12 * 7']
+    probabilities = model.predict_proba(queries)
+    assert np.allclose(probabilities.sum(axis=1), 1.0, atol=1e-5)
+    for (intent, confidence), row in zip(model.classify(queries), probabilities):
+        assert intent == model.intents[row.argmax()]
+        assert confidence == pytest.approx(float(row.max()), abs=1e-5)
+
+def test_classifier_is_off_by_default():
+    assert not task_engine.INTENT_CLASSIFIER
+
+@pytest.mark.parametrize('query', MISROUTES)
+def test_words_containing_keywords_are_general_queries(query):
+    assert task_engine.match_intents(query) == []
+    assert task_engine.detect_intent(query) == 'general_query'
+
+@pytest.mark.parametrize('query, intent', [
+    ('what time is it', 'time'),
+    ('what is 5 - 3', 'calculation'),
+    ('(3+4)*2', 'calculation'),
+    ('rainy day ahead?', 'weather'),
+])
+def test_keyword_guards_keep_real_matches(query, intent):
+    assert task_engine.detect_intent(query) == intent
+
+def test_classifier_only_breaks_ties(classifier_on):
+    queries = MISROUTES + ['what time is it', 'is it going to be hot tomorrow in Lisbon']
+    results = task_engine.classify_intents(queries)
+    # A keyword match is never overridden
+    assert results[3] == ('time', None, 'keywords')
+    for query, (intent, confidence, source) in zip(queries, results):
+        if source == 'classifier':
+            assert confidence >= task_engine.INTENT_CLASSIFIER_THRESHOLD
+        assert task_engine.detect_intent(query) == intent
+    assert [intent for intent, _, _ in results[:3]] == ['general_query'] * 3
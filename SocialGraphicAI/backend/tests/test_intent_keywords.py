@@ -0,0 +1,44 @@
+import pytest
+
+from services.intent_keywords import INTENT_KEYWORDS, NATIVE_INTENT_KEYWORDS, keywords_for, normalize_text
+from services.task_engine import SUPPORTED_LANGUAGES, match_intents
+
+def test_normalize_text():
+    assert normalize_text('What TIME is it') == 'what time is it'
+    # NFKC folds full-width letters, casefold handles ß
+    assert normalize_text('ＣＰＵ使用率') == 'cpu使用率'
+    assert normalize_text('Straße') == 'strasse'
+
+def test_tables_cover_supported_languages_and_known_intents():
+    intents = [intent for intent, _ in INTENT_KEYWORDS]
+    for language, table in NATIVE_INTENT_KEYWORDS.items():
+        assert language in SUPPORTED_LANGUAGES
+        assert set(table) <= set(intents)
+
+def test_keywords_for_merges_native_phrases_in_priority_order():
+    table = keywords_for('fr')
+    assert [intent for intent, _ in table] == [intent for intent, _ in INTENT_KEYWORDS]
+    weather = dict(table)['weather']
+    assert weather[:5] == ['weather', 'temperature', 'forecast', 'rain', 'sunny']
+    assert 'météo' in weather and len(weather) == len(set(weather))
+    # Unsupported languages only get the English phrases
+    assert keywords_for('xx') == [(intent, list(phrases)) for intent, phrases in INTENT_KEYWORDS]
+
+@pytest.mark.parametrize('query, language, intent', [
+    ('¿Qué tiempo hace en Madrid?', 'es', 'weather'),
+    ('Quelle heure est-il à Paris ?', 'fr', 'time'),
+    ('Wie spät ist es in Berlin?', 'de', 'time'),
+    ('東京の天気は?', 'ja', 'weather'),
+    ('给我讲个笑话', 'zh', 'joke'),
+    ('какая погода в Москве', 'ru', 'weather'),
+    ('मौसम कैसा है', 'hi', 'weather'),
+    ('احسب 5 ضرب 3', 'ar', 'calculation'),
+    ('আজ কটা বাজে', 'bn', 'time'),
+    ('what is the weather in Paris', 'en', 'weather'),
+])
+def test_native_phrases_detect_their_intent(query, language, intent):
+    assert match_intents(query, language)[0] == intent
+
+def test_intents_are_reported_in_priority_order():
+    assert match_intents('open the weather app', 'en') == ['system_command', 'weather']
+    assert match_intents('hello there', 'en') == []
@@ -0,0 +1,117 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from services.job_queue import (CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobScheduler, QueueFull)
+
+def _wait_for(scheduler, job_id, *statuses, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = scheduler.get(job_id)
+        if state and state['status'] in statuses:
+            return state
+        time.sleep(0.01)
+    raise AssertionError(f'job {job_id} never reached {statuses}: {scheduler.get(job_id)}')
+
+@pytest.fixture
+def gate():
+    # Keeps 'block' jobs running until set
+    event = threading.Event()
+    yield event
+    event.set()
+
+@pytest.fixture
+def scheduler(tmp_path, gate):
+    scheduler = JobScheduler(max_workers=1, max_queue=2, state_dir=str(tmp_path))
+    scheduler.register('echo', lambda job, value: value)
+    scheduler.register('fail', lambda job: 1 / 0)
+
+    def block(job):
+        while not gate.wait(0.01):
+            job.check_cancelled()
+        return 'done'
+    scheduler.register('block', block)
+    return scheduler
+
+def test_job_runs_to_success(scheduler):
+    job = scheduler.submit('echo', 42)
+    state = _wait_for(scheduler, job.id, SUCCEEDED)
+    assert state['result'] == 42
+    assert state['started_at'] <= state['finished_at']
+
+def test_handler_errors_fail_the_job(scheduler):
+    job = scheduler.submit('fail')
+    state = _wait_for(scheduler, job.id, FAILED)
+    assert 'division by zero' in state['error']
+
+def test_unknown_command_and_full_queue(scheduler, gate):
+    with pytest.raises(KeyError):
+        scheduler.submit('missing')
+    running = scheduler.submit('block')
+    _wait_for(scheduler, running.id, RUNNING)
+    scheduler.submit('echo', 1)
+    scheduler.submit('echo', 2)
+    with pytest.raises(QueueFull):
+        scheduler.submit('echo', 3)
+    gate.set()
+    _wait_for(scheduler, running.id, SUCCEEDED)
+
+def test_cancels_queued_and_running_jobs(scheduler):
+    running = scheduler.submit('block')
+    _wait_for(scheduler, running.id, RUNNING)
+    queued = scheduler.submit('echo', 1)
+    assert scheduler.cancel(queued.id)['status'] == CANCELLED
+    scheduler.cancel(running.id)
+    _wait_for(scheduler, running.id, CANCELLED)
+    assert scheduler.cancel('0' * 32) is None
+
+def test_other_processes_read_and_cancel_through_state_files(scheduler, tmp_path):
+    other = JobScheduler(state_dir=str(tmp_path))
+    job = scheduler.submit('block')
+    _wait_for(scheduler, job.id, RUNNING)
+    assert other.get(job.id)['status'] == RUNNING
+    assert other.cancel(job.id)['cancel_requested']
+    _wait_for(other, job.id, CANCELLED)
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+def _write_state(tmp_path, job_id, status, owner_pid):
+    with open(tmp_path / f'{job_id}.json', 'w') as f:
+        json.dump({'id': job_id, 'command': 'block', 'status': status, 'result': None, 'error': None,
+                   'created_at': time.time(), 'started_at': None, 'finished_at': None,
+                   'owner_pid': owner_pid}, f)
+
+def test_jobs_of_exited_processes_are_failed(scheduler, tmp_path):
+    dead = _dead_pid()
+    _write_state(tmp_path, 'a' * 32, RUNNING, dead)
+    _write_state(tmp_path, 'b' * 32, QUEUED, dead)
+    open(tmp_path / f"{'b' * 32}.cancel", 'w').close()
+    _write_state(tmp_path, 'c' * 32, QUEUED, os.getppid())
+
+    failed = scheduler.get('a' * 32)
+    assert failed['status'] == FAILED and failed['error']
+    assert scheduler.cancel('b' * 32)['status'] == CANCELLED
+    assert scheduler.get('c' * 32)['status'] == QUEUED
+    # The outcome is saved for every process
+    with open(tmp_path / f"{'a' * 32}.json") as f:
+        assert json.load(f)['status'] == FAILED
+
+def test_sweep_removes_expired_state(tmp_path):
+    scheduler = JobScheduler(retention_seconds=0, state_dir=str(tmp_path))
+    scheduler.register('echo', lambda job, value: value)
+    _write_state(tmp_path, 'a' * 32, RUNNING, _dead_pid())
+    first = scheduler.submit('echo', 1)
+    _wait_for(scheduler, first.id, SUCCEEDED)
+    # The orphan was failed by the first sweep and expires on the next one
+    scheduler._last_state_sweep = 0.0
+    scheduler.submit('echo', 2)
+    assert not (tmp_path / f'{first.id}.json').exists()
+    assert not (tmp_path / f"{'a' * 32}.json").exists()
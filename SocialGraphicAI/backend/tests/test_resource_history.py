@@ -0,0 +1,40 @@
+import pytest
+
+from services.resource_history import ResourceHistory, parse_window
+
+@pytest.mark.parametrize('window, seconds', [
+    ('300', 300), ('5m', 300), ('2h', 7200), ('7d', 604800), (' 1.5H ', 5400), (60, 60),
+])
+def test_parse_window(window, seconds):
+    assert parse_window(window) == seconds
+
+@pytest.mark.parametrize('window', ['0', '-5m', 'nan', 'inf', '-inf', '1e400', 'abc', '', 'm'])
+def test_parse_window_rejects_non_positive_and_non_finite(window):
+    with pytest.raises(ValueError):
+        parse_window(window)
+
+def test_rollups_per_tier():
+    history = ResourceHistory(metrics=('cpu.percent',), tiers=((1, 60), (60, 10)))
+    for second, value in enumerate([10.0, 30.0, None, 20.0]):
+        history.record(6000 + second, {'cpu.percent': value})
+
+    fine = history.query('cpu.percent', 10, resolution=1, end=6010)
+    assert [point['avg'] for point in fine['points']] == [10.0, 30.0, 20.0]
+
+    coarse = history.query('cpu.percent', 600, end=6010)
+    assert coarse['resolution'] == 60
+    assert coarse['points'] == [{'t': 6000, 'min': 10.0, 'avg': 20.0, 'max': 30.0}]
+
+def test_recycled_slots_drop_old_buckets():
+    history = ResourceHistory(metrics=('cpu.percent',), tiers=((1, 4),))
+    history.record(100, {'cpu.percent': 1.0})
+    history.record(104, {'cpu.percent': 2.0})
+    points = history.query('cpu.percent', 10, end=104)['points']
+    assert points == [{'t': 104, 'min': 2.0, 'avg': 2.0, 'max': 2.0}]
+
+def test_unknown_metric_and_resolution():
+    history = ResourceHistory(metrics=('cpu.percent',), tiers=((1, 4),))
+    with pytest.raises(KeyError):
+        history.query('gpu.percent', 10)
+    with pytest.raises(ValueError):
+        history.query('cpu.percent', 10, resolution=5)
@@ -0,0 +1,69 @@
+from services.response_cache import ResponseCache, normalize_query
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_caches_only_intents_with_a_ttl():
+    cache = ResponseCache(intent_ttls={'calculation': 60})
+    assert cache.put('2 + 2', 'en', 'calculation', '4')
+    assert not cache.put('tell me a joke', 'en', 'joke', 'ha')
+    assert cache.get('2 + 2') == ('calculation', '4')
+    assert cache.get('tell me a joke') is None
+
+def test_keys_on_normalized_query_and_language():
+    cache = ResponseCache(intent_ttls={'calculation': 60})
+    cache.put('2  +   2', 'en', 'calculation', '4')
+    assert cache.get(' 2 + 2 ', 'en') == ('calculation', '4')
+    assert cache.get('2 + 2', 'fr') is None
+    assert normalize_query(' a \t b\n') == 'a b'
+
+def test_entries_expire_after_their_intent_ttl():
+    clock = FakeClock()
+    cache = ResponseCache(intent_ttls={'calculation': 60, 'system_command': 10}, clock=clock)
+    cache.put('2 + 2', 'en', 'calculation', '4')
+    cache.put('open notepad', 'en', 'system_command', 'Opening notepad')
+    clock.now += 30
+    assert cache.get('2 + 2') is not None
+    assert cache.get('open notepad') is None
+    clock.now += 31
+    assert cache.get('2 + 2') is None
+    assert cache.stats()['expirations'] == 2
+
+def test_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, intent_ttls={'calculation': 60})
+    cache.put('1', 'en', 'calculation', '1')
+    cache.put('2', 'en', 'calculation', '2')
+    cache.get('1')
+    cache.put('3', 'en', 'calculation', '3')
+    assert cache.get('2') is None
+    assert cache.get('1') is not None
+    assert cache.get('3') is not None
+    assert cache.stats()['evictions'] == 1
+
+def test_disabled_when_max_entries_is_zero():
+    cache = ResponseCache(max_entries=0, intent_ttls={'calculation': 60})
+    assert not cache.put('2 + 2', 'en', 'calculation', '4')
+    assert cache.get('2 + 2') is None
+
+def test_invalidate_by_filter():
+    cache = ResponseCache(intent_ttls={'calculation': 60, 'code_generation': 60})
+    cache.put('2 + 2', 'en', 'calculation', '4')
+    cache.put('2 + 2', 'fr', 'calculation', '4')
+    cache.put('write code', 'en', 'code_generation', 'pass')
+    assert cache.invalidate(language='fr') == 1
+    assert cache.invalidate(intent='code_generation') == 1
+    assert cache.get('2 + 2', 'en') is not None
+    assert cache.invalidate() == 1
+    assert cache.stats()['entries'] == 0
+
+def test_counts_hits_and_misses():
+    cache = ResponseCache(intent_ttls={'calculation': 60})
+    cache.put('2 + 2', 'en', 'calculation', '4')
+    cache.get('2 + 2')
+    cache.get('3 + 3')
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from services.shared_segment import SharedCache, SharedSegment, default_segment_path, reset_shared_cache
+
+@pytest.fixture
+def path(tmp_path):
+    return default_segment_path(str(tmp_path))
+
+def test_cache_is_shared_through_the_file(path):
+    first, second = SharedSegment(path, cache_slots=8), SharedSegment(path, cache_slots=8)
+    try:
+        SharedCache(first).put('2 + 2', ['calculation', '4'], ttl=60)
+        assert SharedCache(second).get('2 + 2')[0] == ['calculation', '4']
+    finally:
+        first.close()
+        second.close()
+
+def test_reset_drops_cached_responses(path):
+    reset_shared_cache(path)
+    assert not os.path.exists(path)
+
+    segment = SharedSegment(path, cache_slots=8)
+    try:
+        cache = SharedCache(segment)
+        cache.put('2 + 2', ['calculation', '4'], ttl=60)
+        reset_shared_cache(path)
+        assert cache.get('2 + 2') is None
+    finally:
+        segment.close()
+
+def test_files_are_private(path):
+    open(path, 'wb').close()
+    os.chmod(path, 0o666)
+    SharedSegment(path, cache_slots=8).close()
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+    os.remove(path)
+    os.symlink(os.devnull, path)
+    with pytest.raises(OSError):
+        SharedSegment(path, cache_slots=8)
+
+@pytest.mark.skipif(os.geteuid() != 0, reason='needs root to create a file owned by another user')
+def test_refuses_files_owned_by_another_user(path):
+    open(path, 'wb').close()
+    os.chown(path, 65534, 65534)
+    with pytest.raises(PermissionError):
+        SharedSegment(path, cache_slots=8)
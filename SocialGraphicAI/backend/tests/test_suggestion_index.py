@@ -0,0 +1,39 @@
+import heapq
+import random
+
+from services.suggestion_index import DEFAULT_SUGGESTIONS, PrefixIndex, SuggestionIndex
+
+def _expected(index, prefix):
+    return [key for _, key in heapq.nlargest(10, ((entry[0], key) for key, entry in index._entries.items()
+                                                  if key.startswith(prefix)))]
+
+def test_ranks_by_recency_weighted_frequency():
+    index = PrefixIndex(half_life=100, clock=lambda: 0.0)
+    index.add('weather in Paris', timestamp=0)
+    index.add('weather in Paris', timestamp=0)
+    index.add('Weather  in Tokyo', timestamp=150)
+    assert [text for text, _ in index.top('WEATHER in')] == ['Weather in Tokyo', 'weather in Paris']
+    assert index.top('xyz') == []
+
+def test_default_suggestions_keep_their_order():
+    suggestions = SuggestionIndex()
+    assert suggestions.suggest('') == DEFAULT_SUGGESTIONS
+    suggestions.record('tell me a story')
+    assert suggestions.suggest('tell', limit=2) == ['tell me a story', 'Tell me a joke']
+    # Topped up from English
+    suggestions.record('quelle heure est-il', 'fr')
+    assert suggestions.suggest('', 'fr', limit=2) == ['quelle heure est-il', 'tell me a story']
+
+def test_merges_and_evicts_in_the_background():
+    index = PrefixIndex(half_life=1000, max_entries=300, clock=lambda: 0.0)
+    rng = random.Random(0)
+    for step in range(6000):
+        text = ''.join(rng.choice('abc') for _ in range(rng.randint(1, 6)))
+        index.add(text, timestamp=step * rng.random())
+        if step % 500 == 0:
+            index.flush()
+            for prefix in ('', 'a', 'ab', 'cab'):
+                assert [text for text, _ in index.top(prefix)] == _expected(index, prefix)
+    index.flush()
+    assert len(index) <= 300 + 300 // 8
+    assert sorted(index._keys + index._pending) == sorted(index._entries)
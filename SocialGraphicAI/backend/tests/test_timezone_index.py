@@ -0,0 +1,53 @@
+import datetime
+
+import pytest
+
+from services.timezone_index import TimezoneIndex, ZoneMatch, normalize
+
+@pytest.fixture(scope='module')
+def index():
+    return TimezoneIndex()
+
+def test_normalize_strips_accents_punctuation_and_case():
+    assert normalize('  São_Paulo! ') == 'sao paulo'
+    assert normalize('Zürich') == 'zurich'
+
+@pytest.mark.parametrize('phrase, zone', [
+    ('new york right now', 'America/New_York'),
+    ('Tokyo?', 'Asia/Tokyo'),
+    ('São Paulo', 'America/Sao_Paulo'),
+    ('the uk', 'Europe/London'),
+    ('the hague', 'Europe/Amsterdam'),
+    ('new delhi now', 'Asia/Kolkata'),
+    ('America/Argentina/Buenos_Aires', 'America/Argentina/Buenos_Aires'),
+])
+def test_resolves_the_longest_place_name(index, phrase, zone):
+    match = index.resolve(phrase)
+    assert match.zone == zone and match.exact
+
+def test_table_aliases_win_over_zone_names(index):
+    assert index.resolve('nyc') == ZoneMatch('NYC', 'America/New_York')
+    assert index.lookup('washington').zone == 'America/New_York'
+    assert index.lookup('washington state').zone == 'America/Los_Angeles'
+
+@pytest.mark.parametrize('phrase, zone', [
+    ('tokio', 'Asia/Tokyo'),
+    ('londn right now', 'Europe/London'),
+    ('chicgo please', 'America/Chicago'),
+])
+def test_falls_back_to_fuzzy_matches(index, phrase, zone):
+    match = index.resolve(phrase)
+    assert match.zone == zone and not match.exact
+
+@pytest.mark.parametrize('phrase', ['', 'xyzzy', 'right now', 'good morning'])
+def test_unknown_places_resolve_to_none(index, phrase):
+    assert index.resolve(phrase) is None
+
+def test_prefix_lists_names_alphabetically(index):
+    names = [match.name for match in index.prefix('new yo', limit=3)]
+    assert names == ['New York', 'New York City']
+
+def test_now_uses_a_shared_zone_object(index):
+    match = index.resolve('tokyo')
+    assert index.zone(match.zone) is index.zone(match.zone)
+    assert index.now(match).utcoffset() == datetime.timedelta(hours=9)
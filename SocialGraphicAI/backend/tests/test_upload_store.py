@@ -0,0 +1,101 @@
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+from services.upload_store import OffsetMismatch, UnknownUpload, UploadStore, UploadTooLarge
+
+@pytest.fixture
+def store(tmp_path):
+    return UploadStore(str(tmp_path), max_bytes=64, chunk_size=4, session_ttl=100, object_ttl=1000)
+
+def _age(path, seconds):
+    stamp = time.time() - seconds
+    os.utime(path, (stamp, stamp))
+
+def test_ingest_stores_by_digest_and_deduplicates(store):
+    first = store.ingest(io.BytesIO(b'hello world'), 'a.txt')
+    assert first.sha256 == hashlib.sha256(b'hello world').hexdigest()
+    assert first.size == 11 and not first.deduplicated
+    assert first.path == store.object_path(first.sha256)
+    with open(first.path, 'rb') as f:
+        assert f.read() == b'hello world'
+
+    second = store.ingest(io.BytesIO(b'hello world'), '../b.txt')
+    assert second.deduplicated and second.path == first.path
+    assert second.filename == 'b.txt'
+    assert os.listdir(store.tmp_dir) == []
+
+def test_ingest_rejects_oversized_uploads(store):
+    with pytest.raises(UploadTooLarge):
+        store.ingest(io.BytesIO(b'x' * 65), 'big.bin')
+    assert os.listdir(store.tmp_dir) == []
+
+def test_resumes_from_the_acknowledged_offset(store):
+    session = store.create_session('data.csv', total_size=10)
+    upload_id = session['upload_id']
+    assert session['offset'] == 0
+
+    assert store.append_chunk(upload_id, 0, io.BytesIO(b'01234')) == 5
+    with pytest.raises(OffsetMismatch) as mismatch:
+        store.append_chunk(upload_id, 0, io.BytesIO(b'01234'))
+    assert mismatch.value.expected == 5
+    assert store.session_status(upload_id)['offset'] == 5
+
+    with pytest.raises(OffsetMismatch):
+        store.complete_session(upload_id)
+    assert store.append_chunk(upload_id, 5, io.BytesIO(b'56789')) == 10
+
+    stored = store.complete_session(upload_id)
+    assert stored.sha256 == hashlib.sha256(b'0123456789').hexdigest()
+    assert stored.filename == 'data.csv'
+    with pytest.raises(UnknownUpload):
+        store.session_status(upload_id)
+
+def test_failed_chunk_rolls_back_to_its_offset(store):
+    upload_id = store.create_session('data.csv', total_size=8)['upload_id']
+    store.append_chunk(upload_id, 0, io.BytesIO(b'0123'))
+    with pytest.raises(UploadTooLarge):
+        store.append_chunk(upload_id, 4, io.BytesIO(b'456789'))
+    assert store.session_status(upload_id)['offset'] == 4
+
+def test_rejects_invalid_sessions(store):
+    with pytest.raises(UploadTooLarge):
+        store.create_session('big.bin', total_size=65)
+    for upload_id in ('../../etc/passwd', '0' * 32):
+        with pytest.raises(UnknownUpload):
+            store.session_status(upload_id)
+
+def test_abort_discards_the_session(store):
+    upload_id = store.create_session('data.csv')['upload_id']
+    store.abort_session(upload_id)
+    with pytest.raises(UnknownUpload):
+        store.append_chunk(upload_id, 0, io.BytesIO(b'x'))
+
+def test_expires_idle_sessions(store):
+    idle = store.create_session('idle.csv')['upload_id']
+    active = store.create_session('active.csv')['upload_id']
+    _age(os.path.join(store.sessions_dir, idle + '.part'), 200)
+    assert store.expire_sessions() == 1
+    with pytest.raises(UnknownUpload):
+        store.session_status(idle)
+    assert store.session_status(active)['offset'] == 0
+
+def test_expires_objects_not_uploaded_again(store):
+    old = store.ingest(io.BytesIO(b'old'), 'old.txt')
+    renewed = store.ingest(io.BytesIO(b'renewed'), 'renewed.txt')
+    _age(old.path, 2000)
+    _age(renewed.path, 2000)
+    assert store.ingest(io.BytesIO(b'renewed'), 'renewed.txt').deduplicated
+
+    leftover = os.path.join(store.tmp_dir, 'leftover')
+    open(leftover, 'wb').close()
+    _age(leftover, 200)
+
+    assert store.sweep(now=time.time()) == 2
+    assert not os.path.exists(old.path)
+    assert not os.path.exists(leftover)
+    assert os.path.exists(renewed.path)
+    assert not store.ingest(io.BytesIO(b'old'), 'old.txt').deduplicated